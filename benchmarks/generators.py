@@ -0,0 +1,363 @@
+"""
+Microbenchmarks of the data generators, measuring throughput and allocations at
+realistic sizes.
+
+Calls to downstream services are replaced with fixed responses, so the benchmarks
+run offline and only measure generation. Every run is seeded, so each repeat
+generates the same data. Results are written as JSON and compared with a stored
+baseline like the reset benchmarks.
+
+    python -m benchmarks.generators --output results.json
+    python -m benchmarks.generators --benchmarks readings --update-baseline
+"""
+import argparse
+import contextlib
+import functools
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from unittest import mock
+
+import dhos_janitor_api.app
+from benchmarks.reset import compare
+from benchmarks.stand_in import MEDICATIONS
+from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.blueprint_api.controller import generator_controller
+from dhos_janitor_api.blueprint_api.generator import encounter_generator
+from dhos_janitor_api.blueprint_api.generator.encounter_generator import (
+    EncountersGenerator,
+)
+from dhos_janitor_api.blueprint_api.generator.message_generator import MessageGenerator
+from dhos_janitor_api.blueprint_api.generator.observations_generator import (
+    ObservationsGenerator,
+)
+from dhos_janitor_api.blueprint_api.generator.readings_generator import (
+    ReadingsGenerator,
+)
+from dhos_janitor_api.data import patient_data
+from dhos_janitor_api.helpers import names
+
+BASELINE_PATH = Path(__file__).parent / "generators_baseline.json"
+
+# Short timings are noisy, but allocations barely vary from run to run for a seed.
+DEFAULT_TOLERANCES: Dict[str, float] = {"usec_per_entity": 0.5, "peak_kb": 0.1}
+
+WARD_SCT_CODE = "225746001"
+BAY_SCT_CODE = "229772003"
+BED_SCT_CODE = "229772003-bed"
+
+
+@dataclass(frozen=True)
+class Benchmark:
+    """
+    A generator benchmark. setup() builds the inputs outside of the measurements,
+    and run() generates from them, returning the number of entities generated.
+    """
+
+    name: str
+    description: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], int]
+
+
+@contextlib.contextmanager
+def _offline() -> Iterator[None]:
+    """
+    Replaces the client calls made by the generators with fixed responses.
+    """
+    clinicians = [
+        {"uuid": f"clinician-{i}", "locations": [f"location-{i % 4}"]}
+        for i in range(20)
+    ]
+    with mock.patch.object(
+        generator_controller.users_client, "get_clinicians", return_value=clinicians
+    ), mock.patch.object(
+        generator_controller.trustomer_client,
+        "get_trustomer_config",
+        return_value={"gdm_config": {"medication_tags": ["gdm-uk-default"]}},
+    ), mock.patch.object(
+        generator_controller.medication_client,
+        "get_medications",
+        return_value=MEDICATIONS,
+    ), mock.patch.object(
+        encounter_generator.locations_client,
+        "get_all_locations",
+        side_effect=_locations,
+    ):
+        yield
+
+
+def _locations(location_types: List[str], **kwargs: Any) -> Dict[str, Dict]:
+    """
+    A hospital of 10 wards, each with 5 bays of 10 beds.
+    """
+    parents: Dict[str, Tuple[str, int]] = {
+        WARD_SCT_CODE: ("hospital", 1),
+        BAY_SCT_CODE: ("ward", 10),
+        BED_SCT_CODE: ("bay", 50),
+    }
+    children = {WARD_SCT_CODE: 10, BAY_SCT_CODE: 5, BED_SCT_CODE: 10}
+    location_type = location_types[0]
+    parent_kind, parent_count = parents[location_type]
+    kind = {WARD_SCT_CODE: "ward", BAY_SCT_CODE: "bay", BED_SCT_CODE: "bed"}
+    locations = {}
+    for p in range(parent_count):
+        for c in range(children[location_type]):
+            location_uuid = f"{kind[location_type]}-{p * children[location_type] + c}"
+            locations[location_uuid] = {
+                "uuid": location_uuid,
+                "location_type": location_type,
+                "parent": {"uuid": f"{parent_kind}-{p}"},
+            }
+    return locations
+
+
+def _patients(product_name: str, count: int) -> List[Dict]:
+
+    patients = []
+    for _ in range(count):
+        patient = generator_controller.generate_patient(
+            clients=_clients(), product_name=product_name
+        )
+        # As though the patient had been created by dhos-services-api.
+        patient["record"]["uuid"] = str(uuid.uuid4())
+        patient["dh_products"][0]["uuid"] = str(uuid.uuid4())
+        patients.append(patient)
+    return patients
+
+
+@functools.lru_cache(maxsize=None)
+def _clients() -> ClientRepository:
+    """
+    Clients for the generators that need them. They are never used to send requests.
+    """
+
+    return ClientRepository.from_app(dhos_janitor_api.app.create_app(testing=True))
+
+
+def _run_readings(patients: List[Dict]) -> int:
+
+    return sum(len(ReadingsGenerator(patient).generate_data()) for patient in patients)
+
+
+def _run_observations(count: int) -> int:
+
+    record_time = datetime(2021, 1, 1)
+    trajectory = ObservationsGenerator.get_random_trajectory()
+    for i in range(count):
+        ObservationsGenerator.generate(
+            encounter_id="encounter",
+            current_spo2_scale=1,
+            record_time=record_time + timedelta(hours=i),
+            trajectory=trajectory,
+        )
+    return count
+
+
+def _run_messages(patients: List[Dict]) -> int:
+
+    return sum(
+        len(MessageGenerator(patient).generate_message_data(number_of_messages=50))
+        for patient in patients
+    )
+
+
+def _run_encounters(patients: List[Dict]) -> int:
+
+    generator = EncountersGenerator(
+        _clients(), "system_jwt", WARD_SCT_CODE, BAY_SCT_CODE, BED_SCT_CODE
+    )
+    for patient in patients:
+        generator.generate_data_for_patient(patient)
+    return len(patients)
+
+
+def _run_patients(inputs: Tuple[str, int]) -> int:
+    product_name, count = inputs
+
+    for _ in range(count):
+        generator_controller.generate_patient(
+            clients=_clients(), product_name=product_name
+        )
+    return count
+
+
+def _run_diabetes_records(count: int) -> int:
+
+    for _ in range(count):
+        patient_data.generate_diabetes_record(
+            "clinician",
+            conception_date=patient_data.generate_conception_date(),
+            medications=MEDICATIONS,
+            is_pregnant=True,
+        )
+    return count
+
+
+BENCHMARKS: Tuple[Benchmark, ...] = (
+    Benchmark(
+        "readings",
+        "ReadingsGenerator.generate_data for 20 GDM patients",
+        setup=lambda: _patients("GDM", 20),
+        run=_run_readings,
+    ),
+    Benchmark(
+        "observations",
+        "ObservationsGenerator.generate for 2000 observation sets",
+        setup=lambda: 2000,
+        run=_run_observations,
+    ),
+    Benchmark(
+        "messages",
+        "MessageGenerator.generate_message_data of 50 messages for 20 patients",
+        setup=lambda: _patients("GDM", 20),
+        run=_run_messages,
+    ),
+    Benchmark(
+        "encounters",
+        "EncountersGenerator.generate_data_for_patient for 200 SEND patients",
+        setup=lambda: _patients("SEND", 200),
+        run=_run_encounters,
+    ),
+    *(
+        Benchmark(
+            f"generate_patient_{product_name.lower()}",
+            f"generator_controller.generate_patient for 100 {product_name} patients",
+            setup=functools.partial(tuple, (product_name, 100)),
+            run=_run_patients,
+        )
+        for product_name in ("GDM", "DBM", "SEND")
+    ),
+    Benchmark(
+        "diabetes_record",
+        "patient_data.generate_diabetes_record for 200 pregnancies",
+        setup=lambda: 200,
+        run=_run_diabetes_records,
+    ),
+)
+
+
+def _seed(seed: int) -> None:
+    names.seed(seed)
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int, seed: int) -> Dict[str, Any]:
+    """
+    Times repeat seeded runs of a benchmark, then measures the allocations of one
+    more run with tracemalloc, which would otherwise distort the timings.
+    """
+    _seed(seed)
+    inputs = benchmark.setup()
+    timings: List[float] = []
+    entities = 0
+    for _ in range(repeat):
+        _seed(seed)
+        started = time.perf_counter()
+        entities = benchmark.run(inputs)
+        timings.append(time.perf_counter() - started)
+
+    _seed(seed)
+    tracemalloc.start()
+    try:
+        benchmark.run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "description": benchmark.description,
+        "entities": entities,
+        "best_sec": round(best, 4),
+        "median_sec": round(statistics.median(timings), 4),
+        "entities_per_sec": round(entities / best, 1),
+        "usec_per_entity": round(best / entities * 1e6, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_all(
+    benchmarks: List[Benchmark], repeat: int = 5, seed: int = 0
+) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    with _offline():
+        for benchmark in benchmarks:
+            print(f"Running {benchmark.name}...", file=sys.stderr)
+            results[benchmark.name] = run_benchmark(benchmark, repeat, seed)
+    return {"repeat": repeat, "seed": seed, "cases": results}
+
+
+def _summary(results: Dict[str, Any]) -> str:
+    lines = [f"{'benchmark':<26}{'entities/s':>12}{'us/entity':>12}{'peak KB':>12}"]
+    for name, result in results["cases"].items():
+        lines.append(
+            f"{name:<26}{result['entities_per_sec']:>12.1f}"
+            f"{result['usec_per_entity']:>12.1f}{result['peak_kb']:>12.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--benchmarks",
+        nargs="*",
+        choices=[b.name for b in BENCHMARKS],
+        help="Benchmarks to run (default: all)",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Record the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Override the tolerance for all measurements, e.g. 0.5 for +50%%",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    benchmarks = [
+        b for b in BENCHMARKS if not args.benchmarks or b.name in args.benchmarks
+    ]
+    results = run_all(benchmarks, repeat=args.repeat, seed=args.seed)
+    print(_summary(results))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline = (
+            json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        )
+        baseline.update({k: v for k, v in results.items() if k != "cases"})
+        baseline["cases"] = {**baseline.get("cases", {}), **results["cases"]}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        return
+
+    tolerances: Dict[str, float] = dict(DEFAULT_TOLERANCES)
+    if args.tolerance is not None:
+        tolerances = {k: args.tolerance for k in tolerances}
+    regressions = compare(results, json.loads(args.baseline.read_text()), tolerances)
+    if regressions:
+        print("\nREGRESSIONS:\n" + "\n".join(regressions), file=sys.stderr)
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
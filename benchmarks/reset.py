@@ -0,0 +1,275 @@
+"""
+End-to-end benchmarks of resets and GDM/DBM data population, run against the
+stand-in for the downstream services.
+
+Each case in the matrix runs in a fresh process with fixed seeds, so request counts
+only vary with the time of day and peak RSS is that of the case alone. Results are written as JSON
+and compared with a stored baseline; the run fails if any case got slower, used more
+memory or made more requests than the baseline allows.
+
+    python -m benchmarks.reset --output results.json
+    python -m benchmarks.reset --cases small --update-baseline
+
+Timings depend on the machine, so the baseline should be recorded where the
+benchmarks are run.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.stand_in import Behaviour, StandInCluster
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+# Relative increase over the baseline that counts as a regression, by measurement.
+DEFAULT_TOLERANCES: Dict[str, float] = {
+    "wall_sec": 0.25,
+    "cpu_sec": 0.25,
+    "peak_rss_mb": 0.25,
+    # Data is dated relative to the current time, so the numbers of readings,
+    # messages and observations posted vary slightly with the time of day.
+    "total_requests": 0.02,
+}
+# Absolute increase that is always allowed, so that noise on short cases isn't
+# reported as a regression.
+MIN_SLACK: Dict[str, float] = {"wall_sec": 0.5, "cpu_sec": 0.5, "peak_rss_mb": 10}
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    num_gdm_patients: int
+    num_dbm_patients: int
+    num_send_patients: int
+    num_hospitals: Optional[int] = None
+    num_wards: Optional[int] = None
+    days: int = 1
+
+
+MATRIX: Tuple[Case, ...] = (
+    Case("small", num_gdm_patients=5, num_dbm_patients=5, num_send_patients=5),
+    Case("default", num_gdm_patients=12, num_dbm_patients=18, num_send_patients=6),
+    Case("large", num_gdm_patients=40, num_dbm_patients=40, num_send_patients=40),
+    Case(
+        "generated_locations",
+        num_gdm_patients=12,
+        num_dbm_patients=18,
+        num_send_patients=20,
+        num_hospitals=3,
+        num_wards=15,
+    ),
+    Case(
+        "populate_week",
+        num_gdm_patients=12,
+        num_dbm_patients=18,
+        num_send_patients=6,
+        days=7,
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Options:
+    seed: int = 0
+    latency_sec: float = 0
+    keep_target_limits: bool = False
+    verbose: bool = False
+
+
+def run_case(case: Case, options: Options) -> Dict[str, Any]:
+    """
+    Runs a reset followed by a populate for one case, in the current process.
+    """
+    import dhos_janitor_api.app
+    from dhos_janitor_api.blueprint_api.client import ClientRepository
+    from dhos_janitor_api.blueprint_api.controller import (
+        populate_controller,
+        reset_controller,
+    )
+    from dhos_janitor_api.config import Configuration
+    from dhos_janitor_api.helpers import names
+
+    if not options.verbose:
+        logging.disable(logging.INFO)
+    if not options.keep_target_limits:
+        # The stand-in isn't a shared environment, so doesn't need protecting.
+        Configuration.TARGET_LIMITS = {}
+    names.seed(options.seed)
+
+    app = dhos_janitor_api.app.create_app(testing=True)
+    cluster = StandInCluster(Behaviour(latency_sec=options.latency_sec))
+    clients = ClientRepository.from_app(app, transports=cluster.transports())
+    location_config: Optional[Dict] = None
+    if case.num_hospitals and case.num_wards:
+        location_config = {"hospitals": case.num_hospitals, "wards": case.num_wards}
+
+    stages: Dict[str, Dict[str, float]] = {}
+
+    def _measure(stage: str, func: Callable[[], Any]) -> None:
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        func()
+        stages[stage] = {
+            "wall_sec": round(time.perf_counter() - wall_started, 3),
+            "cpu_sec": round(time.process_time() - cpu_started, 3),
+        }
+
+    with app.app_context():
+        _measure(
+            "reset",
+            lambda: reset_controller.reset_microservices(
+                clients=clients,
+                reset_request={},
+                product_settings={
+                    "GDM": {"number_of_patients": case.num_gdm_patients},
+                    "DBM": {"number_of_patients": case.num_dbm_patients},
+                    "SEND": {"number_of_patients": case.num_send_patients},
+                },
+                location_config=location_config,
+            ),
+        )
+        _measure(
+            "populate",
+            lambda: populate_controller.populate_gdm_data(
+                clients=clients, days=case.days, use_system_jwt=False
+            ),
+        )
+
+    requests: Dict[str, int] = cluster.state.counts_by_target()
+    return {
+        "case": asdict(case),
+        "wall_sec": round(sum(s["wall_sec"] for s in stages.values()), 3),
+        "cpu_sec": round(sum(s["cpu_sec"] for s in stages.values()), 3),
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "stages": stages,
+        "total_requests": sum(requests.values()),
+        "requests": dict(sorted(requests.items())),
+    }
+
+
+def run_matrix(cases: List[Case], options: Options) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    # A fresh process per case, so the peak RSS of one doesn't carry over to the next.
+    # Some choices depend on set ordering, so string hashing is seeded too for the
+    # request counts to be reproducible.
+    os.environ["PYTHONHASHSEED"] = str(options.seed)
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        print(f"Running {case.name}...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            results[case.name] = pool.apply(run_case, (case, options))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "options": asdict(options),
+        "cases": results,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerances: Dict[str, float]
+) -> List[str]:
+    """
+    Returns a description of each measurement that regressed against the baseline.
+    """
+    regressions: List[str] = []
+    for name, result in results["cases"].items():
+        expected: Optional[Dict] = baseline.get("cases", {}).get(name)
+        if expected is None:
+            continue
+        for measurement, tolerance in tolerances.items():
+            limit = max(
+                expected[measurement] * (1 + tolerance),
+                expected[measurement] + MIN_SLACK.get(measurement, 0),
+            )
+            if result[measurement] > limit:
+                regressions.append(
+                    f"{name}: {measurement} {result[measurement]:.2f} exceeds "
+                    f"baseline {expected[measurement]:.2f} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def _summary(results: Dict[str, Any]) -> str:
+    lines = [f"{'case':<22}{'wall s':>10}{'cpu s':>10}{'rss MB':>10}{'requests':>10}"]
+    for name, result in results["cases"].items():
+        lines.append(
+            f"{name:<22}{result['wall_sec']:>10.2f}{result['cpu_sec']:>10.2f}"
+            f"{result['peak_rss_mb']:>10.1f}{result['total_requests']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--cases",
+        nargs="*",
+        choices=[c.name for c in MATRIX],
+        help="Cases to run (default: all)",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Record the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Override the tolerance for timings and memory, e.g. 0.5 for +50%%",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--keep-target-limits", action="store_true")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cases = [c for c in MATRIX if not args.cases or c.name in args.cases]
+    options = Options(
+        seed=args.seed,
+        latency_sec=args.latency,
+        keep_target_limits=args.keep_target_limits,
+        verbose=args.verbose,
+    )
+    results = run_matrix(cases, options)
+    print(_summary(results))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        baseline = (
+            json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        )
+        baseline.update({k: v for k, v in results.items() if k != "cases"})
+        baseline["cases"] = {**baseline.get("cases", {}), **results["cases"]}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        return
+
+    tolerances = dict(DEFAULT_TOLERANCES)
+    if args.tolerance is not None:
+        tolerances.update(
+            {k: args.tolerance for k in ("wall_sec", "cpu_sec", "peak_rss_mb")}
+        )
+    regressions = compare(results, json.loads(args.baseline.read_text()), tolerances)
+    if regressions:
+        print("\nREGRESSIONS:\n" + "\n".join(regressions), file=sys.stderr)
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,766 @@
+"""
+A stand-in for the downstream services, so that resets can be run and measured without
+the Polaris docker-compose stack.
+
+Each of the janitor's targets is a small WSGI app implementing the endpoints
+the janitor's clients use, backed by in-memory state shared between the targets (so,
+for example, SEND BFF can find the encounters posted to dhos-encounters-api). Latency,
+error rate and throughput can be set for all targets or per target.
+
+The stand-in can be used in-process, through ClientRepository.from_app(app,
+transports=cluster.transports()), or served on localhost:
+
+    python -m benchmarks.stand_in --port 8100 --latency 0.01
+
+which prints the environment variables pointing the janitor at it. Served, it also
+collects the janitor's trace spans at TRACE_EXPORT_URL. PostgresStandIn stands in for
+the Postgres server used by snapshot resets.
+"""
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.routing import Map, Rule
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+
+JsonResponse = Tuple[Any, int]
+Handler = Callable[..., JsonResponse]
+WSGIApp = Callable[[Dict[str, Any], Callable[..., Any]], Iterable[bytes]]
+
+# The janitor's targets and the environment variables holding their URLs, as in
+# Configuration.ALL_TARGETS. Listed here so the stand-in can be served without the
+# janitor's own environment.
+TARGETS: Dict[str, str] = {
+    "dhos_activation_auth_api": "DHOS_ACTIVATION_AUTH_API",
+    "dhos_audit_api": "DHOS_AUDIT_API",
+    "dhos_encounters_api": "DHOS_ENCOUNTERS_API",
+    "dhos_fuego_api": "DHOS_FUEGO_API",
+    "dhos_locations_api": "DHOS_LOCATIONS_API",
+    "dhos_medications_api": "DHOS_MEDICATIONS_API",
+    "dhos_messages_api": "DHOS_MESSAGES_API",
+    "dhos_observations_api": "DHOS_OBSERVATIONS_API",
+    "dhos_questions_api": "DHOS_QUESTIONS_API",
+    "dhos_services_api": "DHOS_SERVICES_API",
+    "dhos_telemetry_api": "DHOS_TELEMETRY_API",
+    "dhos_trustomer_api": "DHOS_TRUSTOMER_API",
+    "dhos_url_api": "DHOS_URL_API",
+    "dhos_users_api": "DHOS_USERS_API",
+    "gdm_articles_api": "GDM_ARTICLES_API",
+    "gdm_bff": "GDM_BFF",
+    "gdm_bg_readings_api": "GDM_BG_READINGS_API",
+    "send_bff": "SEND_BFF",
+}
+
+MEDICATIONS: List[Dict] = [
+    {"name": "Metformin", "sct_code": "109081006", "unit": "mg", "uuid": "med-1"},
+    {"name": "Insulin", "sct_code": "325072002", "unit": "units", "uuid": "med-2"},
+    {"name": "Gliclazide", "sct_code": "325238001", "unit": "mg", "uuid": "med-3"},
+]
+
+
+@dataclass(frozen=True)
+class Behaviour:
+    """
+    How a stand-in target responds. Every request is delayed by latency_sec; a
+    fraction error_rate of them fail with a 503. max_requests_per_sec caps the
+    throughput of the target: requests beyond it queue, or are rejected with a 429 if
+    reject_when_saturated is set. 0 means no cap.
+    """
+
+    latency_sec: float = 0
+    error_rate: float = 0
+    max_requests_per_sec: float = 0
+    reject_when_saturated: bool = False
+
+
+@dataclass
+class StandInState:
+    """
+    Entities created through the stand-in, by collection and UUID, the number of
+    requests served by target and route, and the trace spans collected.
+    """
+
+    collections: Dict[str, Dict[str, Dict]] = field(
+        default_factory=lambda: defaultdict(dict)
+    )
+    request_counts: Counter = field(default_factory=Counter)
+    spans: List[Dict] = field(default_factory=list)
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    # Generates the UUIDs of entities created without one, seeded so that they are
+    # the same in each run.
+    rng: random.Random = field(default_factory=lambda: random.Random(0))
+
+    def add(self, collection: str, entity: Dict) -> Dict:
+        with self.lock:
+            entity = {
+                **entity,
+                "uuid": entity.get("uuid")
+                or str(uuid.UUID(int=self.rng.getrandbits(128), version=4)),
+            }
+            self.collections[collection][entity["uuid"]] = entity
+        return entity
+
+    def all(self, collection: str) -> List[Dict]:
+        # In UUID order rather than the order the entities were created in, which
+        # depends on the timing of concurrent posts, so that seeded runs list them in
+        # the same order.
+        with self.lock:
+            return sorted(
+                self.collections[collection].values(), key=lambda e: e["uuid"]
+            )
+
+    def get(self, collection: str, entity_id: str) -> Dict:
+        with self.lock:
+            if entity_id not in self.collections[collection]:
+                raise NotFound(f"No {collection} with UUID {entity_id}")
+            return self.collections[collection][entity_id]
+
+    def counts_by_target(self) -> Dict[str, int]:
+        by_target: Counter = Counter()
+        with self.lock:
+            for (target, _), count in self.request_counts.items():
+                by_target[target] += count
+        return dict(by_target)
+
+
+# Routes by target: (method, rule, handler). Handlers take the shared state, the
+# request and any path arguments, and return a JSON-serialisable body and status code.
+_ROUTES: Dict[str, List[Tuple[str, str, Handler]]] = defaultdict(list)
+
+# Collections cleared by each target's /drop_data.
+_OWNED_COLLECTIONS: Dict[str, Tuple[str, ...]] = {
+    "dhos_activation_auth_api": ("activations", "devices"),
+    "dhos_encounters_api": ("encounters", "score_system_history"),
+    "dhos_fuego_api": ("fhir_patients",),
+    "dhos_locations_api": ("locations",),
+    "dhos_messages_api": ("messages",),
+    "dhos_observations_api": ("observation_sets",),
+    "dhos_questions_api": ("question_types", "question_option_types", "questions"),
+    "dhos_services_api": ("patients",),
+    "dhos_telemetry_api": ("installations",),
+    "dhos_users_api": ("clinicians",),
+    "gdm_bg_readings_api": ("readings",),
+}
+
+
+def route(target: str, method: str, rule: str) -> Callable[[Handler], Handler]:
+    def _register(handler: Handler) -> Handler:
+        _ROUTES[target].append((method, rule, handler))
+        return handler
+
+    return _register
+
+
+def _create(collection: str) -> Handler:
+    def _handler(state: StandInState, request: Request, **_: str) -> JsonResponse:
+        return state.add(collection, _json(request)), 200
+
+    return _handler
+
+
+def _json(request: Request) -> Dict:
+    return json.loads(request.get_data())
+
+
+def _product_names(entity: Dict) -> List[str]:
+    return [
+        p["product_name"] for p in entity.get("dh_products", entity.get("products", []))
+    ]
+
+
+def _is_active(patient: Dict, product_name: str) -> bool:
+    return any(
+        p["product_name"] == product_name and not p.get("closed_date")
+        for p in patient["dh_products"]
+    )
+
+
+def _descendants(state: StandInState, location_uuid: str) -> List[str]:
+    children: Dict[str, List[str]] = defaultdict(list)
+    for location in state.all("locations"):
+        if location.get("parent"):
+            children[location["parent"]].append(location["uuid"])
+    found, pending = [], [location_uuid]
+    while pending:
+        current = pending.pop()
+        found.append(current)
+        pending.extend(children[current])
+    return found
+
+
+# dhos-activation-auth-api
+
+
+@route("dhos_activation_auth_api", "POST", "/dhos/v1/patient/<patient_id>/activation")
+def _create_patient_activation(
+    state: StandInState, request: Request, patient_id: str
+) -> JsonResponse:
+    activation = state.add("activations", {"patient_id": patient_id, "otp": "1234"})
+    return {"activation_code": activation["uuid"], "otp": activation["otp"]}, 200
+
+
+@route("dhos_activation_auth_api", "POST", "/dhos/v1/device/<device_id>/activation")
+def _create_device_activation(
+    state: StandInState, request: Request, device_id: str
+) -> JsonResponse:
+    activation = state.add("activations", {"device_id": device_id, "otp": "1234"})
+    return {"activation_code": activation["uuid"], "otp": activation["otp"]}, 200
+
+
+@route("dhos_activation_auth_api", "POST", "/dhos/v1/activation/<activation_code>")
+def _create_activation(
+    state: StandInState, request: Request, activation_code: str
+) -> JsonResponse:
+    return {"authorisation_code": f"auth-{activation_code}"}, 200
+
+
+@route("dhos_activation_auth_api", "GET", "/dhos/v1/patient/<patient_id>/jwt")
+def _get_patient_jwt(
+    state: StandInState, request: Request, patient_id: str
+) -> JsonResponse:
+    return {"jwt": f"patient-jwt-{patient_id}"}, 200
+
+
+route("dhos_activation_auth_api", "POST", "/dhos/v1/device")(_create("devices"))
+
+
+# dhos-encounters-api
+
+
+@route("dhos_encounters_api", "POST", "/dhos/v2/encounter")
+def _create_encounter(state: StandInState, request: Request) -> JsonResponse:
+    encounter = _json(request)
+    history = state.add(
+        "score_system_history", {"spo2_scale": encounter.get("spo2_scale", 1)}
+    )
+    encounter = state.add(
+        "encounters",
+        {"discharged_at": None, **encounter, "score_system_history": [history]},
+    )
+    return encounter, 200
+
+
+@route("dhos_encounters_api", "GET", "/dhos/v2/encounter")
+def _get_encounters(state: StandInState, request: Request) -> JsonResponse:
+    patient_id = request.args.get("patient_id")
+    return [e for e in state.all("encounters") if e["patient_uuid"] == patient_id], 200
+
+
+@route("dhos_encounters_api", "PATCH", "/dhos/v1/encounter/<encounter_id>")
+def _update_encounter(
+    state: StandInState, request: Request, encounter_id: str
+) -> JsonResponse:
+    encounter = state.get("encounters", encounter_id)
+    changes = _json(request)
+    with state.lock:
+        encounter.update(changes)
+        if "spo2_scale" in changes:
+            history = state.add(
+                "score_system_history", {"spo2_scale": encounter["spo2_scale"]}
+            )
+            encounter["score_system_history"].insert(0, history)
+    return encounter, 200
+
+
+@route("dhos_encounters_api", "PATCH", "/dhos/v1/score_system_history/<history_id>")
+def _update_score_system_history(
+    state: StandInState, request: Request, history_id: str
+) -> JsonResponse:
+    history = state.get("score_system_history", history_id)
+    with state.lock:
+        history.update(_json(request))
+    return history, 200
+
+
+# dhos-fuego-api
+
+
+@route("dhos_fuego_api", "POST", "/dhos/v1/patient_create")
+def _create_fhir_patient(state: StandInState, request: Request) -> JsonResponse:
+    patient = state.add("fhir_patients", _json(request))
+    return {"mrn": patient["mrn"], "fhir_resource_id": patient["uuid"]}, 200
+
+
+# dhos-locations-api
+
+
+@route("dhos_locations_api", "POST", "/dhos/v1/location")
+def _create_location(state: StandInState, request: Request) -> JsonResponse:
+    return state.add("locations", _json(request)), 200
+
+
+@route("dhos_locations_api", "GET", "/dhos/v1/location/search")
+def _search_locations(state: StandInState, request: Request) -> JsonResponse:
+    product_names = set(request.args.getlist("product_name"))
+    location_types = set(
+        filter(None, request.args.get("location_types", "").split("|"))
+    )
+    return (
+        {
+            location["uuid"]: {
+                **location,
+                "parent": {"uuid": location["parent"]}
+                if location.get("parent")
+                else None,
+            }
+            for location in state.all("locations")
+            if product_names.intersection(_product_names(location))
+            and (not location_types or location["location_type"] in location_types)
+        },
+        200,
+    )
+
+
+# dhos-medications-api
+
+
+@route("dhos_medications_api", "GET", "/dhos/v1/medication")
+def _get_medications(state: StandInState, request: Request) -> JsonResponse:
+    return MEDICATIONS, 200
+
+
+# dhos-messages-api, dhos-questions-api, dhos-telemetry-api
+
+route("dhos_messages_api", "POST", "/dhos/v1/message")(_create("messages"))
+route("dhos_questions_api", "POST", "/dhos/v1/question_type")(_create("question_types"))
+route("dhos_questions_api", "POST", "/dhos/v1/question_option_type")(
+    _create("question_option_types")
+)
+route("dhos_questions_api", "POST", "/dhos/v1/question")(_create("questions"))
+route("dhos_telemetry_api", "POST", "/dhos/v1/patient/<patient_id>/installation")(
+    _create("installations")
+)
+route("dhos_telemetry_api", "POST", "/dhos/v1/clinician/<clinician_id>/installation")(
+    _create("installations")
+)
+
+
+# dhos-services-api
+
+
+@route("dhos_services_api", "POST", "/dhos/v1/patient")
+def _create_patient(state: StandInState, request: Request) -> JsonResponse:
+    patient: Dict = _json(request)
+    patient["record"] = {"uuid": str(uuid.uuid4()), **patient.get("record", {})}
+    patient["dh_products"] = [
+        {"uuid": str(uuid.uuid4()), **p} for p in patient.get("dh_products", [])
+    ]
+    return state.add("patients", patient), 200
+
+
+@route("dhos_services_api", "PATCH", "/dhos/v1/patient/<patient_id>")
+def _update_patient(
+    state: StandInState, request: Request, patient_id: str
+) -> JsonResponse:
+    patient = state.get("patients", patient_id)
+    with state.lock:
+        patient.update(_json(request))
+    return patient, 200
+
+
+@route("dhos_services_api", "GET", "/dhos/v1/patient/search")
+def _search_patients(state: StandInState, request: Request) -> JsonResponse:
+    product_name = request.args.get("product_name", "")
+    return [p for p in state.all("patients") if _is_active(p, product_name)], 200
+
+
+@route("dhos_services_api", "GET", "/dhos/v2/location/<location_id>/patient")
+def _get_patients_at_location(
+    state: StandInState, request: Request, location_id: str
+) -> JsonResponse:
+    product_name = request.args.get("product_name", "")
+    return (
+        [
+            p
+            for p in state.all("patients")
+            if location_id in p.get("locations", []) and _is_active(p, product_name)
+        ],
+        200,
+    )
+
+
+# dhos-trustomer-api
+
+
+@route("dhos_trustomer_api", "GET", "/dhos/v1/trustomer/<customer_code>")
+def _get_trustomer(
+    state: StandInState, request: Request, customer_code: str
+) -> JsonResponse:
+    return (
+        {
+            "uuid": customer_code,
+            "created": "2020-01-01T00:00:00.000Z",
+            "gdm_config": {
+                "use_epr_integration": True,
+                "medication_tags": ["gdm-uk-default"],
+            },
+            "dbm_config": {"medication_tags": ["dbm-uk-default"]},
+        },
+        200,
+    )
+
+
+# dhos-users-api
+
+
+@route("dhos_users_api", "POST", "/dhos/v1/clinician")
+def _create_clinician(state: StandInState, request: Request) -> JsonResponse:
+    return state.add("clinicians", _json(request)), 200
+
+
+@route("dhos_users_api", "PATCH", "/dhos/v1/clinician")
+def _update_clinician(state: StandInState, request: Request) -> JsonResponse:
+    email = request.args.get("email")
+    clinician = next(
+        (c for c in state.all("clinicians") if c["email_address"] == email), None
+    )
+    if clinician is None:
+        raise NotFound(f"No clinician with email {email}")
+    with state.lock:
+        clinician.update(_json(request))
+    return {k: v for k, v in clinician.items() if k != "password"}, 200
+
+
+@route("dhos_users_api", "GET", "/dhos/v2/clinicians")
+def _get_clinicians(state: StandInState, request: Request) -> JsonResponse:
+    product_name = request.args.get("product_name", "")
+    return (
+        {
+            "results": [
+                c for c in state.all("clinicians") if product_name in _product_names(c)
+            ]
+        },
+        200,
+    )
+
+
+@route("dhos_users_api", "GET", "/dhos/v1/location/<location_id>/clinician")
+def _get_clinicians_at_location(
+    state: StandInState, request: Request, location_id: str
+) -> JsonResponse:
+    return (
+        [c for c in state.all("clinicians") if location_id in c.get("locations", [])],
+        200,
+    )
+
+
+# gdm-bff and send-bff
+
+
+@route("gdm_bff", "POST", "/gdm/v1/patient/<patient_id>/reading")
+def _create_reading(
+    state: StandInState, request: Request, patient_id: str
+) -> JsonResponse:
+    return state.add("readings", {**_json(request), "patient_id": patient_id}), 200
+
+
+route("send_bff", "POST", "/send/v1/observation_set")(_create("observation_sets"))
+
+
+@route("send_bff", "GET", "/send/v1/encounter/search")
+def _search_encounters(state: StandInState, request: Request) -> JsonResponse:
+    locations = set(_descendants(state, request.args.get("location", "")))
+    return (
+        {
+            "results": [
+                {
+                    "encounter_uuid": e["uuid"],
+                    "admitted_at": e["admitted_at"],
+                    "discharged_at": e["discharged_at"],
+                    "spo2_scale": e.get("spo2_scale", 1),
+                }
+                for e in state.all("encounters")
+                if e["location_uuid"] in locations
+            ]
+        },
+        200,
+    )
+
+
+class _Throttle:
+    def __init__(self, behaviour: Behaviour) -> None:
+        self._behaviour = behaviour
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> bool:
+        """
+        Waits for the target to have capacity. Returns False if the request should be
+        rejected instead.
+        """
+        rate = self._behaviour.max_requests_per_sec
+        if rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            if slot > now and self._behaviour.reject_when_saturated:
+                return False
+            self._next_slot = slot + 1 / rate
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+
+class StandInCluster:
+    """
+    Stand-ins for all of the janitor's targets, sharing one StandInState.
+    """
+
+    def __init__(
+        self,
+        behaviour: Behaviour = Behaviour(),
+        target_behaviours: Optional[Dict[str, Behaviour]] = None,
+        seed: int = 0,
+    ) -> None:
+        self.state = StandInState()
+        self._behaviours: Dict[str, Behaviour] = {
+            target: (target_behaviours or {}).get(target, behaviour)
+            for target in TARGETS
+        }
+        self._throttles = {t: _Throttle(b) for t, b in self._behaviours.items()}
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._servers: List[Any] = []
+
+    def app(self, target: str) -> WSGIApp:
+        url_map = Map(
+            [Rule("/drop_data", methods=["POST"], endpoint=self._drop_data_for(target))]
+            + [
+                Rule(rule, methods=[method], endpoint=handler)
+                for method, rule, handler in _ROUTES[target]
+            ]
+        )
+        behaviour = self._behaviours[target]
+        throttle = self._throttles[target]
+
+        def _app(environ: Dict[str, Any], start_response: Callable[..., Any]) -> Any:
+            request = Request(environ)
+            response = self._respond(target, behaviour, throttle, url_map, request)
+            return response(environ, start_response)
+
+        return _app
+
+    def collector_app(self) -> WSGIApp:
+        """
+        A trace collector, accepting spans posted as {"spans": [...]} to /v1/traces.
+        """
+
+        def _app(environ: Dict[str, Any], start_response: Callable[..., Any]) -> Any:
+            request = Request(environ)
+            if request.method != "POST" or request.path != "/v1/traces":
+                response = _json_response({"message": "Not found"}, 404)
+            else:
+                spans: List[Dict] = _json(request)["spans"]
+                with self.state.lock:
+                    self.state.spans.extend(spans)
+                response = _json_response({"accepted": len(spans)}, 200)
+            return response(environ, start_response)
+
+        return _app
+
+    def transports(self) -> Dict[str, httpx.BaseTransport]:
+        return {target: httpx.WSGITransport(app=self.app(target)) for target in TARGETS}
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8100) -> Dict[str, str]:
+        """
+        Serves each target on its own port from port upwards, followed by the trace
+        collector, in background threads. Returns the URL of each by its
+        configuration key.
+        """
+        apps: Dict[str, WSGIApp] = {
+            config_key: self.app(target) for target, config_key in TARGETS.items()
+        }
+        apps["TRACE_EXPORT_URL"] = self.collector_app()
+        urls: Dict[str, str] = {}
+        for i, (config_key, app) in enumerate(apps.items()):
+            server = make_server(host, port + i, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+            urls[config_key] = f"http://{host}:{port + i}"
+        urls["TRACE_EXPORT_URL"] += "/v1/traces"
+        return urls
+
+    def shutdown(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+        self._servers.clear()
+
+    def _drop_data_for(self, target: str) -> Handler:
+        def _drop_data(state: StandInState, request: Request) -> JsonResponse:
+            deleted: Dict[str, int] = {}
+            with state.lock:
+                for collection in _OWNED_COLLECTIONS.get(target, ()):
+                    deleted[collection] = len(state.collections[collection])
+                    state.collections[collection].clear()
+            return deleted, 200
+
+        return _drop_data
+
+    def _respond(
+        self,
+        target: str,
+        behaviour: Behaviour,
+        throttle: _Throttle,
+        url_map: Map,
+        request: Request,
+    ) -> Response:
+        try:
+            rule, args = url_map.bind_to_environ(request.environ).match(
+                return_rule=True
+            )
+        except HTTPException as e:
+            return _json_response({"message": e.description}, e.code or 500)
+        with self.state.lock:
+            self.state.request_counts[(target, f"{request.method} {rule.rule}")] += 1
+
+        if not throttle.wait():
+            return _json_response({"message": "Too many requests"}, 429, retry_after=1)
+        if behaviour.latency_sec:
+            time.sleep(behaviour.latency_sec)
+        with self._random_lock:
+            failed = self._random.random() < behaviour.error_rate
+        if failed:
+            return _json_response({"message": "Service unavailable"}, 503)
+
+        try:
+            body, status = rule.endpoint(self.state, request, **args)
+        except HTTPException as e:
+            return _json_response({"message": e.description}, e.code or 500)
+        return _json_response(body, status)
+
+
+class PostgresStandIn:
+    """
+    A stand-in for the Postgres server holding the targets' databases, for snapshot
+    resets. The database of a target, named after it with hyphens, is its collections
+    in the StandInState; any other database holds a copy of a target's collections.
+    connect() returns a DB-API-like connection understanding only the statements
+    issued by snapshot resets, which are recorded.
+    """
+
+    def __init__(self, state: StandInState) -> None:
+        self.state = state
+        self.copies: Dict[str, Dict[str, Dict[str, Dict]]] = {}
+        self.statements: List[str] = []
+
+    def connect(self) -> "_StandInConnection":
+        return _StandInConnection(self)
+
+    def execute(self, sql: str, params: Tuple = ()) -> Optional[Tuple]:
+        self.statements.append(sql)
+        if sql == "SELECT 1 FROM pg_database WHERE datname = %s":
+            return (1,) if self._exists(params[0]) else None
+        if match := re.fullmatch(r'DROP DATABASE IF EXISTS "([^"]+)"', sql):
+            self._drop(match[1])
+        elif match := re.fullmatch(
+            r'CREATE DATABASE "([^"]+)" TEMPLATE "([^"]+)"', sql
+        ):
+            self._create(match[1], match[2])
+        elif not sql.startswith(("ALTER DATABASE", "SELECT pg_terminate_backend")):
+            raise ValueError(f"Unsupported statement {sql}")
+        return None
+
+    def _target(self, database: str) -> Optional[str]:
+        target = database.replace("-", "_")
+        return target if target in _OWNED_COLLECTIONS else None
+
+    def _exists(self, database: str) -> bool:
+        return self._target(database) is not None or database in self.copies
+
+    def _drop(self, database: str) -> None:
+        target = self._target(database)
+        with self.state.lock:
+            if target is None:
+                self.copies.pop(database, None)
+                return
+            for collection in _OWNED_COLLECTIONS[target]:
+                self.state.collections[collection].clear()
+
+    def _create(self, database: str, template: str) -> None:
+        template_target = self._target(template)
+        with self.state.lock:
+            collections: Dict[str, Dict[str, Dict]] = copy.deepcopy(
+                {
+                    c: self.state.collections[c]
+                    for c in _OWNED_COLLECTIONS[template_target]
+                }
+                if template_target is not None
+                else self.copies[template]
+            )
+            target = self._target(database)
+            if target is None:
+                self.copies[database] = collections
+            else:
+                self.state.collections.update(collections)
+
+
+class _StandInConnection:
+    def __init__(self, server: PostgresStandIn) -> None:
+        self._server = server
+        self.autocommit = False
+        self._result: Optional[Tuple] = None
+
+    def cursor(self) -> "_StandInConnection":
+        return self
+
+    def execute(self, sql: str, params: Tuple = ()) -> None:
+        if not self.autocommit:
+            raise ValueError("Database statements must be run with autocommit")
+        self._result = self._server.execute(sql, params)
+
+    def fetchone(self) -> Optional[Tuple]:
+        return self._result
+
+    def close(self) -> None:
+        pass
+
+
+def _json_response(
+    body: Any, status: int, retry_after: Optional[int] = None
+) -> Response:
+    response = Response(json.dumps(body), status=status, mimetype="application/json")
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--max-rps", type=float, default=0)
+    parser.add_argument("--reject-when-saturated", action="store_true")
+    args = parser.parse_args()
+
+    cluster = StandInCluster(
+        Behaviour(
+            latency_sec=args.latency,
+            error_rate=args.error_rate,
+            max_requests_per_sec=args.max_rps,
+            reject_when_saturated=args.reject_when_saturated,
+        )
+    )
+    for config_key, url in cluster.serve(args.host, args.port).items():
+        print(f"export {config_key}={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        cluster.shutdown()
+
+
+if __name__ == "__main__":
+    main()
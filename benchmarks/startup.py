@@ -0,0 +1,138 @@
+"""
+Benchmarks of the janitor's startup, measuring the time taken to import the app and
+to create it.
+
+Each run is in a fresh process, so that nothing is already imported. Startup is
+measured both cold, with an empty OpenAPI cache as in a fresh replica, and warm, as
+when a replica restarts. Results are written as JSON and compared with a stored baseline
+like the reset benchmarks.
+
+    python -m benchmarks.startup --output results.json
+    python -m benchmarks.startup --update-baseline
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BASELINE_PATH = Path(__file__).parent / "startup_baseline.json"
+
+# Relative increase over the baseline that counts as a regression, by measurement.
+# Imports are timed to the millisecond, so are noisier than the other benchmarks.
+DEFAULT_TOLERANCES: Dict[str, float] = {
+    "import_sec": 0.5,
+    "create_app_sec": 0.5,
+    "total_sec": 0.5,
+}
+
+
+def measure_startup(cache_dir: str) -> Dict[str, float]:
+    """
+    Imports and creates the app, in the current process. Must be called in a fresh
+    process for the import to be measured.
+    """
+    # Read by the janitor's configuration, so must be set before importing it.
+    os.environ["OPENAPI_CACHE_DIR"] = cache_dir
+    logging.disable(logging.INFO)
+
+    started = time.perf_counter()
+    import dhos_janitor_api.app
+
+    imported = time.perf_counter()
+    dhos_janitor_api.app.create_app(testing=True)
+    created = time.perf_counter()
+    return {
+        "import_sec": imported - started,
+        "create_app_sec": created - imported,
+        "total_sec": created - started,
+    }
+
+
+def _median(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    return {
+        measurement: round(statistics.median(r[measurement] for r in runs), 3)
+        for measurement in DEFAULT_TOLERANCES
+    }
+
+
+def run_all(repeat: int = 5) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    cold: List[Dict[str, float]] = []
+    warm: List[Dict[str, float]] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for i in range(repeat):
+            print(f"Running {i + 1} of {repeat}...", file=sys.stderr)
+            # Each cold run has an empty cache, which the warm run after it then uses.
+            cache_dir = str(Path(temp_dir) / str(i))
+            for runs in (cold, warm):
+                with context.Pool(1) as pool:
+                    runs.append(pool.apply(measure_startup, (cache_dir,)))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "cases": {"cold": _median(cold), "warm": _median(warm)},
+    }
+
+
+def _summary(results: Dict[str, Any]) -> str:
+    lines = [f"{'case':<10}{'import s':>12}{'create s':>12}{'total s':>12}"]
+    for name, result in results["cases"].items():
+        lines.append(
+            f"{name:<10}{result['import_sec']:>12.3f}"
+            f"{result['create_app_sec']:>12.3f}{result['total_sec']:>12.3f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    # Imported here rather than at the top, as run_all's processes import this module
+    # and anything imported already would not be counted in the startup time.
+    from benchmarks.reset import compare
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", type=Path, help="Write results to this file")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Record the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Override the tolerance for all measurements, e.g. 1.0 for +100%%",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run_all(repeat=args.repeat)
+    print(_summary(results))
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        return
+
+    tolerances: Dict[str, float] = dict(DEFAULT_TOLERANCES)
+    if args.tolerance is not None:
+        tolerances = {k: args.tolerance for k in tolerances}
+    regressions = compare(results, json.loads(args.baseline.read_text()), tolerances)
+    if regressions:
+        print("\nREGRESSIONS:\n" + "\n".join(regressions), file=sys.stderr)
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,13 @@ import os
 from waitress import serve
 
 from .app import create_app
+from .blueprint_api.controller import shard_controller
 
 SERVER_PORT = os.getenv("SERVER_PORT", 5000)
 
 
 if __name__ == "__main__":
     app = create_app()
+    # Replicas sharing a shard store post the shards of each other's resets.
+    shard_controller.start_worker(app)
     serve(app, host="0.0.0.0", port=SERVER_PORT)
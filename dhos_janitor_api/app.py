@@ -9,6 +9,7 @@ from flask_batteries_included.config import is_not_production_environment
 from dhos_janitor_api import blueprint_api
 from dhos_janitor_api.config import init_config
 from dhos_janitor_api.helpers.cli import add_cli_command
+from dhos_janitor_api.helpers.openapi import load_spec
 
 
 def create_app(testing: bool = False) -> Flask:
@@ -18,7 +19,9 @@ def create_app(testing: bool = False) -> Flask:
         specification_dir=openapi_dir,
         options={"swagger_ui": is_not_production_environment()},
     )
-    connexion_app.add_api("openapi.yaml", strict_validation=True)
+    connexion_app.add_api(
+        load_spec(openapi_dir / "openapi.yaml"), strict_validation=True
+    )
     app: Flask = fbi_augment_app(app=connexion_app.app, use_auth0=True, testing=testing)
 
     init_config(app)
@@ -1,4 +1,5 @@
-from typing import Optional
+from pathlib import Path
+from typing import Dict, List, Optional
 
 from flask import Blueprint, Response, current_app, jsonify, make_response, request
 from flask_batteries_included.helpers.error_handler import EntityNotFoundException
@@ -6,14 +7,22 @@ from flask_batteries_included.helpers.security import protected_route
 from flask_batteries_included.helpers.security.endpoint_security import key_present
 from she_logging import logger
 
-from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.blueprint_api.client import ClientRepository, circuit_breaker
 from dhos_janitor_api.blueprint_api.controller import (
     auth_controller,
+    plan_controller,
     populate_controller,
     reset_controller,
+    shard_controller,
 )
-from dhos_janitor_api.helpers import cache
+from dhos_janitor_api.helpers import cache, profiling
 from dhos_janitor_api.helpers.cache import TaskStatus
+from dhos_janitor_api.helpers.environment import (
+    DEFAULT,
+    Environment,
+    active,
+    get_environment,
+)
 
 api_blueprint = Blueprint("api", __name__)
 
@@ -26,6 +35,8 @@ def create_reset_task(
     num_send_patients: int,
     num_hospitals: Optional[int] = None,
     num_wards: Optional[int] = None,
+    profile: bool = False,
+    environment: str = DEFAULT,
 ) -> Response:
     """---
     post:
@@ -73,6 +84,24 @@ def create_reset_task(
           schema:
             type: integer
             example: 2
+        - name: profile
+          in: query
+          required: false
+          description: >-
+              Profile the task with cProfile. The profile can be downloaded from
+              /dhos/v1/task/{task_id}/profile once the task has finished.
+          schema:
+            type: boolean
+            default: false
+        - name: environment
+          in: query
+          required: false
+          description: >-
+              Name of the environment, from ENVIRONMENTS, to run the task against.
+              Tasks against different environments can run at the same time.
+          schema:
+            type: string
+            default: default
       requestBody:
         description: JSON body containing the observation set
         required: false
@@ -103,7 +132,7 @@ def create_reset_task(
         raise PermissionError("Cannot drop data in this environment")
 
     # Raise a DuplicateResourceException if there's an ongoing task.
-    cache.check_no_ongoing_tasks()
+    cache.check_no_ongoing_tasks(environment)
     product_settings = {
         "GDM": {"number_of_patients": num_gdm_patients},
         "DBM": {"number_of_patients": num_dbm_patients},
@@ -115,6 +144,8 @@ def create_reset_task(
         product_settings=product_settings,
         num_hospitals=num_hospitals,
         num_wards=num_wards,
+        profile=profile,
+        environment_name=environment,
     )
 
     response: Response = make_response("", 202)
@@ -122,6 +153,231 @@ def create_reset_task(
     return response
 
 
+@api_blueprint.route("/dhos/v1/fanout_reset_task", methods=["POST"])
+@protected_route(key_present("system_id"))
+def create_fanout_reset_task(
+    environments: List[str],
+    num_gdm_patients: int,
+    num_dbm_patients: int,
+    num_send_patients: int,
+    num_hospitals: Optional[int] = None,
+    num_wards: Optional[int] = None,
+) -> Response:
+    """---
+    post:
+      summary: Create reset tasks across environments
+      description: >-
+          Starts a reset task against each of the given environments, as for the
+          reset task endpoint. The tasks run concurrently, each with its own limits on
+          requests to its environment's microservices. Nothing is started if any of
+          the environments is unknown or already has a task in progress. Responds with
+          an HTTP 202 and the location of each environment's task - subsequent HTTP
+          GET requests to these URLs will provide the status of the tasks.
+      tags: [task]
+      parameters:
+        - name: environments
+          in: query
+          required: true
+          description: Comma-separated names of the environments to reset
+          style: form
+          explode: false
+          schema:
+            type: array
+            items:
+              type: string
+            example: [qa1, qa2]
+        - name: num_gdm_patients
+          in: query
+          required: false
+          description: Number of GDM patients to create
+          schema:
+            type: integer
+            default: 12
+        - name: num_dbm_patients
+          in: query
+          required: false
+          description: Number of DBM patients to create
+          schema:
+            type: integer
+            default: 18
+        - name: num_send_patients
+          in: query
+          required: false
+          description: Number of SEND patients to create
+          schema:
+            type: integer
+            default: 12
+        - name: num_hospitals
+          in: query
+          required: false
+          description: Number of hospitals to create
+          schema:
+            type: integer
+            example: 2
+        - name: num_wards
+          in: query
+          required: false
+          description: Number of wards to create
+          schema:
+            type: integer
+            example: 2
+      requestBody:
+        description: JSON body containing the reset request
+        required: false
+        content:
+          application/json:
+            schema:
+              oneOf:
+                - $ref: '#/components/schemas/ResetRequest'
+      responses:
+        '202':
+          description: Resets started
+          content:
+            application/json:
+              schema: FanoutResetResponse
+        '409':
+          description: Reset already in progress in one of the environments
+        default:
+          description: >-
+              Error, e.g. 400 Bad Request, 503 Service Unavailable
+          content:
+            application/json:
+              schema: Error
+    """
+    if not current_app.config["ALLOW_DROP_DATA"]:
+        raise PermissionError("Cannot drop data in this environment")
+
+    product_settings = {
+        "GDM": {"number_of_patients": num_gdm_patients},
+        "DBM": {"number_of_patients": num_dbm_patients},
+        "SEND": {"number_of_patients": num_send_patients},
+    }
+    task_uuids: Dict[str, str] = reset_controller.start_fanout_reset_threads(
+        environment_names=environments,
+        reset_details=request.json if request.is_json else {},
+        product_settings=product_settings,
+        num_hospitals=num_hospitals,
+        num_wards=num_wards,
+    )
+    return make_response(
+        jsonify(
+            {
+                "tasks": {
+                    name: f"/dhos/v1/task/{task_uuid}"
+                    for name, task_uuid in task_uuids.items()
+                }
+            }
+        ),
+        202,
+    )
+
+
+@api_blueprint.route("/dhos/v1/reset_plan", methods=["POST"])
+@protected_route(key_present("system_id"))
+def create_reset_plan(
+    num_gdm_patients: int,
+    num_dbm_patients: int,
+    num_send_patients: int,
+    num_hospitals: Optional[int] = None,
+    num_wards: Optional[int] = None,
+    environment: str = DEFAULT,
+) -> Response:
+    """---
+    post:
+      summary: Plan reset
+      description: >-
+          Estimates the requests that a reset task with the same parameters and
+          request body would make, and how long it would take, without resetting
+          anything. Lists the services that would be reset in order, with the
+          requests made to each downstream service while resetting each. Durations are
+          based on the mean latency of the requests made to each downstream service
+          by previous resets of the environment.
+      tags: [task]
+      parameters:
+        - name: num_gdm_patients
+          in: query
+          required: false
+          description: Number of GDM patients to create
+          schema:
+            type: integer
+            default: 12
+        - name: num_dbm_patients
+          in: query
+          required: false
+          description: Number of DBM patients to create
+          schema:
+            type: integer
+            default: 18
+        - name: num_send_patients
+          in: query
+          required: false
+          description: Number of SEND patients to create
+          schema:
+            type: integer
+            default: 12
+        - name: num_hospitals
+          in: query
+          required: false
+          description: Number of hospitals to create
+          schema:
+            type: integer
+            example: 2
+        - name: num_wards
+          in: query
+          required: false
+          description: Number of wards to create
+          schema:
+            type: integer
+            example: 2
+        - name: environment
+          in: query
+          required: false
+          description: Name of the environment, from ENVIRONMENTS, to plan a reset of.
+          schema:
+            type: string
+            default: default
+      requestBody:
+        description: JSON body containing the reset request
+        required: false
+        content:
+          application/json:
+            schema:
+              oneOf:
+                - $ref: '#/components/schemas/ResetRequest'
+      responses:
+        '200':
+          description: Reset plan
+          content:
+            application/json:
+              schema: ResetPlanResponse
+        default:
+          description: >-
+              Error, e.g. 400 Bad Request, 503 Service Unavailable
+          content:
+            application/json:
+              schema: Error
+    """
+    product_settings = {
+        "GDM": {"number_of_patients": num_gdm_patients},
+        "DBM": {"number_of_patients": num_dbm_patients},
+        "SEND": {"number_of_patients": num_send_patients},
+    }
+    location_config: Optional[Dict] = None
+    if num_hospitals and num_wards:
+        location_config = {"hospitals": num_hospitals, "wards": num_wards}
+    plan_environment: Environment = get_environment(environment)
+    with active(plan_environment):
+        plan: Dict = plan_controller.plan_reset(
+            clients=ClientRepository.from_app(
+                current_app, environment=plan_environment
+            ),
+            reset_request=request.json if request.is_json else {},
+            product_settings=product_settings,
+            location_config=location_config,
+        )
+    return jsonify(plan)
+
+
 @api_blueprint.route("/dhos/v1/task/{task_id}", methods=["GET"])
 @protected_route(key_present("system_id"))
 def get_task(task_id: str) -> Response:
@@ -130,7 +386,11 @@ def get_task(task_id: str) -> Response:
       summary: Get task results
       description: >-
           Gets the result of a task by UUID. Responds with either a 202 if the task is ongoing,
-          a 200 if it has completed, or a 400 if it has failed.
+          a 200 if it has completed, or a 400 if it has failed. The response lists any
+          targets whose circuit breaker is not closed, i.e. which are failing. Once the
+          task has completed, it also includes the time taken by each stage of the task.
+          If population is sharded across replicas, it includes the progress of the
+          shards of each sharded stage.
       tags: [task]
       parameters:
         - name: task_id
@@ -143,8 +403,14 @@ def get_task(task_id: str) -> Response:
       responses:
         '200':
           description: Task complete
+          content:
+            application/json:
+              schema: TaskStatusResponse
         '202':
           description: Task ongoing
+          content:
+            application/json:
+              schema: TaskStatusResponse
         '400':
           description: Task error
         default:
@@ -155,33 +421,231 @@ def get_task(task_id: str) -> Response:
               schema: Error
     """
     logger.info("Getting status of task with UUID %s", task_id)
-    logger.debug(
-        "%d known tasks",
-        len(cache.known_tasks),
-        extra={"tasks": {k: str(v) for k, v in cache.known_tasks.items()}},
-    )
     if task_id not in cache.known_tasks:
         logger.info("Task %s unknown", task_id)
         raise EntityNotFoundException(f"Task not found with UUID {task_id}")
 
     status: TaskStatus = cache.known_tasks[task_id]
+    # Only the breakers of the task's own environment concern it.
+    task_environment = Environment(cache.task_environments.get(task_id, DEFAULT))
+    failing_targets: Dict[str, Dict] = {
+        **circuit_breaker.breaker_states(
+            circuit_breaker.BreakerState.OPEN, task_environment
+        ),
+        **circuit_breaker.breaker_states(
+            circuit_breaker.BreakerState.HALF_OPEN, task_environment
+        ),
+    }
+    shard_store: Optional[shard_controller.ShardStore] = shard_controller.from_config()
+    shards: Dict[str, Dict] = shard_store.progress(task_id) if shard_store else {}
     if status == TaskStatus.COMPLETE:
         logger.info("Task %s complete", task_id)
-        return make_response("", 200)
+        return make_response(
+            jsonify(
+                {
+                    "failing_targets": failing_targets,
+                    "timings": cache.task_timings.get(task_id),
+                    **({"shards": shards} if shards else {}),
+                }
+            ),
+            200,
+        )
     if status == TaskStatus.ERROR:
         logger.info("Task %s error", task_id)
-        raise ValueError(f"Task with UUID {task_id} has errored")
+        message = f"Task with UUID {task_id} has errored"
+        if failing_targets:
+            message += f" (circuit open for {', '.join(sorted(failing_targets))})"
+        raise ValueError(message)
 
     # If we got this far, the task still has status RUNNING.
     logger.info("Task %s still running", task_id)
+    response: Response = make_response(
+        jsonify(
+            {
+                "failing_targets": failing_targets,
+                **({"shards": shards} if shards else {}),
+            }
+        ),
+        202,
+    )
+    response.headers["Location"] = f"/dhos/v1/task/{task_id}"
+    return response
+
+
+@api_blueprint.route("/dhos/v1/task/{task_id}/resume", methods=["POST"])
+@protected_route(key_present("system_id"))
+def resume_reset_task(task_id: str, profile: bool = False) -> Response:
+    """---
+    post:
+      summary: Resume reset task
+      description: >-
+          Resumes a failed reset task from its last checkpoint, skipping the targets
+          already dropped and repopulated and the patients already posted. The task
+          keeps its UUID. Responds with an HTTP 202 and a Location header - subsequent
+          HTTP GET requests to this URL will provide the status of the task.
+      tags: [task]
+      parameters:
+        - name: task_id
+          in: path
+          required: true
+          description: Task UUID
+          schema:
+            type: string
+            example: "bc61563a-2573-48e6-b5c9-1e9a21d06de6"
+        - name: profile
+          in: query
+          required: false
+          description: >-
+              Profile the resumed task with cProfile. The profile can be downloaded
+              from /dhos/v1/task/{task_id}/profile once the task has finished.
+          schema:
+            type: boolean
+            default: false
+      responses:
+        '202':
+          description: Reset resumed
+          headers:
+            Location:
+              description: The location of the task
+              schema:
+                type: string
+                example: /dhos/v1/task/2c4f1d24-2952-4d4e-b1d1-3637e33cc161
+        '409':
+          description: A task is already in progress
+        default:
+          description: >-
+              Error, e.g. 404 Not Found if the task has no checkpoint, 503 Service
+              Unavailable
+          content:
+            application/json:
+              schema: Error
+    """
+    if not current_app.config["ALLOW_DROP_DATA"]:
+        raise PermissionError("Cannot drop data in this environment")
+
+    # Raises a DuplicateResourceException if there's an ongoing task.
+    reset_controller.resume_reset_thread(task_uuid=task_id, profile=profile)
+
     response: Response = make_response("", 202)
     response.headers["Location"] = f"/dhos/v1/task/{task_id}"
     return response
 
 
+@api_blueprint.route("/dhos/v1/task/{task_id}/profile", methods=["GET"])
+@protected_route(key_present("system_id"))
+def get_task_profile(task_id: str, format: str = "pstats") -> Response:
+    """---
+    get:
+      summary: Get task profile
+      description: >-
+          Gets the cProfile profile of a finished task started with profile=true. By
+          default the raw profile is returned for loading with pstats or a viewer such
+          as snakeviz; with format=text, the functions with the highest cumulative
+          time are listed instead. Only the task's own thread is profiled, so work done
+          by concurrent workers shows up as time spent waiting for them.
+      tags: [task]
+      parameters:
+        - name: task_id
+          in: path
+          required: true
+          description: Task UUID
+          schema:
+            type: string
+            example: "bc61563a-2573-48e6-b5c9-1e9a21d06de6"
+        - name: format
+          in: query
+          required: false
+          description: Format of the profile
+          schema:
+            type: string
+            enum: [pstats, text]
+            default: pstats
+      responses:
+        '200':
+          description: Task profile
+          content:
+            application/octet-stream:
+              schema:
+                type: string
+                format: binary
+            text/plain:
+              schema:
+                type: string
+        default:
+          description: >-
+              Error, e.g. 404 Not Found, 503 Service Unavailable
+          content:
+            application/json:
+              schema: Error
+    """
+    path: Path = profiling.profile_path(current_app.config["PROFILE_DIR"], task_id)
+    if task_id not in cache.known_tasks or not path.is_file():
+        raise EntityNotFoundException(f"Profile not found for task with UUID {task_id}")
+
+    if format == "text":
+        return make_response(
+            profiling.summary(path), 200, {"Content-Type": "text/plain"}
+        )
+    return make_response(
+        path.read_bytes(),
+        200,
+        {
+            "Content-Type": "application/octet-stream",
+            "Content-Disposition": f"attachment; filename={path.name}",
+        },
+    )
+
+
+@api_blueprint.route("/dhos/v1/target_health", methods=["GET"])
+@protected_route(key_present("system_id"))
+def get_target_health() -> Response:
+    """---
+    get:
+      summary: Get target health
+      description: >-
+          Gets the circuit breaker state of each target microservice. A target's circuit
+          opens after repeated failed requests, after which requests to it fail
+          immediately until a probe request succeeds.
+      tags: [task]
+      responses:
+        '200':
+          description: Circuit breaker state by target
+          content:
+            application/json:
+              schema:
+                type: object
+                additionalProperties:
+                  $ref: '#/components/schemas/CircuitBreakerState'
+        default:
+          description: >-
+              Error, e.g. 503 Service Unavailable
+          content:
+            application/json:
+              schema: Error
+    """
+    known: Dict[str, Dict] = circuit_breaker.breaker_states()
+    return jsonify(
+        {
+            target: known.get(
+                target,
+                {
+                    "state": circuit_breaker.BreakerState.CLOSED.value,
+                    "consecutive_failures": 0,
+                },
+            )
+            for target in current_app.config["ALL_TARGETS"]
+        }
+    )
+
+
 @api_blueprint.route("/dhos/v1/populate_gdm_task", methods=["POST"])
 @protected_route(key_present("system_id"))
-def populate_gdm_data(days: int = 1, use_system_jwt: bool = False) -> Response:
+def populate_gdm_data(
+    days: int = 1,
+    use_system_jwt: bool = False,
+    profile: bool = False,
+    environment: str = DEFAULT,
+) -> Response:
     """
     ---
     post:
@@ -208,6 +672,24 @@ def populate_gdm_data(days: int = 1, use_system_jwt: bool = False) -> Response:
           schema:
             type: boolean
             default: false
+        - name: profile
+          in: query
+          required: false
+          description: >-
+              Profile the task with cProfile. The profile can be downloaded from
+              /dhos/v1/task/{task_id}/profile once the task has finished.
+          schema:
+            type: boolean
+            default: false
+        - name: environment
+          in: query
+          required: false
+          description: >-
+              Name of the environment, from ENVIRONMENTS, to run the task against.
+              Tasks against different environments can run at the same time.
+          schema:
+            type: string
+            default: default
       responses:
         '202':
           description: Reset started
@@ -227,10 +709,13 @@ def populate_gdm_data(days: int = 1, use_system_jwt: bool = False) -> Response:
               schema: Error
     """
     # Raise a DuplicateResourceException if there's an ongoing task.
-    cache.check_no_ongoing_tasks()
+    cache.check_no_ongoing_tasks(environment)
 
     task_uuid: str = populate_controller.start_populate_gdm_thread(
-        days=days, use_system_jwt=use_system_jwt
+        days=days,
+        use_system_jwt=use_system_jwt,
+        profile=profile,
+        environment_name=environment,
     )
 
     response: Response = make_response("", 202)
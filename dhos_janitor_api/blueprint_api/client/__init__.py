@@ -1,8 +1,38 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import Any, Mapping, Optional
 
 import httpx
 from flask import Flask
 
+from dhos_janitor_api.blueprint_api.client.circuit_breaker import (
+    CircuitBreaker,
+    get_breaker,
+)
+from dhos_janitor_api.blueprint_api.client.limiter import AdaptiveLimiter, get_limiter
+from dhos_janitor_api.blueprint_api.client.retry import RetryBudget
+from dhos_janitor_api.helpers.environment import DEFAULT, Environment
+
+
+class TargetClient(httpx.Client):
+    """
+    An httpx client for one of the downstream targets, carrying the state used by
+    make_request to apply per-target policies.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        retry_budget: RetryBudget,
+        limiter: Optional[AdaptiveLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.target = target
+        self.retry_budget = retry_budget
+        self.limiter = limiter
+        self.breaker = breaker
+
 
 @dataclass(frozen=True)
 class ClientRepository:
@@ -26,10 +56,35 @@ class ClientRepository:
     send_bff: httpx.Client
 
     @classmethod
-    def from_app(cls, app: Flask) -> "ClientRepository":
+    def from_app(
+        cls,
+        app: Flask,
+        transports: Optional[Mapping[str, httpx.BaseTransport]] = None,
+        environment: Environment = Environment(DEFAULT),
+    ) -> "ClientRepository":
+        """
+        Creates a client for each target in the environment. Transports can be given
+        by target to send requests somewhere other than over the network, e.g. to a
+        WSGI app.
+        """
+        # The retry budget is shared by every target, so it caps retries per task.
+        # Limiters and circuit breakers are shared across the process, as they protect
+        # and track the health of the target itself, so are per environment.
+        retry_budget = RetryBudget(app.config["HTTP_RETRY_BUDGET"])
         return cls(
             **{
-                k: httpx.Client(base_url=app.config[v])
+                k: TargetClient(
+                    target=k,
+                    retry_budget=retry_budget,
+                    limiter=get_limiter(k, environment.qualify(k)),
+                    breaker=get_breaker(environment.qualify(k)),
+                    base_url=environment.overrides.get(v, app.config[v]),
+                    transport=(transports or {}).get(k),
+                )
                 for k, v in app.config["ALL_TARGETS"].items()
             }
         )
+
+    def close(self) -> None:
+        for field in fields(self):
+            getattr(self, field.name).close()
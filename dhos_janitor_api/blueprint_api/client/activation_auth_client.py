@@ -44,6 +44,7 @@ def create_device(
             "description": f"static device {device_id}",
         },
         headers={"Authorization": f"Bearer {system_jwt}"},
+        existing_url="/dhos/v1/device/{uuid}",
     )
     return response.json()
 
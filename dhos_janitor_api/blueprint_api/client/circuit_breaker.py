@@ -0,0 +1,150 @@
+import threading
+import time
+from enum import Enum
+from typing import Dict, Optional
+
+from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
+from she_logging import logger
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import metrics
+from dhos_janitor_api.helpers.environment import Environment
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenException(ServiceUnavailableException):
+    """
+    Raised instead of sending a request to a target whose circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails requests to a target fast once it has failed failure_threshold times in a
+    row. After reset_timeout_sec a single probe request is let through (half-open):
+    if it succeeds the circuit closes, otherwise it opens again.
+    """
+
+    def __init__(
+        self, target: str, failure_threshold: int, reset_timeout_sec: float
+    ) -> None:
+        self.target = target
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_sec = reset_timeout_sec
+        self._state = BreakerState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    def before_request(self) -> None:
+        """
+        Raises CircuitOpenException if the request should not be sent.
+        """
+        with self._lock:
+            if self._state == BreakerState.CLOSED:
+                return
+            if (
+                self._state == BreakerState.OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout_sec
+            ):
+                logger.info("Circuit for %s half-open, sending probe", self.target)
+                self._set_state(BreakerState.HALF_OPEN)
+                self._probe_in_flight = False
+            if self._state == BreakerState.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+        raise CircuitOpenException(
+            f"Circuit open for {self.target} after "
+            f"{self._consecutive_failures} consecutive failures"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != BreakerState.CLOSED:
+                logger.info("Circuit for %s closed", self.target)
+            self._set_state(BreakerState.CLOSED)
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if (
+                self._state == BreakerState.HALF_OPEN
+                or self._consecutive_failures >= self.failure_threshold
+            ):
+                if self._state != BreakerState.OPEN:
+                    logger.warning(
+                        "Circuit for %s opened after %d consecutive failures",
+                        self.target,
+                        self._consecutive_failures,
+                    )
+                self._set_state(BreakerState.OPEN)
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def _set_state(self, state: BreakerState) -> None:
+        self._state = state
+        metrics.CIRCUIT_BREAKER_OPEN.labels(self.target).set(
+            1 if state == BreakerState.OPEN else 0
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self._state.value,
+            "consecutive_failures": self._consecutive_failures,
+        }
+
+
+# Breakers track the health of a downstream service, so they are shared by every
+# task in the process rather than belonging to a single client repository.
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(target: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if target not in _breakers:
+            _breakers[target] = CircuitBreaker(
+                target=target,
+                failure_threshold=Configuration.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout_sec=Configuration.CIRCUIT_BREAKER_RESET_SEC,
+            )
+        return _breakers[target]
+
+
+def breaker_states(
+    state: Optional[BreakerState] = None,
+    environment: Optional[Environment] = None,
+) -> Dict[str, Dict]:
+    """
+    Returns the state of every known breaker, optionally only those in a given state.
+    Given an environment, only its breakers are returned, keyed by target.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    states: Dict[str, Dict] = {}
+    for b in breakers:
+        if state is not None and b.state != state:
+            continue
+        key: Optional[str] = b.target
+        if environment is not None:
+            key = environment.unqualify(b.target)
+        if key is not None:
+            states[key] = b.to_dict()
+    return states
+
+
+def reset_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
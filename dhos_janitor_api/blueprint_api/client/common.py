@@ -1,9 +1,21 @@
-from typing import Dict, Optional
+import contextlib
+import time
+from typing import Any, Dict, Optional
 
 import httpx
 from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
 from she_logging import logger
 
+from dhos_janitor_api.blueprint_api.client import TargetClient, retry, timeouts
+from dhos_janitor_api.blueprint_api.client.circuit_breaker import CircuitBreaker
+from dhos_janitor_api.blueprint_api.client.limiter import (
+    CONGESTION_STATUS_CODES,
+    AdaptiveLimiter,
+)
+from dhos_janitor_api.helpers import deadline, latency, metrics, tracing
+
+UNKNOWN_TARGET = "unknown"
+
 
 def _log_if_deprecated(response: httpx.Response) -> None:
     if response.headers.get("deprecation", False):
@@ -14,6 +26,68 @@ def _log_if_deprecated(response: httpx.Response) -> None:
         )
 
 
+def _send(
+    client: httpx.Client,
+    target: str,
+    limiter: Optional[AdaptiveLimiter],
+    method: str,
+    url: str,
+    **kwargs: Any,
+) -> httpx.Response:
+    with limiter.acquire() if limiter is not None else contextlib.nullcontext():
+        started = time.monotonic()
+        try:
+            response = client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            elapsed = time.monotonic() - started
+            _record(target, method, "error", elapsed)
+            if limiter is not None:
+                limiter.record(elapsed, congested=True)
+            raise
+        elapsed = time.monotonic() - started
+        _record(target, method, str(response.status_code), elapsed)
+        if limiter is not None:
+            limiter.record(
+                elapsed, congested=response.status_code in CONGESTION_STATUS_CODES
+            )
+        return response
+
+
+def _record(target: str, method: str, status: str, duration_sec: float) -> None:
+    metrics.HTTP_REQUESTS.labels(target, method.lower(), status).inc()
+    metrics.HTTP_REQUEST_DURATION.labels(target, method.lower()).observe(duration_sec)
+    latency.record(target, duration_sec)
+
+
+def _send_through_breaker(
+    client: httpx.Client,
+    target: str,
+    breaker: Optional[CircuitBreaker],
+    limiter: Optional[AdaptiveLimiter],
+    method: str,
+    url: str,
+    **kwargs: Any,
+) -> httpx.Response:
+    if breaker is None:
+        return _send(client, target, limiter, method, url, **kwargs)
+
+    # Raises CircuitOpenException without sending anything if the target is down.
+    breaker.before_request()
+    failed = True
+    try:
+        response = _send(client, target, limiter, method, url, **kwargs)
+        # Client errors are the request's fault rather than the target's.
+        failed = response.is_server_error
+        return response
+    finally:
+        # Recorded however the request ends, including on errors raised before it was
+        # sent, so that a half-open breaker's probe is always released.
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+
 def make_request(
     *,
     client: httpx.Client,
@@ -22,13 +96,139 @@ def make_request(
     json: Optional[Dict] = None,
     params: Optional[Dict] = None,
     headers: Optional[Dict] = None,
+    operation: Optional[str] = None,
+    existing_url: Optional[str] = None,
 ) -> httpx.Response:
-    try:
-        response = client.request(
-            method, url, json=json, params=params, headers=headers, timeout=60
+    """
+    Makes a request to a target, applying its timeouts, retry policy, limiter and
+    circuit breaker. The operation names the kind of request for timeout overrides.
+    Within a trace, the request is traced as a span and the trace context is passed
+    on in a traceparent header.
+
+    A POST carrying a client-side UUID is retried, and if a retry is rejected with a
+    409 an earlier attempt created the entity. The entity is then fetched from
+    existing_url, formatted with its UUID, e.g. "/dhos/v1/patient/{uuid}", and that
+    response returned as if created. Without existing_url the 409 response itself is
+    returned, so callers that read the created entity from the response must give
+    it.
+    """
+    target: str = client.target if isinstance(client, TargetClient) else UNKNOWN_TARGET
+    with tracing.span(
+        f"{method.upper()} {target}",
+        target=target,
+        method=method.upper(),
+        url=url,
+        operation=operation,
+    ) as span:
+        if span is not None:
+            headers = {**(headers or {}), "traceparent": span.traceparent}
+        response = _make_request(
+            client=client,
+            method=method,
+            url=url,
+            json=json,
+            params=params,
+            headers=headers,
+            operation=operation,
+            existing_url=existing_url,
         )
-        _log_if_deprecated(response)
-        response.raise_for_status()
-    except httpx.HTTPError as e:
-        raise ServiceUnavailableException(e)
-    return response
+        tracing.set_attribute("status_code", response.status_code)
+        return response
+
+
+def _make_request(
+    *,
+    client: httpx.Client,
+    method: str,
+    url: str,
+    json: Optional[Dict],
+    params: Optional[Dict],
+    headers: Optional[Dict],
+    operation: Optional[str],
+    existing_url: Optional[str],
+) -> httpx.Response:
+    target: str = UNKNOWN_TARGET
+    retry_budget: Optional[retry.RetryBudget] = None
+    limiter: Optional[AdaptiveLimiter] = None
+    breaker: Optional[CircuitBreaker] = None
+    if isinstance(client, TargetClient):
+        target = client.target
+        retry_budget = client.retry_budget
+        limiter = client.limiter
+        breaker = client.breaker
+
+    policy: retry.RetryPolicy = retry.policy_for(target, method)
+    idempotent_create: bool = retry.is_idempotent_create(method, json)
+    idempotent: bool = method.lower() in retry.IDEMPOTENT_METHODS or idempotent_create
+
+    attempt = 1
+    while True:
+        tracing.set_attribute("attempts", attempt)
+        timeout: httpx.Timeout = timeouts.within_deadline(
+            timeouts.timeout_for(target, operation)
+        )
+        try:
+            response = _send_through_breaker(
+                client,
+                target,
+                breaker,
+                limiter,
+                method,
+                url,
+                json=json,
+                params=params,
+                headers=headers,
+                timeout=timeout,
+            )
+            _log_if_deprecated(response)
+            if attempt > 1 and idempotent_create and response.status_code == 409:
+                # An earlier attempt created the entity before failing.
+                logger.info(
+                    "Create retried against %s %s already exists, treating as created",
+                    method.upper(),
+                    url,
+                )
+                if existing_url is None or json is None:
+                    return response
+                return _make_request(
+                    client=client,
+                    method="get",
+                    url=existing_url.format(uuid=json["uuid"]),
+                    json=None,
+                    params=None,
+                    headers=headers,
+                    operation=operation,
+                    existing_url=None,
+                )
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            reason: Optional[str] = retry.retry_reason(e, idempotent)
+            if reason is None or attempt >= policy.max_attempts:
+                metrics.HTTP_FAILURES.labels(target, method.lower()).inc()
+                raise ServiceUnavailableException(e)
+            if retry_budget is not None and not retry_budget.acquire():
+                logger.warning("Retry budget exhausted, not retrying %s", target)
+                metrics.HTTP_RETRY_BUDGET_EXHAUSTED.labels(target).inc()
+                metrics.HTTP_FAILURES.labels(target, method.lower()).inc()
+                raise ServiceUnavailableException(e)
+
+            delay: float = policy.backoff(attempt, retry.retry_after(e))
+            remaining: Optional[float] = deadline.remaining()
+            if remaining is not None and delay >= remaining:
+                logger.warning("Task deadline reached, not retrying %s", target)
+                metrics.HTTP_FAILURES.labels(target, method.lower()).inc()
+                raise deadline.DeadlineExceededError(e)
+            logger.warning(
+                "Retrying %s %s on %s in %.2fs (attempt %d/%d failed: %s)",
+                method.upper(),
+                url,
+                target,
+                delay,
+                attempt,
+                policy.max_attempts,
+                reason,
+            )
+            metrics.HTTP_RETRIES.labels(target, method.lower(), reason).inc()
+            time.sleep(delay)
+            attempt += 1
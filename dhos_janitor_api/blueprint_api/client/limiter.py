@@ -0,0 +1,142 @@
+import contextlib
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import metrics
+
+# Responses meaning the target is overloaded and we should back off.
+CONGESTION_STATUS_CODES = {429, 503}
+
+
+class AdaptiveLimiter:
+    """
+    Limits requests to a single target, both in flight and per second.
+
+    The in-flight limit adapts AIMD-style: every uncongested response grows it by
+    roughly one per "window" of requests, up to max_in_flight, and a congested response
+    (429/503, a transport error, or latency above latency_target_sec) halves it, at
+    most once per cooldown period, down to min_in_flight.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        max_in_flight: int,
+        requests_per_sec: float = 0,
+        latency_target_sec: float = 0,
+        min_in_flight: int = 1,
+    ) -> None:
+        self.target = target
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_in_flight = max(1, min(min_in_flight, self.max_in_flight))
+        self.requests_per_sec = requests_per_sec
+        self.latency_target_sec = latency_target_sec
+        self._limit: float = float(self.max_in_flight)
+        self._in_flight = 0
+        self._next_slot = 0.0
+        self._last_decrease = 0.0
+        self._cooldown_sec = max(latency_target_sec, 1.0)
+        self._condition = threading.Condition()
+        metrics.HTTP_CONCURRENCY_LIMIT.labels(target).set(self.limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[None]:
+        """
+        Blocks until a request to the target may be sent.
+        """
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            self._wait_for_rate()
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    def record(self, latency_sec: float, congested: bool) -> None:
+        """
+        Adjusts the in-flight limit based on the outcome of a request.
+        """
+        if self.latency_target_sec and latency_sec > self.latency_target_sec:
+            congested = True
+        with self._condition:
+            previous = self.limit
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease >= self._cooldown_sec:
+                    self._limit = max(float(self.min_in_flight), self._limit / 2)
+                    self._last_decrease = now
+            else:
+                self._limit = min(
+                    float(self.max_in_flight), self._limit + 1 / self._limit
+                )
+            if self.limit != previous:
+                metrics.HTTP_CONCURRENCY_LIMIT.labels(self.target).set(self.limit)
+                self._condition.notify_all()
+
+    def _wait_for_rate(self) -> None:
+        if self.requests_per_sec <= 0:
+            return
+        with self._condition:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.requests_per_sec
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def limiter_for(target: str, key: Optional[str] = None) -> AdaptiveLimiter:
+    """
+    Creates a limiter with the target's configured limits, labelled in metrics by key
+    (by default the target).
+    """
+    limits = Configuration.TARGET_LIMITS.get(target, {})
+    return AdaptiveLimiter(
+        target=key or target,
+        max_in_flight=int(
+            limits.get("max_in_flight", Configuration.HTTP_MAX_IN_FLIGHT)
+        ),
+        requests_per_sec=float(
+            limits.get("requests_per_sec", Configuration.HTTP_MAX_REQUESTS_PER_SEC)
+        ),
+        latency_target_sec=float(
+            limits.get("latency_target_sec", Configuration.HTTP_LATENCY_TARGET_SEC)
+        ),
+    )
+
+
+# Limits protect a downstream service, so like circuit breakers they are shared by
+# every task, shard and fan-out reset in the process rather than each having its
+# own, which would multiply the requests the service receives.
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(target: str, key: Optional[str] = None) -> AdaptiveLimiter:
+    """
+    Returns the process's limiter for the target, where key identifies the target
+    across environments (see Environment.qualify) and defaults to the target.
+    """
+    key = key or target
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = limiter_for(target, key)
+        return _limiters[key]
+
+
+def reset_limiters() -> None:
+    with _limiters_lock:
+        _limiters.clear()
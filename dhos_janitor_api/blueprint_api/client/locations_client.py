@@ -31,5 +31,6 @@ def create_location(clients: ClientRepository, location: Dict, system_jwt: str)
         url="/dhos/v1/location",
         json=location,
         headers={"Authorization": f"Bearer {system_jwt}"},
+        existing_url="/dhos/v1/location/{uuid}",
     )
     return response.json()
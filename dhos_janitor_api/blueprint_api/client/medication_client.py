@@ -5,9 +5,11 @@ from cachetools import TTLCache, cached
 from dhos_janitor_api import config
 from dhos_janitor_api.blueprint_api import ClientRepository
 from dhos_janitor_api.blueprint_api.client.common import make_request
+from dhos_janitor_api.helpers import environment
 
 _config = config.Configuration()
-_cache: TTLCache = TTLCache(1, _config.STATIC_DATA_CACHE_TTL_SEC)
+# Keyed by the task's clients, so one entry per concurrent task and environment.
+_cache: TTLCache = TTLCache(16, _config.STATIC_DATA_CACHE_TTL_SEC)
 
 
 @cached(cache=_cache)
@@ -19,8 +21,8 @@ def get_medications(
         method="get",
         url="/dhos/v1/medication",
         headers={
-            "Authorization": _config.POLARIS_API_KEY,
-            "X-Trustomer": _config.CUSTOMER_CODE.lower(),
+            "Authorization": environment.setting("POLARIS_API_KEY"),
+            "X-Trustomer": environment.setting("CUSTOMER_CODE").lower(),
             "X-Product": "gdm",
         },
         params={"tag": medication_tag},
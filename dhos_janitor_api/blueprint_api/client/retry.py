@@ -0,0 +1,115 @@
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+from dhos_janitor_api.config import Configuration
+
+# Responses that indicate the target was temporarily unable to handle the request.
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Methods that can be repeated without changing the outcome.
+IDEMPOTENT_METHODS = {"get", "head", "options", "put", "delete"}
+
+# Errors raised before the request reached the target, so retrying is always safe.
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Jitter uses its own generator so retries don't disturb seeded data generation.
+_jitter = random.Random()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    backoff_sec: float
+    backoff_max_sec: float
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before the next attempt: exponential backoff with full jitter,
+        or the target's Retry-After if it asked for one, capped at backoff_max_sec.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_sec)
+        ceiling = min(self.backoff_max_sec, self.backoff_sec * 2 ** (attempt - 1))
+        return _jitter.uniform(0, ceiling)
+
+
+class RetryBudget:
+    """
+    Caps the total number of retries made through one client repository, so a
+    downstream that is failing outright doesn't turn every request into several.
+    """
+
+    def __init__(self, max_retries: int) -> None:
+        self._remaining = max_retries
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return self._remaining
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+
+def policy_for(target: str, method: str) -> RetryPolicy:
+    """
+    Builds the retry policy for a request. Overrides in TARGET_RETRY_POLICIES are keyed
+    by "<target>:<method>" or "<target>", most specific first.
+    """
+    overrides: Dict[str, Any] = {
+        **Configuration.TARGET_RETRY_POLICIES.get(target, {}),
+        **Configuration.TARGET_RETRY_POLICIES.get(f"{target}:{method.lower()}", {}),
+    }
+    return RetryPolicy(
+        max_attempts=int(
+            overrides.get("max_attempts", Configuration.HTTP_RETRY_MAX_ATTEMPTS)
+        ),
+        backoff_sec=float(
+            overrides.get("backoff_sec", Configuration.HTTP_RETRY_BACKOFF_SEC)
+        ),
+        backoff_max_sec=float(
+            overrides.get("backoff_max_sec", Configuration.HTTP_RETRY_BACKOFF_MAX_SEC)
+        ),
+    )
+
+
+def is_idempotent_create(method: str, json: Optional[Dict]) -> bool:
+    """
+    A POST carrying a client-side UUID creates the same entity however many times it is
+    sent; a repeat is rejected with a 409 rather than creating a duplicate.
+    """
+    return method.lower() == "post" and isinstance(json, dict) and "uuid" in json
+
+
+def retry_reason(error: httpx.HTTPError, idempotent: bool) -> Optional[str]:
+    """
+    Returns a short reason if the failed request can be retried, otherwise None.
+    """
+    if isinstance(error, NOT_SENT_ERRORS):
+        return "connect"
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        # 429 means the request was rejected without being processed.
+        if status_code == 429 or (idempotent and status_code in RETRYABLE_STATUS_CODES):
+            return f"http_{status_code}"
+        return None
+    if idempotent and isinstance(error, httpx.TransportError):
+        return "transport"
+    return None
+
+
+def retry_after(error: httpx.HTTPError) -> Optional[float]:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    try:
+        return float(error.response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
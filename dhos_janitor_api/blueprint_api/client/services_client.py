@@ -49,6 +49,7 @@ def create_patient(
         params={"product_name": product_name},
         json=patient_details,
         headers={"Authorization": f"Bearer {clinician_jwt}"},
+        existing_url="/dhos/v1/patient/{uuid}",
     )
     return response.json()
 
@@ -0,0 +1,47 @@
+from typing import Dict, Optional
+
+import httpx
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import deadline
+
+
+def timeout_for(target: str, operation: Optional[str] = None) -> httpx.Timeout:
+    """
+    Builds the timeouts for a request. Overrides in TARGET_TIMEOUTS are keyed by
+    "<target>", "*:<operation>" or "<target>:<operation>", most specific last.
+    """
+    overrides: Dict[str, float] = {
+        **Configuration.TARGET_TIMEOUTS.get(target, {}),
+    }
+    if operation is not None:
+        overrides.update(Configuration.TARGET_TIMEOUTS.get(f"*:{operation}", {}))
+        overrides.update(Configuration.TARGET_TIMEOUTS.get(f"{target}:{operation}", {}))
+    return httpx.Timeout(
+        connect=float(overrides.get("connect", Configuration.HTTP_TIMEOUT_CONNECT_SEC)),
+        read=float(overrides.get("read", Configuration.HTTP_TIMEOUT_READ_SEC)),
+        write=float(overrides.get("write", Configuration.HTTP_TIMEOUT_WRITE_SEC)),
+        pool=float(overrides.get("pool", Configuration.HTTP_TIMEOUT_POOL_SEC)),
+    )
+
+
+def within_deadline(timeout: httpx.Timeout) -> httpx.Timeout:
+    """
+    Caps each timeout at the time remaining until the task's deadline. Raises
+    DeadlineExceededError if it has already passed.
+    """
+    deadline.check()
+    remaining: Optional[float] = deadline.remaining()
+    if remaining is None:
+        return timeout
+    budget: float = remaining
+
+    def _cap(value: Optional[float]) -> float:
+        return budget if value is None else min(value, budget)
+
+    return httpx.Timeout(
+        connect=_cap(timeout.connect),
+        read=_cap(timeout.read),
+        write=_cap(timeout.write),
+        pool=_cap(timeout.pool),
+    )
@@ -40,6 +40,7 @@ def create_clinician(
         params={"send_welcome_email": False},
         json=clinician_details,
         headers={"Authorization": f"Bearer {system_jwt}"},
+        existing_url="/dhos/v1/clinician/{uuid}",
     )
     return response.json()
 
@@ -2,10 +2,11 @@ import base64
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from auth0_api_client import jwt as auth0_jwt
 from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 from jose import jwt as jose_jwt
 from she_logging import logger
 
@@ -14,31 +15,61 @@ from dhos_janitor_api.blueprint_api.client import (
     activation_auth_client,
 )
 from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import environment, metrics, progress, timing
 
 DATA_DIR_PATH: Path = Path(__file__).parent.parent.parent / "data"
 DHOS_SERVICES_DATA_PATH: Path = DATA_DIR_PATH / "dhos_services_data.json"
 ROLES_DATA_PATH: Path = DATA_DIR_PATH / "roles_definition.json"
 
 
+class _MeteredTTLCache(TTLCache):
+    """
+    A TTLCache that counts its hits and misses in the JWT cache metrics.
+    """
+
+    def __init__(self, kind: str, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.kind = kind
+
+    def __getitem__(self, key: Any) -> Any:
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            metrics.JWT_CACHE_LOOKUPS.labels(self.kind, "miss").inc()
+            raise
+        metrics.JWT_CACHE_LOOKUPS.labels(self.kind, "hit").inc()
+        return value
+
+
+def _environment_key(*args: Any, **kwargs: Any) -> Tuple:
+    """
+    Caches JWTs by environment, as each environment may have its own key.
+    """
+    return hashkey(environment.current().name, *args, **kwargs)
+
+
 @cached(
-    TTLCache(
+    _MeteredTTLCache(
+        kind="system",
         maxsize=16,
         ttl=Configuration.SYSTEM_JWT_LIFETIME_SECONDS
         * Configuration.JWT_TTL_COEFFICIENT,
-    )
+    ),
+    key=_environment_key,
 )
+@timing.timed("system_jwt")
 def get_system_jwt(system_id: str = "dhos-robot") -> str:
     logger.info("Creating system JWT for system ID '%s'", system_id)
     jwt_token: str = jose_jwt.encode(
         {
             "metadata": {"can_edit_ews": True, "system_id": system_id},
-            "iss": Configuration.HS_ISSUER,
-            "aud": Configuration.PROXY_URL,
+            "iss": environment.setting("HS_ISSUER"),
+            "aud": environment.setting("PROXY_URL"),
             "scope": " ".join(_get_permissions_for_group("System")),
             "exp": datetime.utcnow()
             + timedelta(seconds=Configuration.SYSTEM_JWT_LIFETIME_SECONDS),
         },
-        key=Configuration.HS_KEY,
+        key=environment.setting("HS_KEY"),
         algorithm="HS512",
     )
 
@@ -47,12 +78,15 @@ def get_system_jwt(system_id: str = "dhos-robot") -> str:
 
 
 @cached(
-    TTLCache(
+    _MeteredTTLCache(
+        kind="clinician",
         maxsize=128,
         ttl=Configuration.CLINICIAN_JWT_LIFETIME_SECONDS
         * Configuration.JWT_TTL_COEFFICIENT,
-    )
+    ),
+    key=_environment_key,
 )
+@timing.timed("clinician_jwt")
 def get_clinician_jwt(
     username: str,
     password: Optional[str] = None,
@@ -83,13 +117,13 @@ def get_clinician_jwt(
         clinician_jwt = jose_jwt.encode(
             {
                 "metadata": clinician_metadata,
-                "iss": Configuration.HS_ISSUER,
-                "aud": Configuration.PROXY_URL,
+                "iss": environment.setting("HS_ISSUER"),
+                "aud": environment.setting("PROXY_URL"),
                 "scope": " ".join(clinician_permissions),
                 "exp": datetime.utcnow()
                 + timedelta(seconds=Configuration.CLINICIAN_JWT_LIFETIME_SECONDS),
             },
-            key=Configuration.HS_KEY,
+            key=environment.setting("HS_KEY"),
             algorithm="HS512",
         )
 
@@ -110,14 +144,17 @@ def get_clinician_jwt(
 
 
 @cached(
-    TTLCache(
+    _MeteredTTLCache(
+        kind="patient",
         maxsize=128,
         ttl=Configuration.PATIENT_JWT_LIFETIME_SECONDS
         * Configuration.JWT_TTL_COEFFICIENT,
-    )
+    ),
+    key=_environment_key,
 )
+@timing.timed("patient_jwt")
 def get_patient_jwt(clients: ClientRepository, patient_id: str) -> str:
-    logger.debug(
+    progress.detail(
         "No unexpired cached patient JWT for %s, getting a new one", patient_id
     )
 
@@ -125,11 +162,11 @@ def get_patient_jwt(clients: ClientRepository, patient_id: str) -> str:
         activation_code = patient_id
         otp = patient_id * 4
     else:
-        logger.debug("Creating activation for patient with UUID %s", patient_id)
+        progress.detail("Creating activation for patient with UUID %s", patient_id)
         activation: Dict = activation_auth_client.create_activation_for_patient(
             clients, patient_id, get_system_jwt()
         )
-        logger.debug("Created activation for patient with UUID %s", patient_id)
+        progress.detail("Created activation for patient with UUID %s", patient_id)
         activation_code = activation["activation_code"]
         otp = activation["otp"]
 
@@ -139,7 +176,7 @@ def get_patient_jwt(clients: ClientRepository, patient_id: str) -> str:
     )["authorisation_code"]
 
     # GET JWT
-    logger.debug("Getting jwt for patient with UUID %s", patient_id)
+    progress.detail("Getting jwt for patient with UUID %s", patient_id)
     return activation_auth_client.get_patient_jwt(
         clients, patient_id, authorisation_code
     )["jwt"]
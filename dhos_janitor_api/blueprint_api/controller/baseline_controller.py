@@ -0,0 +1,161 @@
+import hashlib
+import json
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from she_logging import logger
+
+from dhos_janitor_api.blueprint_api.client import (
+    ClientRepository,
+    locations_client,
+    send_bff_client,
+    services_client,
+    users_client,
+)
+from dhos_janitor_api.blueprint_api.controller import auth_controller
+from dhos_janitor_api.helpers import cache, environment
+
+PRODUCT_NAMES: List[str] = ["GDM", "DBM", "SEND"]
+SEND_WARD_SCT_CODE = "225746001"
+
+# Targets populated from the data in other targets, which must be repopulated
+# whenever those are.
+TARGET_DEPENDENCIES: Dict[str, Set[str]] = {
+    "dhos_users_api": {"dhos_locations_api"},
+    "dhos_services_api": {"dhos_locations_api", "dhos_users_api"},
+    "dhos_activation_auth_api": {"dhos_locations_api"},
+    "dhos_messages_api": {"dhos_locations_api", "dhos_users_api", "dhos_services_api"},
+    "dhos_telemetry_api": {"dhos_locations_api", "dhos_users_api", "dhos_services_api"},
+    "dhos_encounters_api": {"dhos_locations_api", "dhos_services_api"},
+    "dhos_fuego_api": {"dhos_services_api"},
+    "gdm_bg_readings_api": {"dhos_locations_api", "dhos_services_api"},
+    "dhos_observations_api": {"dhos_locations_api", "dhos_encounters_api"},
+}
+
+Probe = Callable[[ClientRepository, str], Iterable[Dict]]
+
+
+def _probe_locations(clients: ClientRepository, system_jwt: str) -> Iterable[Dict]:
+    return locations_client.get_all_locations(
+        clients=clients, product_name=PRODUCT_NAMES, system_jwt=system_jwt
+    ).values()
+
+
+def _probe_users(clients: ClientRepository, system_jwt: str) -> Iterator[Dict]:
+    for product_name in PRODUCT_NAMES:
+        yield from users_client.get_clinicians(
+            clients=clients, product_name=product_name, system_jwt=system_jwt
+        )
+
+
+def _probe_services(clients: ClientRepository, system_jwt: str) -> Iterator[Dict]:
+    for product_name in PRODUCT_NAMES:
+        for active in (True, False):
+            yield from services_client.search_patients(
+                clients=clients,
+                system_jwt=system_jwt,
+                product_name=product_name,
+                active=active,
+            )
+
+
+def _probe_encounters(clients: ClientRepository, system_jwt: str) -> Iterator[Dict]:
+    wards: Dict[str, Dict] = locations_client.get_all_locations(
+        clients=clients,
+        product_name="SEND",
+        system_jwt=system_jwt,
+        location_types=[SEND_WARD_SCT_CODE],
+    )
+    for location_uuid in wards:
+        yield from send_bff_client.search_encounters(
+            clients=clients, location_uuid=location_uuid, system_jwt=system_jwt
+        )["results"]
+
+
+# Reads of the data in each target that can be compared with a baseline. Targets
+# without a probe are always repopulated by an incremental reset.
+PROBES: Dict[str, Probe] = {
+    "dhos_locations_api": _probe_locations,
+    "dhos_users_api": _probe_users,
+    "dhos_services_api": _probe_services,
+    "dhos_encounters_api": _probe_encounters,
+}
+
+
+def fingerprint(entities: Iterable[Any]) -> str:
+    """
+    Hashes JSON-serialisable entities, regardless of their order.
+    """
+    digest = hashlib.sha256()
+    for entity in sorted(json.dumps(e, sort_keys=True, default=str) for e in entities):
+        digest.update(entity.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def settings_fingerprint(
+    product_settings: Dict[str, Dict[str, Any]], location_config: Optional[Dict]
+) -> str:
+    return fingerprint(
+        [{"product_settings": product_settings, "location_config": location_config}]
+    )
+
+
+def record_baseline(clients: ClientRepository, settings: str) -> None:
+    """
+    Records fingerprints of the data in the current environment's targets after a
+    reset with the given settings, for the next incremental reset to compare against.
+    """
+    system_jwt: str = auth_controller.get_system_jwt()
+    cache.reset_baseline[environment.current().name] = {
+        "settings": settings,
+        "targets": {
+            target: fingerprint(probe(clients, system_jwt))
+            for target, probe in PROBES.items()
+        },
+    }
+
+
+def clear_baseline() -> None:
+    cache.reset_baseline.pop(environment.current().name, None)
+
+
+def targets_to_reset(
+    clients: ClientRepository, targets: Sequence[str], settings: str
+) -> List[str]:
+    """
+    Returns those of the targets, in order, whose data differs from the baseline or
+    can't be compared with it, along with any targets depending on them. All of the
+    targets are returned if there's no baseline for the settings.
+    """
+    baseline: Dict = cache.reset_baseline.get(environment.current().name, {})
+    if baseline.get("settings") != settings:
+        logger.info("No baseline for these reset settings, resetting all targets")
+        return list(targets)
+
+    system_jwt: str = auth_controller.get_system_jwt()
+    changed: List[str] = []
+    for target in targets:
+        if TARGET_DEPENDENCIES.get(target, set()) & set(changed):
+            reason = "dependency changed"
+        elif target not in PROBES:
+            reason = "not comparable"
+        elif fingerprint(PROBES[target](clients, system_jwt)) != baseline[
+            "targets"
+        ].get(target):
+            reason = "changed since baseline"
+        else:
+            logger.info("Target %s unchanged since baseline", target)
+            continue
+        logger.info("Target %s will be reset (%s)", target, reason)
+        changed.append(target)
+    return changed
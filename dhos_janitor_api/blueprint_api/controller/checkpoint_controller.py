@@ -0,0 +1,212 @@
+import contextlib
+import json
+import os
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from flask_batteries_included.helpers.error_handler import EntityNotFoundException
+from she_logging import logger
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers.environment import DEFAULT
+
+
+def checkpoint_path(checkpoint_dir: str, task_uuid: str) -> Path:
+    return Path(checkpoint_dir) / f"{task_uuid}.json"
+
+
+class Checkpoint:
+    """
+    The progress of a reset task, saved to a file so that the task can be resumed
+    from where it failed. Records the arguments and environment the task was started
+    with, the targets it resets (once chosen), the stages completed so far, and the number of
+    entities posted so far by stages that checkpoint as they go.
+
+    The file is saved after each stage and each CHECKPOINT_CHUNK_SIZE entities, and
+    when the task fails. It is deleted once the task completes.
+    """
+
+    def __init__(
+        self, path: Path, task: Dict[str, Any], environment: str = DEFAULT
+    ) -> None:
+        self.path = path
+        self.task = task
+        self.environment = environment
+        self.plan: Optional[Dict[str, Any]] = None
+        self.started: List[str] = []
+        self.completed: List[str] = []
+        self.items: Dict[str, int] = {}
+        self.items_ahead: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        try:
+            data: Dict = json.loads(path.read_text())
+        except FileNotFoundError:
+            raise EntityNotFoundException(f"Checkpoint not found at {path}")
+        checkpoint = cls(path, data["task"], data.get("environment", DEFAULT))
+        checkpoint.plan = data["plan"]
+        checkpoint.started = data.get("started", [])
+        checkpoint.completed = data["completed"]
+        checkpoint.items = data["items"]
+        checkpoint.items_ahead = {
+            key: set(indexes) for key, indexes in data.get("items_ahead", {}).items()
+        }
+        return checkpoint
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path: Path = self.path.with_suffix(".tmp")
+        with self._lock:
+            data: Dict = {
+                "task": self.task,
+                "environment": self.environment,
+                "plan": self.plan,
+                "started": self.started,
+                "completed": self.completed,
+                "items": self.items,
+                "items_ahead": {
+                    key: sorted(indexes)
+                    for key, indexes in self.items_ahead.items()
+                    if indexes
+                },
+            }
+            temp_path.write_text(json.dumps(data))
+            os.replace(temp_path, self.path)
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+# The checkpoint of the running reset, if any.
+_current: ContextVar[Optional[Checkpoint]] = ContextVar("checkpoint", default=None)
+
+
+@contextlib.contextmanager
+def active(checkpoint: Optional[Checkpoint]) -> Iterator[Optional[Checkpoint]]:
+    """
+    Makes the checkpoint current for the code run within the context, saving it if
+    that code fails and deleting it if it succeeds. Checkpointing does nothing if
+    checkpoint is None.
+    """
+    token = _current.set(checkpoint)
+    try:
+        yield checkpoint
+    except BaseException:
+        if checkpoint is not None:
+            checkpoint.save()
+            logger.info("Saved checkpoint to %s", checkpoint.path)
+        raise
+    finally:
+        _current.reset(token)
+    if checkpoint is not None:
+        checkpoint.discard()
+
+
+def saved_plan() -> Optional[Tuple[Tuple[str, ...], Dict[str, Dict]]]:
+    """
+    Returns the targets to reset and the response so far recorded by the current
+    checkpoint, if the reset is being resumed.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None or checkpoint.plan is None:
+        return None
+    return tuple(checkpoint.plan["targets"]), checkpoint.plan["response_targets"]
+
+
+def save_plan(targets: Tuple[str, ...], response_targets: Dict[str, Dict]) -> None:
+    """
+    Records the targets chosen for the reset and its response so far. The response
+    is saved again with each checkpoint, so should be updated in place.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return
+    checkpoint.plan = {"targets": list(targets), "response_targets": response_targets}
+    checkpoint.save()
+
+
+def is_complete(stage: str) -> bool:
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None or stage not in checkpoint.completed:
+        return False
+    logger.info("Skipping stage %s, completed before resuming", stage)
+    return True
+
+
+def start(stage: str) -> None:
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return
+    with checkpoint._lock:
+        if stage not in checkpoint.started:
+            checkpoint.started.append(stage)
+    checkpoint.save()
+
+
+def is_interrupted(stage: str) -> bool:
+    """
+    Returns whether the stage was started but not completed before resuming.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return False
+    return stage in checkpoint.started and stage not in checkpoint.completed
+
+
+def complete(stage: str) -> None:
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return
+    with checkpoint._lock:
+        checkpoint.completed.append(stage)
+    checkpoint.save()
+
+
+def items_done(key: str) -> int:
+    """
+    Returns the number of entities counted under key by item_done before resuming.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return 0
+    return checkpoint.items.get(key, 0)
+
+
+def is_item_done(key: str, index: int) -> bool:
+    """
+    Returns whether the entity at index within the stage counted under key was posted
+    before resuming.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return False
+    with checkpoint._lock:
+        return index < checkpoint.items.get(
+            key, 0
+        ) or index in checkpoint.items_ahead.get(key, ())
+
+
+def item_done(key: str, index: Optional[int] = None) -> None:
+    """
+    Counts an entity posted by a stage under key, saving the checkpoint after every
+    CHECKPOINT_CHUNK_SIZE entities. Entities posted concurrently, by bounded_map
+    workers, give their index within the stage, as they may finish out of order.
+    """
+    checkpoint: Optional[Checkpoint] = _current.get()
+    if checkpoint is None:
+        return
+    with checkpoint._lock:
+        done: int = checkpoint.items.get(key, 0)
+        ahead: Set[int] = checkpoint.items_ahead.setdefault(key, set())
+        ahead.add(done if index is None else index)
+        while done in ahead:
+            ahead.remove(done)
+            done += 1
+        checkpoint.items[key] = done
+        posted: int = done + len(ahead)
+    if posted % Configuration.CHECKPOINT_CHUNK_SIZE == 0:
+        checkpoint.save()
@@ -1,5 +1,4 @@
 import random
-import uuid as _uuid
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 
@@ -30,7 +29,7 @@ def generate_patient(
     hospital_number: Optional[str] = None,
 ) -> Dict:
     system_jwt = auth_controller.get_system_jwt()
-    new_patient_uuid = uuid or str(_uuid.uuid4())
+    new_patient_uuid = uuid or names.uuid4()
     clinicians = users_client.get_clinicians(
         clients=clients,
         product_name=product_name,
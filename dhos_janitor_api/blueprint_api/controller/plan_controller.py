@@ -0,0 +1,211 @@
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from dhos_janitor_api.blueprint_api.client import ClientRepository, trustomer_client
+from dhos_janitor_api.blueprint_api.controller import reset_controller
+from dhos_janitor_api.config import Configuration, resettable_targets
+from dhos_janitor_api.helpers import environment, latency
+
+# Mean numbers of entities generated, where they depend on more than the product
+# settings. Readings and messages depend on how long each patient has been open, so
+# are means over resets against the stand-in with the default settings.
+READINGS_PER_PATIENT = 42.5
+MESSAGES_PER_GDM_PATIENT = 7.25
+ENCOUNTERS_PER_SEND_PATIENT: float = reset_controller.MAX_ENCOUNTERS_PER_PATIENT / 2
+# Capped by the time since admission, so the mean of WEIGHTED_RANDOM is an upper
+# bound.
+OBS_SETS_PER_ENCOUNTER: float = sum(reset_controller.WEIGHTED_RANDOM) / len(
+    reset_controller.WEIGHTED_RANDOM
+)
+# 30% of encounters have their SpO2 scale changed, on average 0.7 times against the
+# stand-in. Each change is two requests.
+SPO2_SCALE_CHANGES_PER_ENCOUNTER = 0.3 * 0.7
+# Activations are only created for the static patients and devices.
+STATIC_ACTIVATIONS = 9
+# Getting a patient's JWT creates an activation, then activates it, then gets the JWT.
+# The JWT is cached, so this is once per patient.
+PATIENT_JWT_REQUESTS = 3
+
+DATA_DIR: Path = Path.cwd() / "dhos_janitor_api" / "data"
+
+
+class _Dataset:
+    """
+    The sizes of the data a reset generates from the product settings, location
+    config and static data files.
+    """
+
+    def __init__(
+        self,
+        product_settings: Dict[str, Dict[str, Any]],
+        location_config: Optional[Dict],
+    ) -> None:
+        self.patients: Dict[str, int] = {
+            product: settings["number_of_patients"]
+            for product, settings in product_settings.items()
+        }
+        gdm_patients = self.patients.get("GDM", 0)
+        self.active_gdm_patients: int = gdm_patients - gdm_patients // 6
+
+        data: Dict[str, Dict] = {
+            name: json.loads((DATA_DIR / f"{name}_data.json").read_text())
+            for name in ("dhos_locations", "dhos_services", "dhos_questions")
+        }
+        self.clinicians: int = len(data["dhos_services"]["clinician"])
+        self.question_entities: int = sum(
+            len(entities) for entities in data["dhos_questions"].values()
+        )
+        telemetry: Dict = json.loads(
+            (DATA_DIR / "dhos_telemetry_data.json").read_text()
+        )
+        self.installations: int = len(telemetry["mobile"]) + len(telemetry["desktop"])
+
+        locations: List[Dict] = data["dhos_locations"]["location"]
+        products: List[Set[str]] = [
+            {p["product_name"] for p in location["dh_products"]}
+            for location in locations
+        ]
+        self.gdm_locations: int = sum("GDM" in p for p in products)
+        self.diabetes_locations: int = sum(bool(p & {"GDM", "DBM"}) for p in products)
+        if location_config:
+            wards: int = location_config["wards"]
+            # Half the wards have three bays, and half the bays and the wards without
+            # bays have three beds.
+            bays: float = wards * 0.5 * 3
+            beds: float = (wards * 0.5 + bays) * 0.5 * 3
+            self.locations: float = (
+                self.diabetes_locations
+                + location_config["hospitals"]
+                + wards
+                + bays
+                + beds
+            )
+            self.send_wards: int = wards
+        else:
+            self.locations = len(locations)
+            self.send_wards = sum(
+                "SEND" in p
+                and location["location_type"] == reset_controller.WARD_SCT_CODE
+                for p, location in zip(products, locations)
+            )
+
+    @property
+    def diabetes_patients(self) -> int:
+        return self.patients.get("GDM", 0) + self.patients.get("DBM", 0)
+
+    @property
+    def encounters(self) -> float:
+        return self.patients.get("SEND", 0) * ENCOUNTERS_PER_SEND_PATIENT
+
+
+Estimator = Callable[[_Dataset], Dict[str, float]]
+
+# The requests made to each downstream target while populating each target.
+ESTIMATORS: Dict[str, Estimator] = {
+    "dhos_locations_api": lambda d: {"dhos_locations_api": d.locations},
+    "dhos_users_api": lambda d: {"dhos_users_api": 2 * d.clinicians},
+    # Each patient generated looks up the product's clinicians.
+    "dhos_services_api": lambda d: {
+        "dhos_users_api": sum(d.patients.values()),
+        "dhos_services_api": sum(d.patients.values()),
+    },
+    "dhos_activation_auth_api": lambda d: {
+        "dhos_locations_api": 1,
+        "dhos_activation_auth_api": 3 * STATIC_ACTIVATIONS,
+    },
+    "dhos_messages_api": lambda d: {
+        "dhos_locations_api": 1,
+        "dhos_services_api": d.gdm_locations,
+        "dhos_users_api": d.patients.get("GDM", 0),
+        "dhos_messages_api": d.patients.get("GDM", 0) * MESSAGES_PER_GDM_PATIENT,
+    },
+    "gdm_bg_readings_api": lambda d: {
+        "dhos_locations_api": 1,
+        "dhos_services_api": 2 * d.diabetes_locations,
+        "dhos_activation_auth_api": PATIENT_JWT_REQUESTS * d.diabetes_patients,
+        "gdm_bff": d.diabetes_patients * READINGS_PER_PATIENT,
+    },
+    "dhos_questions_api": lambda d: {"dhos_questions_api": d.question_entities},
+    "dhos_telemetry_api": lambda d: {
+        "dhos_locations_api": 1,
+        "dhos_services_api": d.gdm_locations,
+        "dhos_users_api": d.gdm_locations,
+        "dhos_telemetry_api": d.installations,
+    },
+    "dhos_encounters_api": lambda d: {
+        "dhos_services_api": 1,
+        "dhos_encounters_api": d.encounters
+        * (1 + 2 * SPO2_SCALE_CHANGES_PER_ENCOUNTER),
+    },
+    "dhos_observations_api": lambda d: {
+        "dhos_locations_api": 1,
+        "send_bff": d.send_wards + d.encounters * OBS_SETS_PER_ENCOUNTER,
+    },
+    "dhos_fuego_api": lambda d: {
+        "dhos_services_api": 1 + d.active_gdm_patients,
+        "dhos_fuego_api": d.active_gdm_patients,
+    },
+}
+
+
+def observed_latency_sec() -> Dict[str, float]:
+    """
+    Returns the mean duration of the requests made to each target by the latest
+    reset of the current environment to make any, by target.
+    """
+    return latency.load(Configuration.LATENCY_STATS_PATH, environment.current().name)
+
+
+def plan_reset(
+    clients: ClientRepository,
+    reset_request: Dict,
+    product_settings: Dict[str, Dict[str, Any]],
+    location_config: Optional[Dict] = None,
+) -> Dict:
+    """
+    Estimates the requests a reset would make to each downstream target, and how long
+    it would take, without resetting anything. The targets are those a full reset
+    would drop and repopulate, in order; incremental and snapshot resets may skip
+    some of them.
+
+    The duration is the time the requests would take one after another, at the mean
+    latency of each target in previous resets of the environment (or
+    PLAN_DEFAULT_LATENCY_SEC if there haven't been any), so is an overestimate for
+    stages posting concurrently.
+    """
+    requested_targets: Set[str] = {
+        t.replace("-", "_") for t in reset_request.get("targets", [])
+    }
+    trustomer_config: Dict = trustomer_client.get_trustomer_config(clients=clients)
+    dataset = _Dataset(product_settings, location_config)
+    latency_sec: Dict[str, float] = observed_latency_sec()
+
+    def _duration_sec(requests: Dict[str, float]) -> float:
+        return sum(
+            count * latency_sec.get(target, Configuration.PLAN_DEFAULT_LATENCY_SEC)
+            for target, count in requests.items()
+        )
+
+    targets: List[Dict] = []
+    for target in resettable_targets(
+        targets=requested_targets, trustomer_config=trustomer_config
+    ):
+        estimator: Optional[Estimator] = ESTIMATORS.get(target)
+        requests: Dict[str, float] = {target: 1}  # drop_data
+        for downstream, count in (estimator(dataset) if estimator else {}).items():
+            requests[downstream] = requests.get(downstream, 0) + count
+        targets.append(
+            {
+                "target": target.replace("_", "-"),
+                "requests": {t: round(c) for t, c in requests.items()},
+                "duration_sec": round(_duration_sec(requests), 3),
+            }
+        )
+
+    return {
+        "targets": targets,
+        "requests": sum(sum(t["requests"].values()) for t in targets),
+        "duration_sec": round(sum(t["duration_sec"] for t in targets), 3),
+        "latency_sec": {t: round(s, 6) for t, s in sorted(latency_sec.items())},
+    }
@@ -19,12 +19,19 @@ from dhos_janitor_api.blueprint_api.generator import (
     readings_generator,
 )
 from dhos_janitor_api.blueprint_api.janitor_thread import JanitorThread
+from dhos_janitor_api.helpers import environment, metrics, progress, timing
+from dhos_janitor_api.helpers.progress import ProgressLogger
 
 MESSAGE_PROBABILITY: float = 0.33
 VISIT_PROBABILITY: float = 0.1
 
 
-def start_populate_gdm_thread(days: int, use_system_jwt: bool) -> str:
+def start_populate_gdm_thread(
+    days: int,
+    use_system_jwt: bool,
+    profile: bool = False,
+    environment_name: str = environment.DEFAULT,
+) -> str:
     task_uuid: str = generate_uuid()
 
     thread = JanitorThread(
@@ -32,6 +39,8 @@ def start_populate_gdm_thread(days: int, use_system_jwt: bool) -> str:
         target=populate_gdm_data,
         request_id=current_request_id(),
         require_context=True,
+        profile=profile,
+        environment=environment.get_environment(environment_name),
     )
     thread.start(days=days, use_system_jwt=use_system_jwt)
     return task_uuid
@@ -61,16 +70,22 @@ def populate_gdm_data(
     }
 
     logger.info("Found %d GDM patients", len(gdm_patients))
-    for patient in gdm_patients.values():
-        _populate_for_patient(
-            clients=clients,
-            patient=patient,
-            clinician=reset_controller.get_random_clinician(
-                list(gdm_clinicians.values()), {"GDM Superclinician"}
-            ),
-            days=days,
-            use_system_jwt=use_system_jwt,
-        )
+    with metrics.TASK_STAGE_DURATION.labels(
+        "populate_gdm_data", "gdm_patients", ""
+    ).time(), timing.stage("gdm_patients"), ProgressLogger(
+        "Populating GDM patients", total=len(gdm_patients)
+    ) as gdm_progress:
+        for patient in gdm_patients.values():
+            _populate_for_patient(
+                clients=clients,
+                patient=patient,
+                clinician=reset_controller.get_random_clinician(
+                    list(gdm_clinicians.values()), {"GDM Superclinician"}
+                ),
+                days=days,
+                use_system_jwt=use_system_jwt,
+            )
+            gdm_progress.item()
 
     # Some DBM patients don't have locations, so we can't iterate through locations to get a list of patients.
     # Instead we use the search endpoint, but sadly it doesn't contain the readings plan so we have to also
@@ -82,18 +97,25 @@ def populate_gdm_data(
         active=True,
     )
     logger.info("Found %d DBM patients", len(dbm_patients))
-    for patient in dbm_patients:
-        _populate_for_patient(
-            clients=clients,
-            patient=patient,
-            clinician=reset_controller.get_random_clinician(
-                # For now, use GDM Superclinicians because they have more permissions.
-                list(gdm_clinicians.values()),
-                {"GDM Superclinician"},
-            ),
-            days=days,
-            use_system_jwt=use_system_jwt,
-        )
+    with metrics.TASK_STAGE_DURATION.labels(
+        "populate_gdm_data", "dbm_patients", ""
+    ).time(), timing.stage("dbm_patients"), ProgressLogger(
+        "Populating DBM patients", total=len(dbm_patients)
+    ) as dbm_progress:
+        for patient in dbm_patients:
+            _populate_for_patient(
+                clients=clients,
+                patient=patient,
+                clinician=reset_controller.get_random_clinician(
+                    # For now, use GDM Superclinicians because they have more
+                    # permissions.
+                    list(gdm_clinicians.values()),
+                    {"GDM Superclinician"},
+                ),
+                days=days,
+                use_system_jwt=use_system_jwt,
+            )
+            dbm_progress.item()
 
     logger.info("Finished populating GDM/DBM data")
 
@@ -105,7 +127,7 @@ def _populate_for_patient(
     days: int,
     use_system_jwt: bool,
 ) -> None:
-    logger.info("Populating diabetes data for patient %s", patient["uuid"])
+    progress.detail("Populating diabetes data for patient %s", patient["uuid"])
     # Get diagnosis or skip patient.
     diagnosis: Optional[Dict] = next(
         (
@@ -116,7 +138,7 @@ def _populate_for_patient(
         None,
     )
     if diagnosis is None or not diagnosis.get("readings_plan"):
-        logger.debug(
+        progress.detail(
             "Skipping patient %s - no diabetes diagnosis with readings plan",
             patient["uuid"],
         )
@@ -129,30 +151,31 @@ def _populate_for_patient(
     reading_days_per_week = int(readings_plan["days_per_week_to_take_readings"])
     readings_per_day = int(readings_plan["readings_per_day"])
     now: datetime = datetime.now(tz=timezone.utc)
-    rg = readings_generator.ReadingsGenerator(patient)
-    readings: List[Dict] = []
-    for i in range(1, days + 1):
-        if random.randrange(7) not in range(reading_days_per_week):
-            # No readings on this day
-            continue
-        all_prandial_tags = [1, 2, 3, 4, 5, 6, 7, 7]
-        random.shuffle(all_prandial_tags)
-
-        date_start: datetime = now - timedelta(
-            days=i,
-            hours=now.hour,
-            minutes=now.minute,
-            seconds=now.second,
-            microseconds=now.microsecond,
-        )
-        for prandial_tag in all_prandial_tags[:readings_per_day]:
-            readings.append(
-                rg.create_reading(
-                    date_start=date_start,
-                    prandial_tag=prandial_tag,
-                    medication_list=medications,
-                )
+    with timing.stage("generate_readings"):
+        rg = readings_generator.ReadingsGenerator(patient)
+        readings: List[Dict] = []
+        for i in range(1, days + 1):
+            if random.randrange(7) not in range(reading_days_per_week):
+                # No readings on this day
+                continue
+            all_prandial_tags = [1, 2, 3, 4, 5, 6, 7, 7]
+            random.shuffle(all_prandial_tags)
+
+            date_start: datetime = now - timedelta(
+                days=i,
+                hours=now.hour,
+                minutes=now.minute,
+                seconds=now.second,
+                microseconds=now.microsecond,
             )
+            for prandial_tag in all_prandial_tags[:readings_per_day]:
+                readings.append(
+                    rg.create_reading(
+                        date_start=date_start,
+                        prandial_tag=prandial_tag,
+                        medication_list=medications,
+                    )
+                )
 
     # Generate messages based on message probability.
     mg = message_generator.MessageGenerator(patient)
@@ -182,7 +205,7 @@ def _populate_for_patient(
         )
 
     if len(readings) == 0 and len(messages) == 0 and len(visits) == 0:
-        logger.debug("Generated no new data for this patient, nothing to do")
+        progress.detail("Generated no new data for this patient, nothing to do")
         return
 
     # Get a jwt for the patient.
@@ -200,19 +223,20 @@ def _populate_for_patient(
         )
 
     # Readings
-    logger.debug(
+    progress.detail(
         "Populating %d readings for patient %s", len(readings), patient["uuid"]
     )
-    for reading in readings:
-        gdm_bff_client.create_reading(
-            clients=clients,
-            patient_id=patient["uuid"],
-            patient_jwt=patient_jwt,
-            reading_details=reading,
-        )
+    with timing.stage("post_readings"):
+        for reading in readings:
+            gdm_bff_client.create_reading(
+                clients=clients,
+                patient_id=patient["uuid"],
+                patient_jwt=patient_jwt,
+                reading_details=reading,
+            )
 
     # Messages
-    logger.debug("Populating %d messages for patient", len(messages))
+    progress.detail("Populating %d messages for patient", len(messages))
     for message in messages:
         # Generate a JWT depending on the message sender.
         if message["sender_type"] == "system":
@@ -235,7 +259,7 @@ def _populate_for_patient(
 
     # Visits
     if visits:
-        logger.debug(
+        progress.detail(
             "Populating %d visits for patient %s", len(visits), patient["uuid"]
         )
         services_client.update_patient(
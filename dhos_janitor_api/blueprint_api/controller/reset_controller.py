@@ -1,14 +1,12 @@
 import json
 import math
 import random
-import uuid
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import draymed
 import httpx
-from faker import Faker
 from flask_batteries_included.helpers import generate_uuid
 from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
 from flask_batteries_included.helpers.timestamp import (
@@ -33,9 +31,14 @@ from dhos_janitor_api.blueprint_api.client import (
     trustomer_client,
     users_client,
 )
+from dhos_janitor_api.blueprint_api.client.common import make_request
 from dhos_janitor_api.blueprint_api.controller import (
     auth_controller,
+    baseline_controller,
+    checkpoint_controller,
     generator_controller,
+    shard_controller,
+    snapshot_controller,
 )
 from dhos_janitor_api.blueprint_api.generator.encounter_generator import (
     EncountersGenerator,
@@ -49,11 +52,21 @@ from dhos_janitor_api.blueprint_api.generator.readings_generator import (
     ReadingsGenerator,
 )
 from dhos_janitor_api.blueprint_api.janitor_thread import JanitorThread
-from dhos_janitor_api.config import resettable_targets
-from dhos_janitor_api.helpers.handlers import catch_and_log_deprecated_route
+from dhos_janitor_api.config import Configuration, resettable_targets
+from dhos_janitor_api.helpers import (
+    cache,
+    environment,
+    latency,
+    metrics,
+    names,
+    progress,
+    timing,
+)
+from dhos_janitor_api.helpers.concurrency import bounded_map
+from dhos_janitor_api.helpers.progress import ProgressLogger
 
 GENERATED_CLINICIAN_PASSWORD = "Pass@word1!"
-WEIGHTED_RANDOM = (
+WEIGHTED_RANDOM: List[int] = (
     list(range(1, 50))
     + [1] * 10
     + [2] * 10
@@ -66,14 +79,13 @@ WEIGHTED_RANDOM = (
     + [9] * 10
 )
 
+MAX_ENCOUNTERS_PER_PATIENT = 5
 DAYS_BETWEEN_SPO2_SCALE_CHANGE = 14
 WARD_SCT_CODE = draymed.codes.code_from_name("ward", category="location")
 HOSPITAL_SCT_CODE = draymed.codes.code_from_name("hospital", category="location")
 BAY_SCT_CODE = draymed.codes.code_from_name("bay", category="location")
 BED_SCT_CODE = draymed.codes.code_from_name("bed", category="location")
 
-fake = Faker(locale="en_GB")
-
 
 class DateHelper:
     """A class that formats a date with a given offset from today.
@@ -95,33 +107,183 @@ def start_reset_thread(
     product_settings: Dict[str, Dict[str, Any]],
     num_hospitals: Optional[int] = None,
     num_wards: Optional[int] = None,
+    profile: bool = False,
+    environment_name: str = environment.DEFAULT,
 ) -> str:
     task_uuid: str = generate_uuid()
+    task_environment: environment.Environment = environment.get_environment(
+        environment_name
+    )
 
     location_config: Optional[Dict] = None
     if num_hospitals and num_wards:
         location_config = {"hospitals": num_hospitals, "wards": num_wards}
 
+    checkpoint = checkpoint_controller.Checkpoint(
+        path=checkpoint_controller.checkpoint_path(
+            Configuration.CHECKPOINT_DIR, task_uuid
+        ),
+        task={
+            "reset_request": reset_details,
+            "product_settings": product_settings,
+            "location_config": location_config,
+        },
+        environment=task_environment.name,
+    )
     thread = JanitorThread(
         task_uuid=task_uuid,
         target=reset_microservices,
         request_id=current_request_id(),
         require_context=True,
+        profile=profile,
+        environment=task_environment,
     )
-    thread.start(
-        reset_request=reset_details,
-        product_settings=product_settings,
-        location_config=location_config,
-    )
+    thread.start(checkpoint=checkpoint, **checkpoint.task)
     return task_uuid
 
 
+def start_fanout_reset_threads(
+    environment_names: List[str],
+    reset_details: Dict,
+    product_settings: Dict[str, Dict[str, Any]],
+    num_hospitals: Optional[int] = None,
+    num_wards: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Starts a reset task against each of the environments, to run concurrently. Each
+    has its own clients, so its own limits on requests to its targets. Returns the
+    task UUID by environment.
+    """
+    unique_names: List[str] = list(dict.fromkeys(environment_names))
+    # Nothing is started unless every environment exists and is free.
+    for name in unique_names:
+        environment.get_environment(name)
+        cache.check_no_ongoing_tasks(name)
+    return {
+        name: start_reset_thread(
+            reset_details=reset_details,
+            product_settings=product_settings,
+            num_hospitals=num_hospitals,
+            num_wards=num_wards,
+            environment_name=name,
+        )
+        for name in unique_names
+    }
+
+
+def resume_reset_thread(task_uuid: str, profile: bool = False) -> None:
+    """
+    Resumes a failed reset task from its checkpoint, under the same task UUID.
+    """
+    checkpoint = checkpoint_controller.Checkpoint.load(
+        checkpoint_controller.checkpoint_path(Configuration.CHECKPOINT_DIR, task_uuid)
+    )
+    # Raise a DuplicateResourceException if there's an ongoing task.
+    cache.check_no_ongoing_tasks(checkpoint.environment)
+    logger.info(
+        "Resuming reset task %s after %d completed stages",
+        task_uuid,
+        len(checkpoint.completed),
+    )
+    thread = JanitorThread(
+        task_uuid=task_uuid,
+        target=reset_microservices,
+        request_id=current_request_id(),
+        require_context=True,
+        profile=profile,
+        environment=environment.get_environment(checkpoint.environment),
+    )
+    thread.start(checkpoint=checkpoint, **checkpoint.task)
+
+
 def reset_microservices(
     clients: ClientRepository,
     reset_request: Dict,
     product_settings: Dict[str, Dict[str, Any]],
     location_config: Optional[Dict] = None,
+    checkpoint: Optional[checkpoint_controller.Checkpoint] = None,
 ) -> Dict:
+    with checkpoint_controller.active(checkpoint), latency.collecting() as stats:
+        settings: str = baseline_controller.settings_fingerprint(
+            product_settings, location_config
+        )
+        plan = checkpoint_controller.saved_plan()
+        if plan is None:
+            targets, response_targets = _plan_reset(
+                clients=clients, reset_request=reset_request, settings=settings
+            )
+            checkpoint_controller.save_plan(targets, response_targets)
+        else:
+            targets, response_targets = plan
+
+        with timing.stage("drop"):
+            for drop_target in targets:
+                # A target whose populate stage failed partway is dropped again,
+                # as the entities it posted aren't recorded, unless the stage skips
+                # those it recorded posting.
+                redrop: bool = (
+                    drop_target not in _ITEM_CHECKPOINTED_TARGETS
+                    and checkpoint_controller.is_interrupted(f"populate:{drop_target}")
+                )
+                if not redrop and checkpoint_controller.is_complete(
+                    f"drop:{drop_target}"
+                ):
+                    continue
+                logger.info("Dropping target %s", drop_target)
+                with metrics.TASK_STAGE_DURATION.labels(
+                    "reset_microservices", "drop", drop_target
+                ).time(), timing.stage(drop_target):
+                    response_targets[drop_target.replace("_", "-")] = drop_service(
+                        clients=clients,
+                        target=drop_target,
+                    )
+                checkpoint_controller.complete(f"drop:{drop_target}")
+
+        with timing.stage("populate"):
+            for reset_target in targets:
+                if checkpoint_controller.is_complete(f"populate:{reset_target}"):
+                    continue
+                logger.info("Resetting target %s", reset_target)
+                checkpoint_controller.start(f"populate:{reset_target}")
+                with metrics.TASK_STAGE_DURATION.labels(
+                    "reset_microservices", "populate", reset_target
+                ).time(), timing.stage(reset_target):
+                    populate_service(
+                        clients=clients,
+                        target=reset_target,
+                        product_settings=product_settings,
+                        location_config=location_config,
+                    )
+                checkpoint_controller.complete(f"populate:{reset_target}")
+
+        if reset_request.get(
+            "capture_snapshot", False
+        ) and not checkpoint_controller.is_complete("capture_snapshot"):
+            snapshot_controller.capture_snapshots(
+                snapshot_controller.from_config(), targets
+            )
+            checkpoint_controller.complete("capture_snapshot")
+
+        if reset_request.get("incremental", False):
+            with timing.stage("record_baseline"):
+                baseline_controller.record_baseline(clients, settings)
+
+        latency.save(
+            Configuration.LATENCY_STATS_PATH,
+            environment.current().name,
+            stats.mean_sec(),
+        )
+
+    return response_targets
+
+
+def _plan_reset(
+    clients: ClientRepository, reset_request: Dict, settings: str
+) -> Tuple[Tuple[str, ...], Dict[str, Dict]]:
+    """
+    Chooses the targets to drop and repopulate, in order, returning them along with
+    the response for any targets that were skipped or restored instead.
+    """
     requested_targets: Set[str] = {
         t.replace("-", "_") for t in reset_request.get("targets", [])
     }
@@ -129,53 +291,69 @@ def reset_microservices(
     if not requested_targets:
         logger.debug("No microservices specified, defaulting to reset all")
 
-    response_targets = {}
-    trustomer_config: Dict = trustomer_client.get_trustomer_config(clients=clients)
+    response_targets: Dict[str, Dict] = {}
+    with timing.stage("trustomer_config"):
+        trustomer_config: Dict = trustomer_client.get_trustomer_config(clients=clients)
     targets = tuple(
         resettable_targets(targets=requested_targets, trustomer_config=trustomer_config)
     )
 
-    for drop_target in targets:
-        logger.info("Dropping target %s", drop_target)
-        response_targets[drop_target.replace("_", "-")] = drop_service(
-            clients=clients,
-            target=drop_target,
-        )
-
-    for reset_target in targets:
-        logger.info("Resetting target %s", reset_target)
-        populate_service(
-            clients=clients,
-            target=reset_target,
-            product_settings=product_settings,
-            location_config=location_config,
+    # An incremental reset only resets the targets whose data has changed since the
+    # last incremental reset, then records a new baseline. Any other reset discards
+    # the baseline.
+    if reset_request.get("incremental", False):
+        with timing.stage("compare_baseline"):
+            changed: List[str] = baseline_controller.targets_to_reset(
+                clients, targets, settings
+            )
+        for unchanged_target in targets:
+            if unchanged_target not in changed:
+                response_targets[unchanged_target.replace("_", "-")] = {
+                    "unchanged": True
+                }
+        targets = tuple(changed)
+    baseline_controller.clear_baseline()
+
+    # A snapshot reset restores the targets from snapshots of their databases where
+    # there are any, and drops and repopulates the rest.
+    if reset_request.get("snapshot", False):
+        restored: Dict[str, float] = snapshot_controller.restore_snapshots(
+            snapshot_controller.from_config(), targets
         )
+        for restored_target, restore_sec in restored.items():
+            response_targets[restored_target.replace("_", "-")] = {
+                "restored": True,
+                "restore_sec": round(restore_sec, 3),
+            }
+        targets = tuple(t for t in targets if t not in restored)
 
-    return response_targets
+    return targets, response_targets
 
 
 def drop_service(clients: ClientRepository, target: str) -> Dict:
     logger.debug("Dropping data for target %s", target)
     client: httpx.Client = getattr(clients, target)
     try:
-        target_response = client.post(
-            "/drop_data",
+        target_response = make_request(
+            client=client,
+            method="post",
+            url="/drop_data",
             headers={"Authorization": f"Bearer {auth_controller.get_system_jwt()}"},
-            timeout=30,
+            operation="drop_data",
         )
-        target_response.raise_for_status()
-    except httpx.HTTPStatusError as e:
+    except ServiceUnavailableException:
         logger.debug("Failed to drop data in target %s", target)
-        raise ServiceUnavailableException(e)
-    except Exception as e:
-        logger.debug("Exception dropping data in target %s", target)
-        raise ServiceUnavailableException(e)
-    catch_and_log_deprecated_route(target_response)
+        raise
     target_response_json = target_response.json()
     logger.debug("Dropped data for target %s", target)
     return target_response_json
 
 
+# Targets whose populate stage checkpoints each entity it posts, so that a resumed
+# reset carries on from the entities posted before it failed.
+_ITEM_CHECKPOINTED_TARGETS: Set[str] = {"dhos_services_api", "gdm_bg_readings_api"}
+
+
 def populate_service(
     clients: ClientRepository,
     target: str,
@@ -222,81 +400,131 @@ def populate_dhos_users(
     )
     clinicians = dhos_services_data.pop("clinician", [])
     # CLINICIANS
-    logger.debug("Posting clinicians")
-    for clinician in clinicians:
-        logger.debug(
-            "Posting clinician %s with email %s",
-            clinician["uuid"],
-            clinician["email_address"],
-        )
-        # In the JSON we have stored the expiry date as an offset, so replace with a real date
-        # relative to the current date.
-        exp = clinician.get("contract_expiry_eod_date")
-        if exp is not None:
-            clinician["contract_expiry_eod_date"] = exp.format(today=DateHelper())
-
-        users_client.create_clinician(
-            clients=clients,
-            clinician_details=clinician,
-            system_jwt=system_jwt,
-        )
-        users_client.update_clinician(
-            clients=clients,
-            clinician_email=clinician["email_address"],
-            clinician_details={"password": GENERATED_CLINICIAN_PASSWORD},
-            system_jwt=system_jwt,
-        )
+    with ProgressLogger(
+        "Posting clinicians", total=len(clinicians)
+    ) as clinician_progress:
+        for clinician in clinicians:
+            # In the JSON we have stored the expiry date as an offset, so replace with a real date
+            # relative to the current date.
+            exp = clinician.get("contract_expiry_eod_date")
+            if exp is not None:
+                clinician["contract_expiry_eod_date"] = exp.format(today=DateHelper())
+
+            users_client.create_clinician(
+                clients=clients,
+                clinician_details=clinician,
+                system_jwt=system_jwt,
+            )
+            users_client.update_clinician(
+                clients=clients,
+                clinician_email=clinician["email_address"],
+                clinician_details={"password": GENERATED_CLINICIAN_PASSWORD},
+                system_jwt=system_jwt,
+            )
+            clinician_progress.item(
+                "Posted clinician %s with email %s",
+                clinician["uuid"],
+                clinician["email_address"],
+            )
 
 
 def populate_dhos_services(
     clients: ClientRepository,
     product_settings: Dict[str, Dict[str, Any]],
 ) -> None:
-    dhos_services_data = json.loads(
-        (
-            Path.cwd() / "dhos_janitor_api" / "data" / "dhos_services_data.json"
-        ).read_text()
-    )
-    clinicians = dhos_services_data.pop("clinician", [])
     # PATIENTS
-    logger.debug("Posting patients")
     # GDM patients are posted by clinicians;
     # SEND patients are posted by the system;
-    # (product_code, list of patients, Set of allowed_roles)
+    # (product_code, generator of patients from an index, Set of allowed_roles)
+    # Patients are generated as they are posted, so that only those in flight are
+    # held in memory whatever the number of patients.
     product_patients: Tuple = (
         (
             "GDM",
-            _open_and_closed_patients(
-                clients, product_settings["GDM"]["number_of_patients"], "GDM"
+            lambda start: _open_and_closed_patients(
+                clients, product_settings["GDM"]["number_of_patients"], "GDM", start
             ),
             {"GDM Superclinician"},
         ),
         (
             "DBM",
-            _open_and_closed_patients(
-                clients, product_settings["DBM"]["number_of_patients"], "DBM"
+            lambda start: _open_and_closed_patients(
+                clients, product_settings["DBM"]["number_of_patients"], "DBM", start
             ),
             {"DBM Clinician", "DBM Superclinician"},
         ),
         (
             "SEND",
-            [
-                generator_controller.generate_patient(clients, "SEND")
-                for _ in range(product_settings["SEND"]["number_of_patients"])
-            ],
+            lambda start: _generated_patients(
+                clients, product_settings["SEND"]["number_of_patients"], "SEND", start
+            ),
             {"SEND Clinician", "SEND Superclinician"},
         ),
     )
     logger.debug("Posting generated patients")
     for product_code, patients, allowed_roles in product_patients:
-        clinician_jwt = get_random_clinician_jwt(clinicians, allowed_roles)
-        for patient in patients:
-            services_client.create_patient(
-                clients=clients,
-                patient_details=patient,
-                product_name=product_code,
-                clinician_jwt=clinician_jwt,
-            )
+        # A resumed reset skips the patients posted before it failed. The patients
+        # with static UUIDs come first, so they aren't posted twice.
+        shard_controller.run_stage(
+            clients,
+            stage=f"dhos_services_api:{product_code}",
+            processor="post_patients",
+            items=patients,
+            total=product_settings[product_code]["number_of_patients"],
+            params={
+                "product_code": product_code,
+                "allowed_roles": sorted(allowed_roles),
+            },
+        )
+
+
+@shard_controller.shard_processor("post_patients")
+def _post_patients(
+    clients: ClientRepository,
+    stage: str,
+    patients: Iterable[Dict],
+    total: int,
+    params: Dict,
+) -> None:
+    clinicians: List[Dict] = json.loads(
+        (
+            Path.cwd() / "dhos_janitor_api" / "data" / "dhos_services_data.json"
+        ).read_text()
+    )["clinician"]
+    product_code: str = params["product_code"]
+    clinician_jwt = get_random_clinician_jwt(clinicians, set(params["allowed_roles"]))
+
+    def _post(indexed_patient: Tuple[int, Dict]) -> None:
+        index, patient = indexed_patient
+        if checkpoint_controller.is_item_done(stage, index):
+            return
+        services_client.create_patient(
+            clients=clients,
+            patient_details=patient,
+            product_name=product_code,
+            clinician_jwt=clinician_jwt,
+        )
+        checkpoint_controller.item_done(stage, index)
+
+    with timing.stage("post_patients"), ProgressLogger(
+        f"Posting {product_code} patients", total=total
+    ) as patient_progress:
+        # Patients are counted by their index in the stage as each post finishes, so
+        # when a post fails, those posted concurrently after it are still recorded and
+        # a resumed reset doesn't post them again. Patients with static UUIDs are
+        # posted one at a time, so that none are in flight when one of them fails.
+        remaining: Iterator[Tuple[int, Dict]] = enumerate(
+            patients, checkpoint_controller.items_done(stage)
+        )
+        for index, patient in remaining:
+            _post((index, patient))
+            patient_progress.item()
+            if not patient["uuid"].startswith("static_"):
+                break
+        for _ in bounded_map(
+            _post, remaining, max_in_flight=Configuration.PATIENT_POST_CONCURRENCY
+        ):
+            patient_progress.item()
 
 
 def populate_dhos_locations(
@@ -324,87 +552,46 @@ def populate_dhos_locations(
                     system_jwt=system_jwt,
                 )
 
-        hospitals: List[Dict] = []
-        for _ in range(location_config["hospitals"]):
-            hospital = make_location()
-            locations_client.create_location(
-                clients=clients,
-                location=hospital,
-                system_jwt=system_jwt,
-            )
-            hospitals.append(hospital)
-
-        wards: List[Dict] = []
-        for i in range(location_config["wards"]):
-            ward = make_location(
-                location_type=WARD_SCT_CODE,
-                parent=random.choice(hospitals),
-                suffix=str(i + 1),
-            )
+        levels: Dict[str, List[Dict]] = generate_location_tree(
+            num_hospitals=location_config["hospitals"],
+            num_wards=location_config["wards"],
+        )
+
+        def _post(location: Dict) -> None:
             locations_client.create_location(
                 clients=clients,
-                location=ward,
+                location=location,
                 system_jwt=system_jwt,
             )
-            wards.append(ward)
-
-        wards_with_bays = []
-        bays: List[Dict] = []
-        for ward in wards:
-            if random.choice((True, False)):
-                continue
-
-            wards_with_bays.append(ward)
-            for i in range(3):
-                bay = make_location(
-                    location_type=BAY_SCT_CODE, parent=ward, suffix=str(i + 1)
-                )
-                locations_client.create_location(
-                    clients=clients,
-                    location=bay,
-                    system_jwt=system_jwt,
-                )
-                bays.append(bay)
-
-        wards_with_beds = []
-        bays_with_beds = []
-        beds: List[Dict] = []
-        for bay_or_ward in [w for w in wards if w not in wards_with_bays] + bays:
-            if random.choice((True, False)):
-                continue
-
-            if bay_or_ward in wards:
-                wards_with_beds.append(bay_or_ward)
-            else:
-                bays_with_beds.append(bay_or_ward)
-
-            for i in range(3):
-                bed = make_location(
-                    location_type=BED_SCT_CODE, parent=bay_or_ward, suffix=str(i + 1)
-                )
-                locations_client.create_location(
-                    clients=clients,
-                    location=bed,
-                    system_jwt=system_jwt,
-                )
-                beds.append(bed)
-
-        n_hospitals = len(hospitals)
-        n_wards = len(wards)
-        n_bays = len(bays)
-        n_beds = len(beds)
 
+        # Each location's parent is in an earlier level, so the locations of a level
+        # can be posted in parallel once the previous level has been posted.
+        for level, level_locations in levels.items():
+            with ProgressLogger(
+                f"Posting {level}", total=len(level_locations)
+            ) as location_progress:
+                for _ in bounded_map(
+                    _post,
+                    level_locations,
+                    max_in_flight=Configuration.LOCATION_POST_CONCURRENCY,
+                ):
+                    location_progress.item()
+
+        bay_uuids: Set[str] = {bay["uuid"] for bay in levels["bays"]}
+        bed_parents: Set[str] = {bed["parent"] for bed in levels["beds"]}
         logger.info(
             "Generated %d locations.",
-            n_hospitals + n_wards + n_bays + n_beds,
+            sum(len(level_locations) for level_locations in levels.values()),
             extra={
-                "hospitals": n_hospitals,
-                "wards": n_wards,
-                "bays": n_bays,
-                "beds": n_beds,
-                "wards with bays but without beds": len([wards_with_bays]),
-                "wards with beds but without bays": len(wards_with_beds),
-                "bays with beds": len(bays_with_beds),
+                **{
+                    level: len(level_locations)
+                    for level, level_locations in levels.items()
+                },
+                "wards with bays but without beds": len(
+                    {bay["parent"] for bay in levels["bays"]}
+                ),
+                "wards with beds but without bays": len(bed_parents - bay_uuids),
+                "bays with beds": len(bed_parents & bay_uuids),
             },
         )
 
@@ -417,6 +604,47 @@ def populate_dhos_locations(
             )
 
 
+def generate_location_tree(num_hospitals: int, num_wards: int) -> Dict[str, List[Dict]]:
+    """
+    Generates hospitals, wards randomly spread between them, and bays and beds, by
+    level from hospitals down to beds. Half the wards have three bays, and half the
+    bays and the wards without bays have three beds.
+    """
+    hospitals: List[Dict] = [make_location() for _ in range(num_hospitals)]
+    wards: List[Dict] = [
+        make_location(
+            location_type=WARD_SCT_CODE,
+            parent=random.choice(hospitals),
+            suffix=str(i + 1),
+        )
+        for i in range(num_wards)
+    ]
+
+    wards_without_bays: List[Dict] = []
+    bays: List[Dict] = []
+    for ward in wards:
+        if random.choice((True, False)):
+            wards_without_bays.append(ward)
+            continue
+        bays.extend(
+            make_location(location_type=BAY_SCT_CODE, parent=ward, suffix=str(i + 1))
+            for i in range(3)
+        )
+
+    beds: List[Dict] = []
+    for bay_or_ward in wards_without_bays + bays:
+        if random.choice((True, False)):
+            continue
+        beds.extend(
+            make_location(
+                location_type=BED_SCT_CODE, parent=bay_or_ward, suffix=str(i + 1)
+            )
+            for i in range(3)
+        )
+
+    return {"hospitals": hospitals, "wards": wards, "bays": bays, "beds": beds}
+
+
 def get_random_clinician(clinicians: List[Dict], allowed_roles: Set[str]) -> Dict:
     return random.choice(
         [
@@ -432,11 +660,11 @@ def get_random_clinician_jwt(
     clinicians: List[Dict], allowed_roles: Set[str], use_system_jwt: bool = False
 ) -> str:
     if use_system_jwt:
-        logger.debug("Using system for patient generation")
+        progress.detail("Using system for patient generation")
         return auth_controller.get_system_jwt()
 
     clinician = get_random_clinician(clinicians, allowed_roles)
-    logger.debug("Using clinician for patient generation: %s", clinician["uuid"])
+    progress.detail("Using clinician for patient generation: %s", clinician["uuid"])
     return auth_controller.get_clinician_jwt(
         clinician["email_address"],
         GENERATED_CLINICIAN_PASSWORD,
@@ -449,7 +677,7 @@ def populate_dhos_activation_auth(clients: ClientRepository) -> None:
     system_jwt: str = auth_controller.get_system_jwt()
 
     for patient_uuid in (f"static_patient_uuid_{i}" for i in range(1, 10)):
-        logger.debug("Posting activation for GDM patient with UUID %s", patient_uuid)
+        progress.detail("Posting activation for GDM patient with UUID %s", patient_uuid)
         activation_auth_client.create_activation_for_patient(
             clients=clients,
             patient_id=patient_uuid,
@@ -467,7 +695,7 @@ def populate_dhos_activation_auth(clients: ClientRepository) -> None:
     )
 
     for device_uuid in (f"static_device_uuid_D{i}" for i in range(1, 10)):
-        logger.debug("Posting activation for SEND device with UUID %s", device_uuid)
+        progress.detail("Posting activation for SEND device with UUID %s", device_uuid)
         activation_auth_client.create_device(
             clients=clients,
             device_id=device_uuid,
@@ -516,26 +744,56 @@ def get_patients_for_locations_and_products(
 
 def populate_gdm_bg_readings(clients: ClientRepository, product_settings: Dict) -> None:
     product_names: List[str] = [p for p in {"GDM", "DBM"} if p in product_settings]
-    location_uuids = get_location_uuids_for_products(clients, product_names)
-    patients = get_patients_for_locations_and_products(
-        clients, product_names, location_uuids
+    with timing.stage("find_patients"):
+        location_uuids = get_location_uuids_for_products(clients, product_names)
+        patients = get_patients_for_locations_and_products(
+            clients, product_names, location_uuids
+        )
+    # A resumed reset skips the patients whose readings were posted before it failed,
+    # so the patients are taken in a stable order.
+    patients = sorted(patients, key=lambda p: p["uuid"])
+    shard_controller.run_stage(
+        clients,
+        stage="gdm_bg_readings_api:patients",
+        processor="post_readings",
+        items=lambda start: patients[start:],
+        total=len(patients),
+        params={},
     )
 
-    for patient in patients:
-        logger.debug("Creating patient readings for patient %s", patient["uuid"])
-        readings: List[Dict] = ReadingsGenerator(patient=patient).generate_data()
-        logger.debug("Generated %d readings", len(readings))
-        patient_jwt: str = auth_controller.get_patient_jwt(
-            clients=clients, patient_id=patient["uuid"]
-        )
 
-        for i, reading in enumerate(readings):
-            logger.debug("Posting reading %d/%d", i + 1, len(readings))
-            gdm_bff_client.create_reading(
-                clients=clients,
-                reading_details=reading,
-                patient_id=patient["uuid"],
-                patient_jwt=patient_jwt,
+@shard_controller.shard_processor("post_readings")
+def _post_readings(
+    clients: ClientRepository,
+    stage: str,
+    patients: Iterable[Dict],
+    total: int,
+    params: Dict,
+) -> None:
+    with ProgressLogger(
+        "Posting BG readings for patients", total=total
+    ) as patient_progress:
+        for patient in patients:
+            with timing.stage("generate_readings"):
+                readings: List[Dict] = ReadingsGenerator(
+                    patient=patient
+                ).generate_data()
+            patient_jwt: str = auth_controller.get_patient_jwt(
+                clients=clients, patient_id=patient["uuid"]
+            )
+
+            with timing.stage("post_readings"):
+                for i, reading in enumerate(readings):
+                    progress.detail("Posting reading %d/%d", i + 1, len(readings))
+                    gdm_bff_client.create_reading(
+                        clients=clients,
+                        reading_details=reading,
+                        patient_id=patient["uuid"],
+                        patient_jwt=patient_jwt,
+                    )
+            checkpoint_controller.item_done(stage)
+            patient_progress.item(
+                "Posted %d readings for patient %s", len(readings), patient["uuid"]
             )
 
 
@@ -547,69 +805,78 @@ def populate_dhos_messages(clients: ClientRepository) -> None:
         system_jwt=system_jwt,
     )
 
-    for location_uuid, location in locations.items():
-        logger.debug("Getting patients at location: %s", location["display_name"])
-        patients = services_client.get_patients_at_location(
-            clients=clients,
-            location_uuid=location_uuid,
-            product_name="GDM",
-            system_jwt=system_jwt,
-        )
-        for patient in patients:
-            logger.debug("Creating patient messages")
-            clinicians = users_client.get_clinicians_at_location(
+    with ProgressLogger("Posting messages for patients") as patient_progress:
+        for location_uuid, location in locations.items():
+            progress.detail(
+                "Getting patients at location: %s", location["display_name"]
+            )
+            patients = services_client.get_patients_at_location(
                 clients=clients,
                 location_uuid=location_uuid,
+                product_name="GDM",
                 system_jwt=system_jwt,
             )
-            clinicians = [
-                c
-                for c in clinicians
-                if "gdm" in [p["product_name"].lower() for p in c["products"]]
-            ]
-
-            # Random number of messages between 0 and equivalent of one per week
-            date_start = parse_iso8601_to_date(patient["dh_products"][0]["opened_date"])
-            if date_start is None:
-                raise ValueError("No opened date for product")
-            date_difference = date.today() - date_start
+            for patient in patients:
+                clinicians = users_client.get_clinicians_at_location(
+                    clients=clients,
+                    location_uuid=location_uuid,
+                    system_jwt=system_jwt,
+                )
+                clinicians = [
+                    c
+                    for c in clinicians
+                    if "gdm" in [p["product_name"].lower() for p in c["products"]]
+                ]
+
+                # Random number of messages between 0 and equivalent of one per week
+                date_start = parse_iso8601_to_date(
+                    patient["dh_products"][0]["opened_date"]
+                )
+                if date_start is None:
+                    raise ValueError("No opened date for product")
+                date_difference = date.today() - date_start
 
-            clinician_random = get_random_clinician(
-                clinicians, {"GDM Clinician", "GDM Superclinician"}
-            )
-            messages = MessageGenerator(patient=patient).generate_message_data(
-                number_of_messages=random.randint(0, max(0, date_difference.days // 7))
-            )
-            for message in messages:
-                # Generate a JWT depending on the message sender.
-                if message["sender_type"] == "system":
-                    jwt = auth_controller.get_system_jwt("dhos-robot")
-                    headers = {}
-                elif message["sender_type"] == "location":
-                    jwt = auth_controller.get_clinician_jwt(
-                        clinician_random["email_address"],
-                        GENERATED_CLINICIAN_PASSWORD,
-                        clinician_uuid=clinician_random["uuid"],
+                clinician_random = get_random_clinician(
+                    clinicians, {"GDM Clinician", "GDM Superclinician"}
+                )
+                messages = MessageGenerator(patient=patient).generate_message_data(
+                    number_of_messages=random.randint(
+                        0, max(0, date_difference.days // 7)
                     )
-                    headers = {
-                        "X-Location-Ids": ",".join(clinician_random["locations"])
-                    }
-                elif message["sender_type"] == "patient":
-                    jwt = auth_controller.get_patient_jwt(
+                )
+                for message in messages:
+                    # Generate a JWT depending on the message sender.
+                    if message["sender_type"] == "system":
+                        jwt = auth_controller.get_system_jwt("dhos-robot")
+                        headers = {}
+                    elif message["sender_type"] == "location":
+                        jwt = auth_controller.get_clinician_jwt(
+                            clinician_random["email_address"],
+                            GENERATED_CLINICIAN_PASSWORD,
+                            clinician_uuid=clinician_random["uuid"],
+                        )
+                        headers = {
+                            "X-Location-Ids": ",".join(clinician_random["locations"])
+                        }
+                    elif message["sender_type"] == "patient":
+                        jwt = auth_controller.get_patient_jwt(
+                            clients=clients,
+                            patient_id=patient["uuid"],
+                        )
+                        headers = {}
+                    else:
+                        raise ValueError(
+                            f"Unexpected message sender type '{message['sender_type']}'"
+                        )
+
+                    messages_client.create_message(
                         clients=clients,
-                        patient_id=patient["uuid"],
+                        message=message,
+                        jwt=jwt,
+                        headers=headers,
                     )
-                    headers = {}
-                else:
-                    raise ValueError(
-                        f"Unexpected message sender type '{message['sender_type']}'"
-                    )
-
-                messages_client.create_message(
-                    clients=clients,
-                    message=message,
-                    jwt=jwt,
-                    headers=headers,
+                patient_progress.item(
+                    "Posted %d messages for patient %s", len(messages), patient["uuid"]
                 )
 
 
@@ -623,7 +890,7 @@ def populate_dhos_questions(clients: ClientRepository) -> None:
     logger.debug("Posting question types")
     question_types = questions_data.pop("question_type", list())
     for question_type in question_types:
-        logger.debug("Posting question_type with UUID: %s", question_type["uuid"])
+        progress.detail("Posting question_type with UUID: %s", question_type["uuid"])
         questions_client.create_question_type(
             clients=clients,
             question_type=question_type,
@@ -634,7 +901,7 @@ def populate_dhos_questions(clients: ClientRepository) -> None:
     logger.debug("Posting question option types")
     question_option_types = questions_data.pop("question_option_type", list())
     for question_option_type in question_option_types:
-        logger.debug(
+        progress.detail(
             "Posting question_option_type with UUID %s", question_option_type["uuid"]
         )
         questions_client.create_question_option_type(
@@ -647,7 +914,7 @@ def populate_dhos_questions(clients: ClientRepository) -> None:
     logger.debug("Posting questions")
     questions = questions_data.pop("question", list())
     for question in questions:
-        logger.debug("Posting question '%s'", question["question"])
+        progress.detail("Posting question '%s'", question["question"])
         questions_client.create_question(
             clients=clients,
             question=question,
@@ -666,7 +933,7 @@ def populate_dhos_telemetry(clients: ClientRepository) -> None:
         system_jwt=system_jwt,
     )
     for location_uuid, location in locations.items():
-        logger.info("Getting patients at location: %s", location["display_name"])
+        progress.detail("Getting patients at location: %s", location["display_name"])
         for patient in services_client.get_patients_at_location(
             clients=clients,
             location_uuid=location_uuid,
@@ -675,7 +942,7 @@ def populate_dhos_telemetry(clients: ClientRepository) -> None:
         ):
             patients[patient["uuid"]] = patient
 
-        logger.info("Getting clinicians at location: %s", location["display_name"])
+        progress.detail("Getting clinicians at location: %s", location["display_name"])
         for clinician in (
             c
             for c in users_client.get_clinicians_at_location(
@@ -693,7 +960,7 @@ def populate_dhos_telemetry(clients: ClientRepository) -> None:
 
     for installation in telemetry_data["mobile"]:
         random_patient: Dict = random.choice(list(patients.values()))
-        logger.debug(
+        progress.detail(
             "Posting mobile installation for patient %s", random_patient["uuid"]
         )
         telemetry_client.create_patient_installation(
@@ -708,7 +975,7 @@ def populate_dhos_telemetry(clients: ClientRepository) -> None:
 
     for installation in telemetry_data["desktop"]:
         random_clinician: Dict = random.choice(list(clinicians.values()))
-        logger.debug(
+        progress.detail(
             "Posting desktop installation for clinician %s", random_clinician["uuid"]
         )
         telemetry_client.create_clinician_installation(
@@ -748,54 +1015,68 @@ def populate_dhos_encounters(clients: ClientRepository) -> None:
     )
     clinician_jwt = _get_stan_lee_jwt()
 
-    for patient in patients:
-        num_encounters: int = random.randint(0, 5)
+    with ProgressLogger(
+        "Posting encounters for patients", total=len(patients)
+    ) as patient_progress:
+        for patient in patients:
+            num_encounters: int = random.randint(0, MAX_ENCOUNTERS_PER_PATIENT)
 
-        for i in range(num_encounters):
-            discharged: bool = i < (num_encounters - 1)
-            encounter = generator.generate_data_for_patient(patient, discharged)
-            encounter = encounters_client.create_encounter(
-                clients=clients,
-                encounter=encounter,
-                clinician_jwt=clinician_jwt,
-            )
-            encounter_id: str = encounter["uuid"]
-            if random.random() > 0.7:
-                discharged_date: datetime = _discharge_date_for_spo2_history_change(
-                    encounter
-                )
-                admitted_at_iso8601 = parse_iso8601_to_datetime(
-                    encounter["admitted_at"]
-                )
-                if admitted_at_iso8601 is None:
-                    raise ValueError("No admission datetime")
-                days_in_hospital: timedelta = discharged_date - admitted_at_iso8601
-                number_of_scale_changes: int = math.floor(
-                    days_in_hospital.days / DAYS_BETWEEN_SPO2_SCALE_CHANGE
+            for i in range(num_encounters):
+                discharged: bool = i < (num_encounters - 1)
+                encounter = generator.generate_data_for_patient(patient, discharged)
+                encounter = encounters_client.create_encounter(
+                    clients=clients,
+                    encounter=encounter,
+                    clinician_jwt=clinician_jwt,
                 )
-                minimum_spo2_scale_date: datetime = admitted_at_iso8601
-                for scale_calculated_index in range(number_of_scale_changes):
-                    day_gap_between_scale_changes: float = (
-                        DAYS_BETWEEN_SPO2_SCALE_CHANGE
-                    )
-                    if number_of_scale_changes == 1:
-                        day_gap_between_scale_changes = days_in_hospital.days / 2
-                    minimum_spo2_scale_date = minimum_spo2_scale_date + timedelta(
-                        days=day_gap_between_scale_changes
+                encounter_id: str = encounter["uuid"]
+                if random.random() > 0.7:
+                    discharged_date: datetime = _discharge_date_for_spo2_history_change(
+                        encounter
                     )
-                    spo2_scale: int = 2 if scale_calculated_index % 2 == 0 else 1
-                    spo2_history = encounters_client.update_spo2_scale(
-                        clients=clients,
-                        encounter_id=encounter_id,
-                        spo2_scale=spo2_scale,
-                        clinician_jwt=clinician_jwt,
+                    admitted_at_iso8601 = parse_iso8601_to_datetime(
+                        encounter["admitted_at"]
                     )
-                    minimum_spo2_scale_date = encounters_client.update_spo2_history(
-                        clients=clients,
-                        score_system_history_id=spo2_history["uuid"],
-                        spo2_scale_time=minimum_spo2_scale_date,
-                        system_jwt=system_jwt,
+                    if admitted_at_iso8601 is None:
+                        raise ValueError("No admission datetime")
+                    days_in_hospital: timedelta = discharged_date - admitted_at_iso8601
+                    number_of_scale_changes: int = math.floor(
+                        days_in_hospital.days / DAYS_BETWEEN_SPO2_SCALE_CHANGE
                     )
+                    minimum_spo2_scale_date: datetime = admitted_at_iso8601
+                    for scale_calculated_index in range(number_of_scale_changes):
+                        day_gap_between_scale_changes: float = (
+                            DAYS_BETWEEN_SPO2_SCALE_CHANGE
+                        )
+                        if number_of_scale_changes == 1:
+                            day_gap_between_scale_changes = days_in_hospital.days / 2
+                        minimum_spo2_scale_date = minimum_spo2_scale_date + timedelta(
+                            days=day_gap_between_scale_changes
+                        )
+                        spo2_scale: int = 2 if scale_calculated_index % 2 == 0 else 1
+                        spo2_history = encounters_client.update_spo2_scale(
+                            clients=clients,
+                            encounter_id=encounter_id,
+                            spo2_scale=spo2_scale,
+                            clinician_jwt=clinician_jwt,
+                        )
+                        minimum_spo2_scale_date = encounters_client.update_spo2_history(
+                            clients=clients,
+                            score_system_history_id=spo2_history["uuid"],
+                            spo2_scale_time=minimum_spo2_scale_date,
+                            system_jwt=system_jwt,
+                        )
+            patient_progress.item(
+                "Posted %d encounters for patient %s", num_encounters, patient["uuid"]
+            )
+
+    occupancy: Dict[str, int] = generator.allocator.occupancy()
+    logger.info(
+        "Patients with open encounters occupy %d of %d beds",
+        occupancy["occupied_beds"],
+        occupancy["beds"],
+        extra=occupancy,
+    )
 
 
 def _get_stan_lee_jwt() -> str:
@@ -816,27 +1097,26 @@ def populate_dhos_observations(clients: ClientRepository) -> None:
         location_types=["225746001"],
     )
     logger.debug("Got %d locations", len(locations))
-    i_loc = 0
-    for location_uuid, location in locations.items():
-        encounters: List[Dict] = send_bff_client.search_encounters(
-            clients=clients, location_uuid=location_uuid, system_jwt=system_jwt
-        )["results"]
-        logger.debug(
-            "(Location %d/%d) Got %d encounters at location %s",
-            i_loc,
-            len(locations),
-            len(encounters),
-            location["display_name"],
-        )
-        for i_enc, encounter in enumerate(encounters):
-            logger.debug(
-                "(%d/%d) Posting observations for encounter with UUID %s",
-                i_enc,
+    with ProgressLogger(
+        "Posting observations for SEND locations", total=len(locations)
+    ) as location_progress, ProgressLogger(
+        "Posting observations for encounters"
+    ) as encounter_progress:
+        for location_uuid, location in locations.items():
+            encounters: List[Dict] = send_bff_client.search_encounters(
+                clients=clients, location_uuid=location_uuid, system_jwt=system_jwt
+            )["results"]
+            for encounter in encounters:
+                _populate_observations(clients, encounter)
+                encounter_progress.item(
+                    "Posted observations for encounter with UUID %s",
+                    encounter["encounter_uuid"],
+                )
+            location_progress.item(
+                "Posted observations for %d encounters at location %s",
                 len(encounters),
-                encounter["encounter_uuid"],
+                location["display_name"],
             )
-            _populate_observations(clients, encounter)
-        i_loc += 1
 
 
 def populate_dhos_fuego(clients: ClientRepository) -> None:
@@ -868,13 +1148,17 @@ def populate_dhos_fuego(clients: ClientRepository) -> None:
         raise ValueError("Patients quantity mismatch!")
 
     fhir_patients_posted: List[Dict] = []
-    for fhir_dhos_services_patient in fhir_gdm_patients:
-        fhir_patient = fuego_client.create_fhir_patient(
-            clients=clients,
-            fhir_patient=fhir_dhos_services_patient,
-            system_jwt=system_jwt,
-        )
-        fhir_patients_posted.append(fhir_patient)
+    with ProgressLogger(
+        "Posting FHIR patients", total=len(fhir_gdm_patients)
+    ) as fhir_progress:
+        for fhir_dhos_services_patient in fhir_gdm_patients:
+            fhir_patient = fuego_client.create_fhir_patient(
+                clients=clients,
+                fhir_patient=fhir_dhos_services_patient,
+                system_jwt=system_jwt,
+            )
+            fhir_patients_posted.append(fhir_patient)
+            fhir_progress.item()
 
     if len(fhir_patients_posted) != len(fhir_gdm_patients):
         raise ValueError("Patients quantity mismatch!")
@@ -892,7 +1176,7 @@ def populate_dhos_fuego(clients: ClientRepository) -> None:
             ]
         }
 
-        logger.debug("Updating patient %s", patient["uuid"], extra=patient_details)
+        progress.detail("Updating patient %s", patient["uuid"], extra=patient_details)
         services_client.update_patient(
             clients=clients,
             patient_id=patient["uuid"],
@@ -917,32 +1201,32 @@ def make_location(
         )
 
     if location_type == HOSPITAL_SCT_CODE:
-        display_name = f"{fake.county()} Hospital"
+        display_name = f"{names.county()} Hospital"
     elif location_type == WARD_SCT_CODE:
         display_name = (
             f"Ward {suffix}"
             if suffix
-            else f"{parent['display_name']} {fake.county()} Ward"  # type: ignore
+            else f"{parent['display_name']} {names.county()} Ward"  # type: ignore
         )
     elif location_type == BAY_SCT_CODE:
         display_name = (
             f"Bay {suffix}"
             if suffix
-            else f"{parent['display_name']} {fake.county()} Bay"  # type: ignore
+            else f"{parent['display_name']} {names.county()} Bay"  # type: ignore
         )
     elif location_type == BED_SCT_CODE:
         display_name = (
             f"Bed {suffix}"
             if suffix
-            else f"{parent['display_name']} {fake.county()} Bed"  # type: ignore
+            else f"{parent['display_name']} {names.county()} Bed"  # type: ignore
         )
     else:
         raise ValueError(f"Unknown location type: {location_type}")
 
     return {
-        "uuid": str(uuid.uuid4()),
+        "uuid": names.uuid4(),
         "location_type": location_type,
-        "ods_code": fake.license_plate().replace(" ", ""),
+        "ods_code": names.ods_code(),
         "display_name": display_name,
         "dh_products": [{"product_name": "SEND", "opened_date": "2017-10-19"}],
         "active": True,
@@ -951,32 +1235,86 @@ def make_location(
 
 
 def _open_and_closed_patients(
-    clients: ClientRepository, num_patients: int, product_code: str
-) -> List[Dict]:
+    clients: ClientRepository, num_patients: int, product_code: str, start: int = 0
+) -> Iterator[Dict]:
+    """
+    Generates a product's patients lazily, from the patient at index start. Open
+    patients come first, the first ten of them with static UUIDs and hospital
+    numbers, then a sixth of the patients are closed.
+    """
     prefix = product_code.lower() + "_" if product_code != "GDM" else ""
     num_closed_patients = num_patients // 6
     num_open_patients = num_patients - num_closed_patients
-    patients = [
-        generator_controller.generate_patient(
-            clients=clients,
-            product_name=product_code,
-            closed=False,
-            uuid=f"static_{prefix}patient_uuid_{i}" if i < 10 else None,
-            hospital_number=str(i) * 6 if i < 10 else None,
-        )
-        for i in range(num_open_patients)
-    ]
+    for i in range(start, num_patients):
+        with timing.stage("generate_patient"):
+            if i < num_open_patients:
+                patient = generator_controller.generate_patient(
+                    clients=clients,
+                    product_name=product_code,
+                    closed=False,
+                    uuid=f"static_{prefix}patient_uuid_{i}" if i < 10 else None,
+                    hospital_number=str(i) * 6 if i < 10 else None,
+                )
+            else:
+                patient = generator_controller.generate_patient(
+                    clients=clients, product_name=product_code, closed=True
+                )
+        yield patient
 
-    patients += [
-        generator_controller.generate_patient(
-            clients=clients, product_name=product_code, closed=True
-        )
-        for _ in range(num_closed_patients)
-    ]
-    return patients
+
+def _generated_patients(
+    clients: ClientRepository, num_patients: int, product_code: str, start: int = 0
+) -> Iterator[Dict]:
+    for _ in range(start, num_patients):
+        with timing.stage("generate_patient"):
+            patient = generator_controller.generate_patient(clients, product_code)
+        yield patient
 
 
 def _populate_observations(clients: ClientRepository, encounter: Dict) -> None:
+    clinician_jwt: str = _get_stan_lee_jwt()
+
+    def _post(obs_set: Dict, suppress_obs_publish: bool = True) -> Dict:
+        return send_bff_client.create_observation(
+            clients=clients,
+            obs_set=obs_set,
+            suppress_obs_publish=suppress_obs_publish,
+            clinician_jwt=clinician_jwt,
+        )
+
+    # Observation sets are generated, flagged and posted as a stream. Sets with their
+    # publish suppressed are posted concurrently in the order they were generated (by
+    # record time, newest first); the final set, which triggers the publish, is only
+    # posted once all the others have been created.
+    flagged = _with_publish_flags(_generate_observation_sets(encounter))
+    final_obs_set: Optional[Dict] = None
+
+    def _suppressed_obs_sets() -> Iterator[Dict]:
+        nonlocal final_obs_set
+        for obs_set, should_suppress in flagged:
+            if not should_suppress:
+                final_obs_set = obs_set
+                return
+            yield obs_set
+
+    posted = 0
+    for _ in bounded_map(
+        _post,
+        _suppressed_obs_sets(),
+        max_in_flight=Configuration.SEND_OBSERVATION_POST_CONCURRENCY,
+    ):
+        posted += 1
+    if final_obs_set is not None:
+        _post(final_obs_set, suppress_obs_publish=False)
+        posted += 1
+    progress.detail("Posted %d observation sets", posted)
+
+
+def _generate_observation_sets(encounter: Dict) -> Iterator[Dict]:
+    """
+    Lazily generates observation sets for an encounter, working backwards in time from
+    discharge (or now) towards admission.
+    """
     admission_time = parse_iso8601_to_datetime(encounter["admitted_at"])
     if admission_time is None:
         raise ValueError("No admission time in encounter")
@@ -989,15 +1327,11 @@ def _populate_observations(clients: ClientRepository, encounter: Dict) -> None:
         current_time = discharged_at - timedelta(microseconds=500)
 
     current_spo2_scale: int = encounter.get("spo2_scale", 1)
-    logger.debug("Creating patient observations")
-    clinician_jwt: str = _get_stan_lee_jwt()
-
     patient_trajectory: Trajectory = ObservationsGenerator.get_random_trajectory()
 
-    obs_sets: List[Dict] = []
-
+    generated = 0
     rand_num_of_obs = random.choice(WEIGHTED_RANDOM)
-    while current_time > admission_time and (len(obs_sets)) < rand_num_of_obs:
+    while current_time > admission_time and generated < rand_num_of_obs:
 
         if patient_trajectory == Trajectory.VERY_ILL:
             gap_minutes = random.randint(15, 90)
@@ -1021,18 +1355,23 @@ def _populate_observations(clients: ClientRepository, encounter: Dict) -> None:
         )
         # If the observations are empty, skip them this time.
         if not current_obs_set.get("observations", []):
-            logger.debug("No obs in set, skipping")
+            progress.detail("No obs in set, skipping")
             continue
 
-        obs_sets.append(current_obs_set)
+        generated += 1
+        yield current_obs_set
 
-    logger.debug("Posting %d observation sets", len(obs_sets))
-    for idx, obs_set in enumerate(obs_sets):
-        logger.debug("Posting observation set %d/%d", idx + 1, len(obs_sets))
-        should_suppress = idx < len(obs_sets) - 1
-        send_bff_client.create_observation(
-            clients=clients,
-            obs_set=obs_set,
-            suppress_obs_publish=should_suppress,
-            clinician_jwt=clinician_jwt,
-        )
+
+def _with_publish_flags(obs_sets: Iterable[Dict]) -> Iterator[Tuple[Dict, bool]]:
+    """
+    Pairs each observation set with whether its publish should be suppressed. Only the
+    final set triggers a publish, which needs a lookahead of a single set.
+    """
+    iterator = iter(obs_sets)
+    previous: Optional[Dict] = next(iterator, None)
+    if previous is None:
+        return
+    for obs_set in iterator:
+        yield previous, True
+        previous = obs_set
+    yield previous, False
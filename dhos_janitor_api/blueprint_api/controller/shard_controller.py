@@ -0,0 +1,603 @@
+import contextlib
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+
+import httpx
+from flask import Flask
+from she_logging import logger
+
+from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.blueprint_api.controller import checkpoint_controller
+from dhos_janitor_api.blueprint_api.janitor_thread import current_task_uuid
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import deadline, environment, metrics
+
+# Posts a stream of a stage's items: called with the clients, the stage, the items,
+# the number of items and the stage's parameters.
+ShardProcessor = Callable[
+    [ClientRepository, str, Iterable[Dict], int, Dict[str, Any]], None
+]
+
+# Functions processing the shards of each kind of stage, by name, so that any replica
+# can process a shard from the name recorded in the store.
+_processors: Dict[str, ShardProcessor] = {}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_stages (
+    task_uuid TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    processor TEXT NOT NULL,
+    environment TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created REAL NOT NULL,
+    published INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (task_uuid, stage)
+);
+CREATE TABLE IF NOT EXISTS shards (
+    task_uuid TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    items TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    items_done INTEGER NOT NULL DEFAULT 0,
+    items_ahead TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    PRIMARY KEY (task_uuid, stage, shard)
+);
+"""
+
+_PROGRESS_KEYS = (
+    "shards",
+    "pending",
+    "claimed",
+    "done",
+    "failed",
+    "items",
+    "items_done",
+)
+
+
+def shard_processor(name: str) -> Callable[[ShardProcessor], ShardProcessor]:
+    def _register(func: ShardProcessor) -> ShardProcessor:
+        _processors[name] = func
+        return func
+
+    return _register
+
+
+@dataclass(frozen=True)
+class Shard:
+    task_uuid: str
+    stage: str
+    shard: int
+    owner: str
+    processor: str
+    environment: str
+    params: Dict[str, Any]
+    items: List[Dict]
+    # The number of items posted in order by earlier attempts, and the indexes of
+    # those they posted ahead of them.
+    items_done: int
+    items_ahead: List[int]
+
+
+class ShardStore:
+    """
+    Shards of populate stages, in a SQLite database shared by the janitor replicas.
+    Claims are made in write transactions, so SQLite's locking ensures each shard is
+    claimed by one replica at a time. A claim lasts lease_sec unless renewed, after
+    which the shard may be claimed again. Only the replica holding the claim can
+    complete or fail the shard, or record the items of it posted so far; a shard that
+    fails is retried from the items not yet recorded. Items are only posted twice if
+    they were posted but not yet recorded when the shard failed, e.g. because its
+    replica died or stalled for lease_sec.
+    """
+
+    def __init__(self, path: str, lease_sec: float, max_attempts: int) -> None:
+        self._path = path
+        self.lease_sec = lease_sec
+        self._max_attempts = max_attempts
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as connection:
+            # Takes the write lock up front, so concurrent claims queue up rather than
+            # failing to upgrade a read lock.
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def publish(
+        self,
+        task_uuid: str,
+        stage: str,
+        processor: str,
+        environment_name: str,
+        params: Dict[str, Any],
+        items: Callable[[int], Iterable[Dict]],
+        shard_size: int,
+    ) -> None:
+        """
+        Splits the items of a task's stage into shards of shard_size for replicas to
+        claim. items returns the stage's items from a given index; each shard is
+        committed as soon as it is generated, so replicas can start on the first
+        shards straight away and only one shard is held in memory.
+
+        If the stage was published before, i.e. the task is being resumed, its shards
+        are kept, the failed ones are retried and publishing carries on from the
+        first item not yet published.
+        """
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT published FROM shard_stages WHERE task_uuid = ? AND stage = ?",
+                (task_uuid, stage),
+            ).fetchone()
+            if row is None:
+                connection.execute(
+                    "INSERT INTO shard_stages"
+                    " (task_uuid, stage, processor, environment, params, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        task_uuid,
+                        stage,
+                        processor,
+                        environment_name,
+                        json.dumps(params),
+                        time.time(),
+                    ),
+                )
+            else:
+                connection.execute(
+                    "UPDATE shards SET status = 'pending', attempts = 0, error = NULL"
+                    " WHERE task_uuid = ? AND stage = ? AND status = 'failed'",
+                    (task_uuid, stage),
+                )
+                if row[0]:
+                    return
+            shard, published_items = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM shards"
+                " WHERE task_uuid = ? AND stage = ?",
+                (task_uuid, stage),
+            ).fetchone()
+
+        remaining: Iterator[Dict] = iter(items(published_items))
+        while True:
+            chunk: List[Dict] = list(itertools.islice(remaining, shard_size))
+            if not chunk:
+                break
+            with self._transaction() as connection:
+                connection.execute(
+                    "INSERT INTO shards (task_uuid, stage, shard, items, size)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (task_uuid, stage, shard, json.dumps(chunk), len(chunk)),
+                )
+            shard += 1
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE shard_stages SET published = 1"
+                " WHERE task_uuid = ? AND stage = ?",
+                (task_uuid, stage),
+            )
+
+    def claim(
+        self,
+        owner: str,
+        task_uuid: Optional[str] = None,
+        stage: Optional[str] = None,
+    ) -> Optional[Shard]:
+        """
+        Claims the next shard that is pending or whose lease has expired, of the given
+        task's stage or else of any stage, oldest stage first.
+        """
+        query = (
+            "SELECT s.task_uuid, s.stage, s.shard, st.processor, st.environment,"
+            " st.params, s.items, s.items_done, s.items_ahead"
+            " FROM shards s JOIN shard_stages st"
+            " USING (task_uuid, stage)"
+            " WHERE (s.status = 'pending'"
+            " OR (s.status = 'claimed' AND s.lease_expires < ?))"
+        )
+        now = time.time()
+        args: List[Any] = [now]
+        if task_uuid is not None:
+            query += " AND s.task_uuid = ? AND s.stage = ?"
+            args += [task_uuid, stage]
+        query += " ORDER BY st.created, s.shard LIMIT 1"
+        with self._transaction() as connection:
+            row = connection.execute(query, args).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE shards SET status = 'claimed', owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1"
+                " WHERE task_uuid = ? AND stage = ? AND shard = ?",
+                (owner, now + self.lease_sec, row[0], row[1], row[2]),
+            )
+        return Shard(
+            task_uuid=row[0],
+            stage=row[1],
+            shard=row[2],
+            owner=owner,
+            processor=row[3],
+            environment=row[4],
+            params=json.loads(row[5]),
+            items=json.loads(row[6]),
+            items_done=row[7],
+            items_ahead=json.loads(row[8]),
+        )
+
+    def renew(self, shard: Shard) -> bool:
+        """
+        Extends the lease on a claimed shard, returning False if the claim was lost,
+        i.e. the lease expired and another replica claimed the shard.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE shards SET lease_expires = ?"
+                " WHERE task_uuid = ? AND stage = ? AND shard = ?"
+                " AND status = 'claimed' AND owner = ?",
+                (
+                    time.time() + self.lease_sec,
+                    shard.task_uuid,
+                    shard.stage,
+                    shard.shard,
+                    shard.owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def record_items(
+        self, shard: Shard, items_done: int, items_ahead: List[int]
+    ) -> bool:
+        """
+        Records the number of a claimed shard's items posted in order, and the indexes
+        of those posted ahead of them, returning False if the claim was lost.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE shards SET items_done = ?, items_ahead = ?"
+                " WHERE task_uuid = ? AND stage = ? AND shard = ?"
+                " AND status = 'claimed' AND owner = ?",
+                (
+                    items_done,
+                    json.dumps(items_ahead),
+                    shard.task_uuid,
+                    shard.stage,
+                    shard.shard,
+                    shard.owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, shard: Shard) -> bool:
+        """
+        Marks a claimed shard as done, returning False if the claim was lost.
+        """
+        # The items are no longer needed, only counted.
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE shards SET status = 'done', items = '[]', error = NULL"
+                " WHERE task_uuid = ? AND stage = ? AND shard = ?"
+                " AND status = 'claimed' AND owner = ?",
+                (shard.task_uuid, shard.stage, shard.shard, shard.owner),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, shard: Shard, error: str) -> bool:
+        """
+        Releases a shard that failed to be claimed again, or marks it as failed once
+        it has been attempted max_attempts times. Returns False if the claim was lost.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed'"
+                " ELSE 'pending' END, owner = NULL, lease_expires = 0, error = ?"
+                " WHERE task_uuid = ? AND stage = ? AND shard = ?"
+                " AND status = 'claimed' AND owner = ?",
+                (
+                    self._max_attempts,
+                    error,
+                    shard.task_uuid,
+                    shard.stage,
+                    shard.shard,
+                    shard.owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    @contextlib.contextmanager
+    def renewing(self, shard: Shard) -> Iterator[threading.Event]:
+        """
+        Renews the lease on a claimed shard every third of lease_sec while the context
+        runs, on a daemon thread. Yields an event that is set if the claim is lost.
+        """
+        lost = threading.Event()
+        stopped = threading.Event()
+
+        def _renew() -> None:
+            while not stopped.wait(self.lease_sec / 3):
+                try:
+                    renewed: bool = self.renew(shard)
+                except sqlite3.Error:
+                    logger.exception(
+                        "Failed to renew the lease on shard %d", shard.shard
+                    )
+                    continue
+                if not renewed:
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=_renew, name="shard lease", daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stopped.set()
+            thread.join()
+
+    def progress(self, task_uuid: str) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the numbers of shards and of items of each of the task's stages, in
+        total and by status, by stage.
+        """
+        stages: Dict[str, Dict[str, int]] = {}
+        with self._connection() as connection:
+            rows = connection.execute(
+                "SELECT stage, status, COUNT(*), SUM(size) FROM shards"
+                " WHERE task_uuid = ? GROUP BY stage, status ORDER BY stage",
+                (task_uuid,),
+            ).fetchall()
+        for stage, status, shards, items in rows:
+            counts = stages.setdefault(stage, dict.fromkeys(_PROGRESS_KEYS, 0))
+            counts["shards"] += shards
+            counts[status] += shards
+            counts["items"] += items
+            if status == "done":
+                counts["items_done"] += items
+        return stages
+
+
+def from_config() -> Optional[ShardStore]:
+    """
+    The store at SHARD_STORE_PATH, or None if population isn't sharded.
+    """
+    if not Configuration.SHARD_STORE_PATH:
+        return None
+    return ShardStore(
+        Configuration.SHARD_STORE_PATH,
+        lease_sec=Configuration.SHARD_LEASE_SEC,
+        max_attempts=Configuration.SHARD_MAX_ATTEMPTS,
+    )
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class _ShardCheckpoint(checkpoint_controller.Checkpoint):
+    """
+    Counts the items of a claimed shard as they are posted, in the shard's row in the
+    store rather than a checkpoint file, so that a retried shard skips those posted
+    by earlier attempts. Saved each CHECKPOINT_CHUNK_SIZE items and when the shard
+    fails, like a checkpoint.
+    """
+
+    def __init__(self, store: ShardStore, shard: Shard) -> None:
+        super().__init__(Path(store._path), {})
+        self._store = store
+        self._shard = shard
+        self.items[shard.stage] = shard.items_done
+        self.items_ahead[shard.stage] = set(shard.items_ahead)
+
+    def save(self) -> None:
+        with self._lock:
+            items_done: int = self.items[self._shard.stage]
+            items_ahead: List[int] = sorted(self.items_ahead[self._shard.stage])
+        self._store.record_items(self._shard, items_done, items_ahead)
+
+    def discard(self) -> None:
+        # The shard is completed by process_shard.
+        pass
+
+
+def process_shard(store: ShardStore, shard: Shard, clients: ClientRepository) -> bool:
+    """
+    Processes a claimed shard, recording in the store whether it succeeded. The lease
+    on the shard is renewed while it is processed; if it is lost all the same, the
+    shard is left to the replica that claimed it since and counts as failed here.
+    The items posted are counted in the store rather than any checkpoint, and those
+    posted by earlier attempts at the shard are skipped.
+    """
+    logger.info(
+        "Processing shard %d of stage %s of task %s (%d items, %d done before)",
+        shard.shard,
+        shard.stage,
+        shard.task_uuid,
+        len(shard.items),
+        shard.items_done,
+    )
+    try:
+        with store.renewing(shard) as lost, checkpoint_controller.active(
+            _ShardCheckpoint(store, shard)
+        ):
+            _processors[shard.processor](
+                clients,
+                shard.stage,
+                shard.items[shard.items_done :],
+                len(shard.items) - shard.items_done,
+                shard.params,
+            )
+    except Exception as e:
+        logger.exception(
+            "Failed to process shard %d of stage %s", shard.shard, shard.stage
+        )
+        store.fail(shard, repr(e))
+        metrics.SHARDS_PROCESSED.labels(shard.processor, "error").inc()
+        return False
+    if lost.is_set() or not store.complete(shard):
+        logger.error(
+            "Lost the lease on shard %d of stage %s before it was processed",
+            shard.shard,
+            shard.stage,
+        )
+        metrics.SHARDS_PROCESSED.labels(shard.processor, "error").inc()
+        return False
+    metrics.SHARDS_PROCESSED.labels(shard.processor, "done").inc()
+    return True
+
+
+def run_stage(
+    clients: ClientRepository,
+    stage: str,
+    processor: str,
+    items: Callable[[int], Iterable[Dict]],
+    total: int,
+    params: Dict[str, Any],
+) -> None:
+    """
+    Processes the total items of a stage with the named processor. items returns the
+    stage's items from a given index, so that they can be generated as they are
+    processed and those already processed needn't be generated again.
+
+    If SHARD_STORE_PATH is set, the items are published as shards which this and
+    other replicas claim; this replica processes shards until there are none left to
+    claim, then waits for the rest to be done. Otherwise the items are all processed
+    here, skipping any posted before a resumed reset failed, as counted in its
+    checkpoint under the stage.
+    """
+    store: Optional[ShardStore] = from_config()
+    if store is None:
+        start: int = checkpoint_controller.items_done(stage)
+        _processors[processor](
+            clients, stage, items(start), max(total - start, 0), params
+        )
+        return
+
+    task_uuid: str = current_task_uuid() or str(uuid.uuid4())
+    store.publish(
+        task_uuid,
+        stage,
+        processor,
+        environment.current().name,
+        params,
+        items,
+        Configuration.SHARD_SIZE,
+    )
+    owner: str = _owner()
+    while True:
+        shard: Optional[Shard] = store.claim(owner, task_uuid, stage)
+        if shard is not None:
+            process_shard(store, shard, clients)
+            continue
+        progress: Dict[str, int] = store.progress(task_uuid).get(
+            stage, dict.fromkeys(_PROGRESS_KEYS, 0)
+        )
+        if progress["failed"]:
+            raise ValueError(
+                f"{progress['failed']} shards of stage {stage} failed"
+                f" after {Configuration.SHARD_MAX_ATTEMPTS} attempts"
+            )
+        if progress["done"] == progress["shards"]:
+            return
+        deadline.check()
+        time.sleep(Configuration.SHARD_POLL_INTERVAL_SEC)
+
+
+class ShardWorker:
+    """
+    Claims and processes the shards published by the resets of any replica, on a
+    daemon thread. Each shard is processed against the environment of the reset that
+    published it, with its own clients. Transports can be given by target as for
+    ClientRepository.from_app.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        store: ShardStore,
+        transports: Optional[Mapping[str, httpx.BaseTransport]] = None,
+    ) -> None:
+        self._app = app
+        self._store = store
+        self._transports = transports
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="shard worker", daemon=True
+        )
+
+    def start(self) -> None:
+        logger.info("Starting shard worker")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def run_once(self) -> bool:
+        """
+        Processes one shard, returning False if there were none to claim.
+        """
+        shard: Optional[Shard] = self._store.claim(_owner())
+        if shard is None:
+            return False
+        try:
+            shard_environment = environment.get_environment(shard.environment)
+        except ValueError as e:
+            logger.exception("Can't process shard of stage %s", shard.stage)
+            self._store.fail(shard, repr(e))
+            return True
+        clients = ClientRepository.from_app(
+            self._app, transports=self._transports, environment=shard_environment
+        )
+        try:
+            with self._app.app_context(), environment.active(shard_environment):
+                process_shard(self._store, shard, clients)
+        finally:
+            clients.close()
+        return True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Shard worker failed to claim a shard")
+            self._stopped.wait(Configuration.SHARD_POLL_INTERVAL_SEC)
+
+
+def start_worker(app: Flask) -> Optional[ShardWorker]:
+    store: Optional[ShardStore] = from_config()
+    if store is None:
+        return None
+    worker = ShardWorker(app, store)
+    worker.start()
+    return worker
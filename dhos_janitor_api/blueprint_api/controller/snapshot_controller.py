@@ -0,0 +1,183 @@
+import importlib
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from she_logging import logger
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import environment, metrics, timing
+
+SNAPSHOT_SUFFIX = "-snapshot"
+
+
+class TemplateSnapshots:
+    """
+    Snapshots of the targets' Postgres databases, kept as databases on the same
+    server named "<database>-snapshot". A snapshot is captured by creating it with the
+    target's database as its template, and restored by recreating the target's
+    database with the snapshot as its template. Both need the database to have no
+    connections, so the target's connections are closed first; its services are
+    expected to reconnect.
+
+    connect returns a DB-API connection to the server's maintenance database as a user
+    able to create and drop databases.
+    """
+
+    def __init__(
+        self, connect: Callable[[], Any], databases: Mapping[str, str]
+    ) -> None:
+        self._connect = connect
+        self._databases = databases
+
+    def database(self, target: str) -> Optional[str]:
+        return self._databases.get(target)
+
+    def has_snapshot(self, target: str) -> bool:
+        database: Optional[str] = self.database(target)
+        if database is None:
+            return False
+        with self._cursor() as cursor:
+            return self._exists(cursor, database + SNAPSHOT_SUFFIX)
+
+    def capture(self, target: str) -> None:
+        database: str = self._require_database(target)
+        snapshot: str = database + SNAPSHOT_SUFFIX
+        with self._cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {_quote(snapshot)}")
+            self._disconnect(cursor, database)
+            try:
+                cursor.execute(
+                    f"CREATE DATABASE {_quote(snapshot)} TEMPLATE {_quote(database)}"
+                )
+            finally:
+                cursor.execute(
+                    f"ALTER DATABASE {_quote(database)} WITH ALLOW_CONNECTIONS true"
+                )
+
+    def restore(self, target: str) -> None:
+        database: str = self._require_database(target)
+        snapshot: str = database + SNAPSHOT_SUFFIX
+        with self._cursor() as cursor:
+            # Checked first, as the target's database is dropped before it is
+            # recreated from the snapshot.
+            if not self._exists(cursor, snapshot):
+                raise ValueError(f"No snapshot of target {target} to restore")
+            self._disconnect(cursor, database)
+            try:
+                cursor.execute(f"DROP DATABASE IF EXISTS {_quote(database)}")
+                cursor.execute(
+                    f"CREATE DATABASE {_quote(database)} TEMPLATE {_quote(snapshot)}"
+                )
+            finally:
+                # Not there to re-enable if it was dropped but couldn't be recreated.
+                if self._exists(cursor, database):
+                    cursor.execute(
+                        f"ALTER DATABASE {_quote(database)} WITH ALLOW_CONNECTIONS true"
+                    )
+
+    def _require_database(self, target: str) -> str:
+        database: Optional[str] = self.database(target)
+        if database is None:
+            raise ValueError(f"No database configured for target {target}")
+        return database
+
+    @staticmethod
+    def _exists(cursor: Any, database: str) -> bool:
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (database,))
+        return cursor.fetchone() is not None
+
+    @staticmethod
+    def _disconnect(cursor: Any, database: str) -> None:
+        cursor.execute(
+            f"ALTER DATABASE {_quote(database)} WITH ALLOW_CONNECTIONS false"
+        )
+        cursor.execute(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity"
+            " WHERE datname = %s AND pid <> pg_backend_pid()",
+            (database,),
+        )
+
+    def _cursor(self) -> Any:
+        connection = self._connect()
+        # CREATE and DROP DATABASE can't be run in a transaction.
+        connection.autocommit = True
+        return _ClosingCursor(connection)
+
+
+class _ClosingCursor:
+    def __init__(self, connection: Any) -> None:
+        self._connection = connection
+
+    def __enter__(self) -> Any:
+        self._cursor = self._connection.cursor()
+        return self._cursor
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._cursor.close()
+        self._connection.close()
+
+
+def _quote(identifier: str) -> str:
+    if '"' in identifier:
+        raise ValueError(f"Invalid database name {identifier}")
+    return f'"{identifier}"'
+
+
+def from_config() -> TemplateSnapshots:
+    """
+    Snapshots on the current environment's server at SNAPSHOT_DATABASE_URL. Needs
+    psycopg2, which isn't otherwise a dependency of the janitor.
+    """
+    url: str = environment.setting("SNAPSHOT_DATABASE_URL")
+    if not url:
+        raise ValueError("SNAPSHOT_DATABASE_URL is not set")
+
+    def _connect() -> Any:
+        try:
+            psycopg2 = importlib.import_module("psycopg2")
+        except ImportError:
+            raise ValueError("psycopg2 must be installed to use snapshots")
+        return psycopg2.connect(url)
+
+    return TemplateSnapshots(_connect, Configuration.TARGET_DATABASES)
+
+
+def restore_snapshots(
+    snapshots: TemplateSnapshots, targets: Iterable[str]
+) -> Dict[str, float]:
+    """
+    Restores the snapshot of each of the targets that has one, returning the time
+    taken to restore each, by target.
+    """
+    restored: Dict[str, float] = {}
+    with timing.stage("restore"):
+        for target in targets:
+            if not snapshots.has_snapshot(target):
+                logger.info("No snapshot of target %s to restore", target)
+                continue
+            started = time.perf_counter()
+            with metrics.TASK_STAGE_DURATION.labels(
+                "reset_microservices", "restore", target
+            ).time(), timing.stage(target):
+                snapshots.restore(target)
+            restored[target] = time.perf_counter() - started
+            logger.info("Restored target %s in %.2fs", target, restored[target])
+    return restored
+
+
+def capture_snapshots(
+    snapshots: TemplateSnapshots, targets: Iterable[str]
+) -> List[str]:
+    """
+    Captures a snapshot of each of the targets that has a database, returning the
+    targets captured.
+    """
+    captured: List[str] = []
+    with timing.stage("capture_snapshot"):
+        for target in targets:
+            if snapshots.database(target) is None:
+                continue
+            logger.info("Capturing snapshot of target %s", target)
+            snapshots.capture(target)
+            captured.append(target)
+    return captured
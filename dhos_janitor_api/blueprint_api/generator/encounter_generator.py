@@ -1,15 +1,77 @@
 import random
 from datetime import date, timedelta
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Set
 
 from flask_batteries_included.helpers.timestamp import parse_iso8601_to_date
-from she_logging import logger
 
 from dhos_janitor_api.blueprint_api.client import ClientRepository, locations_client
+from dhos_janitor_api.helpers import progress
+
+
+class BedAllocator:
+    """
+    The locations encounters may be assigned to: beds, each occupied by at most one
+    encounter at a time, and wards and bays without beds, which never fill up. The
+    available locations are kept in a list indexed by UUID, with occupied beds
+    swapped to the end and removed, so that picking a random location and occupying
+    or releasing a bed take constant time however many beds there are.
+
+    Locations are picked with the allocator's own generator, seeded from the global
+    one when the allocator is created, and from the locations sorted by UUID, so the
+    picks of a seeded run are reproducible whatever order the locations came in.
+    """
+
+    def __init__(self, locations: Iterable[Dict], bed_sct_code: str) -> None:
+        self._available: List[Dict] = sorted(
+            locations, key=lambda location: location["uuid"]
+        )
+        self._index: Dict[str, int] = {
+            location["uuid"]: i for i, location in enumerate(self._available)
+        }
+        self._beds: Dict[str, Dict] = {
+            location["uuid"]: location
+            for location in self._available
+            if location["location_type"] == bed_sct_code
+        }
+        self._occupied: Set[str] = set()
+        self._random = random.Random(random.getrandbits(64))
+
+    def pick(self) -> Dict:
+        """
+        Returns a random available location, occupying it if it is a bed.
+        """
+        if not self._available:
+            raise ValueError("No locations available for encounters")
+        location: Dict = self._random.choice(self._available)
+        if location["uuid"] in self._beds:
+            self.occupy(location["uuid"])
+        return location
+
+    def occupy(self, bed_uuid: str) -> None:
+        i: int = self._index.pop(bed_uuid)
+        last: Dict = self._available.pop()
+        if i < len(self._available):
+            self._available[i] = last
+            self._index[last["uuid"]] = i
+        self._occupied.add(bed_uuid)
+
+    def release(self, bed_uuid: str) -> None:
+        if bed_uuid not in self._occupied:
+            return
+        self._occupied.remove(bed_uuid)
+        self._index[bed_uuid] = len(self._available)
+        self._available.append(self._beds[bed_uuid])
+
+    def occupancy(self) -> Dict[str, int]:
+        return {
+            "beds": len(self._beds),
+            "occupied_beds": len(self._occupied),
+            "available_locations": len(self._available),
+        }
 
 
 class EncountersGenerator:
-    available_locations: Dict[str, Dict]
+    allocator: BedAllocator
     ward_sct_code: str
     bay_sct_code: str
     bed_sct_code: str
@@ -27,7 +89,9 @@ class EncountersGenerator:
         self.ward_sct_code = ward_sct_code
         self.bay_sct_code = bay_sct_code
         self.bed_sct_code = bed_sct_code
-        self.available_locations = self._get_available_locations()
+        self.allocator = BedAllocator(
+            self._get_available_locations().values(), bed_sct_code
+        )
 
     @staticmethod
     def _random_date(patient: Dict, base_date: Optional[str] = None) -> str:
@@ -74,28 +138,23 @@ class EncountersGenerator:
 
         return {**wards, **bays, **beds}
 
-    def _gen_random_location(self) -> Dict:
-        loc = random.choice(list(self.available_locations.values()))
-        if loc["location_type"] == self.bed_sct_code:
-            del self.available_locations[loc["uuid"]]
-        return loc
-
     def generate_data_for_patient(
         self, patient: Dict, discharged: bool = False
     ) -> Dict:
-        logger.debug(
+        progress.detail(
             "Generating encounter for the patient %s",
             patient["uuid"],
             extra={"discharged": discharged},
         )
 
         base_date = self._random_date(patient)
+        location_uuid: str = self.allocator.pick()["uuid"]
 
         encounter_data = {
             "epr_encounter_id": f"2018L{random.randrange(1, 10**8):08}",
             "encounter_type": "INPATIENT",
             "admitted_at": f"{base_date}T00:00:00.000Z",
-            "location_uuid": self._gen_random_location()["uuid"],
+            "location_uuid": location_uuid,
             "patient_record_uuid": patient["record"]["uuid"],
             "patient_uuid": patient["uuid"],
             "dh_product_uuid": patient["dh_products"][0]["uuid"],
@@ -104,6 +163,8 @@ class EncountersGenerator:
         }
 
         if discharged:
+            # A bed is only held by an encounter until the patient is discharged.
+            self.allocator.release(location_uuid)
             encounter_data[
                 "discharged_at"
             ] = f"{self._random_date(patient, base_date=base_date)}T00:00:00.000Z"
@@ -10,6 +10,8 @@ from flask_batteries_included.helpers.timestamp import (
 )
 from she_logging import logger
 
+from dhos_janitor_api.helpers import progress
+
 # snomed codes for meals and the respective prandial tags for their equivalent "before x type of meal" reading
 SNOMED_TO_PRANDIAL_TAG = {"1751000175104": 1, "1761000175102": 3, "1771000175105": 5}
 
@@ -81,12 +83,12 @@ class ReadingsGenerator:
 
         if glucose_profile is None or glucose_profile not in [*PROFILES]:
             self.glucose_profile = random.choice([*PROFILES])
-            logger.debug(
+            progress.detail(
                 "No Glucose Profile, selecting one at random: %s",
                 self.glucose_profile,
             )
         else:
-            logger.debug("Using Glucose Profile: %s", self.glucose_profile)
+            progress.detail("Using Glucose Profile: %s", self.glucose_profile)
             self.glucose_profile = glucose_profile
 
     def generate_data(self) -> List[Dict]:
@@ -107,7 +109,7 @@ class ReadingsGenerator:
             requested_readings, requested_doses
         )
 
-        logger.debug("Generating BG reading data for %d days", working_days)
+        progress.detail("Generating BG reading data for %d days", working_days)
 
         readings_list: List[Dict] = []
         missed_readings: int = 0
@@ -129,7 +131,7 @@ class ReadingsGenerator:
 
             daily_reading_control = max_readings_day
 
-            logger.debug(
+            progress.detail(
                 "Generating BG readings for %d days ago (resulting date %s)",
                 differential,
                 current_day_start,
@@ -183,7 +185,7 @@ class ReadingsGenerator:
 
             readings_list = readings_list + single_day_readings
 
-        logger.debug(
+        progress.detail(
             "BG reading generation complete",
             extra={
                 "generated_readings": len(readings_list),
@@ -324,7 +326,7 @@ class ReadingsGenerator:
     @staticmethod
     def _get_doses(diagnosis: Dict) -> List[Dict]:
         requested_doses = diagnosis.get("management_plan", {}).get("doses", [])
-        logger.debug("Found %d doses in management plan", len(requested_doses))
+        progress.detail("Found %d doses in management plan", len(requested_doses))
         return requested_doses
 
     @staticmethod
@@ -333,7 +335,7 @@ class ReadingsGenerator:
             "readings_per_day", None
         )
         if requested_readings is not None:
-            logger.debug("Expecting %d readings per day", requested_readings)
+            progress.detail("Expecting %d readings per day", requested_readings)
         else:
             logger.info("Readings plan missing, ignoring")
             requested_readings = 0
@@ -3,6 +3,8 @@ import json
 import sys
 import threading
 import time
+from contextvars import ContextVar
+from pathlib import Path
 from typing import Any, Callable, Dict, Iterator, NoReturn, Optional, Union
 
 import flask
@@ -11,11 +13,27 @@ from she_logging import logger
 from she_logging.request_id import set_request_id
 
 from dhos_janitor_api.blueprint_api.client import ClientRepository
-from dhos_janitor_api.helpers import cache
+from dhos_janitor_api.helpers import (
+    cache,
+    deadline,
+    environment,
+    metrics,
+    profiling,
+    timing,
+    tracing,
+)
 from dhos_janitor_api.helpers.cache import TaskStatus
+from dhos_janitor_api.helpers.environment import DEFAULT, Environment
 
 JanitorTarget = Callable[..., Union[Dict, None, NoReturn]]
 
+# UUID of the task running in the current context, if any.
+_task_uuid: ContextVar[Optional[str]] = ContextVar("task_uuid", default=None)
+
+
+def current_task_uuid() -> Optional[str]:
+    return _task_uuid.get()
+
 
 class JanitorThread:
     """
@@ -31,6 +49,8 @@ class JanitorThread:
     _response: Any
     _started: float
     _require_context: bool
+    _profile: bool
+    _environment: Environment
     _app: Flask
 
     def __init__(
@@ -39,20 +59,29 @@ class JanitorThread:
         target: JanitorTarget,
         request_id: Optional[str],
         require_context: bool = False,
+        profile: bool = False,
+        environment: Optional[Environment] = None,
     ) -> None:
         """
         :param target: Target callable to be run on a thread
         :param require_context: Should the call to 'target' be wrapped in app_context?
+        :param profile: Should the task be profiled? The profile is written to PROFILE_DIR
+        :param environment: Environment to run the task against, if not the default one
         """
         self._task_uuid = task_uuid
         self._request_id = request_id
         self._target: JanitorTarget = target
+        self._task_name: str = getattr(target, "__name__", type(target).__name__)
         self._is_open = False
         self._response = None
         self._started = -1
         self._require_context = require_context
+        self._profile = profile
+        self._environment = environment or Environment(DEFAULT)
         self._app = flask.current_app._get_current_object()
-        self._clients = ClientRepository.from_app(self._app)
+        self._clients = ClientRepository.from_app(
+            self._app, environment=self._environment
+        )
 
     @contextlib.contextmanager
     def _context(self) -> Iterator[Any]:
@@ -85,6 +114,8 @@ class JanitorThread:
         thread: threading.Thread = threading.Thread(target=self._run, kwargs=kwargs)
         logger.info("starting %s (ID %s)", self._name, self._task_uuid)
         cache.known_tasks[self._task_uuid] = TaskStatus.RUNNING
+        if self._environment.name != DEFAULT:
+            cache.task_environments[self._task_uuid] = self._environment.name
         thread.start()
 
     def wait_for_response(
@@ -128,20 +159,44 @@ class JanitorThread:
         yield encoder(response)
 
     def _run(self, **kwargs: Any) -> None:
+        metrics.TASKS_RUNNING.labels(self._task_name).inc()
+        status = "error"
+        task_status = TaskStatus.ERROR
+        timings: Optional[timing.Stage] = None
+        profile_path: Optional[Path] = None
+        if self._profile:
+            profile_path = profiling.profile_path(
+                self._app.config["PROFILE_DIR"], self._task_uuid
+            )
         try:
             if self._request_id:
                 set_request_id(self._request_id)
-            with self._context():
+            _task_uuid.set(self._task_uuid)
+            with self._context(), environment.active(
+                self._environment
+            ), deadline.task_deadline(
+                self._app.config["TASK_DEADLINE_SEC"]
+            ), timing.task_timings(
+                self._task_name
+            ) as timings, tracing.trace(
+                self._task_name,
+                tracing.exporter_from_config(self._app.config),
+                task_uuid=self._task_uuid,
+                environment=self._environment.name,
+            ), profiling.profiled(
+                profile_path
+            ):
                 self._response = self._target(clients=self._clients, **kwargs)
-            cache.known_tasks[self._task_uuid] = TaskStatus.COMPLETE
+            task_status = TaskStatus.COMPLETE
+            status = "complete"
             logger.info(
                 "%s (ID %s) complete after %d seconds",
                 self._name,
                 self._task_uuid,
                 int(time.time() - self._started),
+                extra={"timings": timings.to_dict()},
             )
         except Exception as ex:
-            cache.known_tasks[self._task_uuid] = TaskStatus.ERROR
             logger.exception(
                 "%s (ID %s) failed after %s seconds\n%s",
                 self._name,
@@ -151,5 +206,14 @@ class JanitorThread:
             )
             self._response = ex
         finally:
+            # The timings are stored before the task's final status, so that they
+            # can be fetched as soon as the task is seen to have finished.
+            if timings is not None:
+                cache.task_timings[self._task_uuid] = timings.to_dict()
+            cache.known_tasks[self._task_uuid] = task_status
+            metrics.TASKS_RUNNING.labels(self._task_name).dec()
+            metrics.TASK_DURATION.labels(self._task_name, status).observe(
+                time.time() - self._started
+            )
             logger.info("closing %s (ID %s)", self._name, self._task_uuid)
             self._is_open = False
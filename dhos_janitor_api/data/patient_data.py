@@ -43,6 +43,7 @@ AREAS = [
     ("Putney", "Wandsworth", "SW"),
     ("Chelsea", "Kensington and Chelsea", "SW"),
 ]
+POSTCODE_DIGITS = "123456789"
 
 DATES_OF_BIRTH = [
     "1999-10-01",
@@ -538,16 +539,17 @@ def generate_current_personal_address_date(product_open_date: datetime) -> Dict:
 
 
 def generate_random_address() -> Dict:
-    road_name = random.choice(ROAD_NAMES)
+    generator: random.Random = names.rng()
+    road_name = generator.choice(ROAD_NAMES)
 
-    if random.randint(1, 10) < 4:
-        house_name = random.choice(HOUSE_NAMES)
+    if generator.randint(1, 10) < 4:
+        house_name = generator.choice(HOUSE_NAMES)
         address_line_1 = f"{house_name} {road_name}"
     else:
-        house_number = str(random.randint(1, 200))
+        house_number = str(generator.randint(1, 200))
         address_line_1 = f"{house_number} {road_name}"
 
-    locality, region, postcode_prefix = random.choice(AREAS)
+    locality, region, postcode_prefix = generator.choice(AREAS)
 
     return {
         "address_line_1": address_line_1,
@@ -561,9 +563,8 @@ def generate_random_address() -> Dict:
 
 
 def generate_postcode_from_prefix(prefix: str) -> str:
-    third = random.randint(1, 9)
-    fourth = random.randint(1, 9)
-    fifth = random.choice(string.ascii_uppercase)
-    sixth = random.choice(string.ascii_uppercase)
+    generator: random.Random = names.rng()
+    third, fourth = generator.choices(POSTCODE_DIGITS, k=2)
+    fifth, sixth = generator.choices(string.ascii_uppercase, k=2)
 
     return f"{prefix}{third} {fourth}{fifth}{sixth}"
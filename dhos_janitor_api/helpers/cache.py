@@ -3,6 +3,8 @@ from typing import Dict, List
 
 from flask_batteries_included.helpers.error_handler import DuplicateResourceException
 
+from dhos_janitor_api.helpers.environment import DEFAULT
+
 
 class TaskStatus(Enum):
     RUNNING = 0
@@ -11,11 +13,24 @@ class TaskStatus(Enum):
 
 
 known_tasks: Dict[str, TaskStatus] = {}
+# Environment each task was run against, by task UUID, if not the default one.
+task_environments: Dict[str, str] = {}
+# Timing tree of each finished task, by task UUID.
+task_timings: Dict[str, Dict] = {}
+# Settings and target fingerprints recorded by the last incremental reset of each
+# environment, by environment.
+reset_baseline: Dict[str, Dict] = {}
 
 
-def check_no_ongoing_tasks() -> None:
+def check_no_ongoing_tasks(environment: str = DEFAULT) -> None:
+    """
+    Raises a DuplicateResourceException if a task is running against the environment.
+    Tasks against other environments don't count.
+    """
     ongoing_tasks: List[str] = [
-        k for k, v in known_tasks.items() if v == TaskStatus.RUNNING
+        k
+        for k, v in known_tasks.items()
+        if v == TaskStatus.RUNNING and task_environments.get(k, DEFAULT) == environment
     ]
     if ongoing_tasks:
         raise DuplicateResourceException(
@@ -1,15 +1,38 @@
+from pathlib import Path
+from typing import List, Tuple
+
 import click
 from flask import Flask
-from flask_batteries_included.helpers.apispec import generate_openapi_spec
 
 from dhos_janitor_api import blueprint_api
-from dhos_janitor_api.models.api_spec import dhos_janitor_api_spec
+from dhos_janitor_api.blueprint_api.controller import snapshot_controller
+from dhos_janitor_api.helpers import openapi
 
 
 def add_cli_command(app: Flask) -> None:
     @app.cli.command("create-openapi")
     @click.argument("output", type=click.Path())
     def create_api(output: str) -> None:
+        # Imported here, as apispec is only needed to generate the spec and is slow
+        # to import.
+        from flask_batteries_included.helpers.apispec import generate_openapi_spec
+
+        from dhos_janitor_api.models.api_spec import dhos_janitor_api_spec
+
         generate_openapi_spec(
             dhos_janitor_api_spec, output, blueprint_api.api_blueprint
         )
+        openapi.write_spec_json(Path(output))
+
+    @app.cli.command("capture-snapshots")
+    @click.argument("targets", nargs=-1)
+    def capture_snapshots(targets: Tuple[str, ...]) -> None:
+        """
+        Captures snapshots of the targets' databases for snapshot resets, by default
+        of all resettable targets with a database.
+        """
+        captured: List[str] = snapshot_controller.capture_snapshots(
+            snapshot_controller.from_config(),
+            targets or list(app.config["RESETTABLE_TARGETS"]),
+        )
+        click.echo(f"Captured snapshots of {', '.join(captured) or 'no targets'}")
@@ -0,0 +1,37 @@
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(
+    func: Callable[[T], R], items: Iterable[T], max_in_flight: int
+) -> Iterator[R]:
+    """
+    Applies func to each item on a thread pool, with at most max_in_flight calls
+    outstanding at any time. Items are consumed lazily and results are yielded in
+    input order. Each call runs in a copy of the caller's context, so the request ID
+    and any other context variables are carried over to the worker threads.
+    """
+    if max_in_flight <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        in_flight: Deque[Future] = deque()
+        for item in items:
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+            in_flight.append(
+                executor.submit(_run_in_context, contextvars.copy_context(), func, item)
+            )
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _run_in_context(context: contextvars.Context, func: Callable[[T], R], item: T) -> R:
+    return context.run(func, item)
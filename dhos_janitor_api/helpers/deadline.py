@@ -0,0 +1,49 @@
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
+
+# Monotonic time by which the current task must finish, if it has a deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(ServiceUnavailableException):
+    """
+    Raised instead of making a request once the task's deadline has passed.
+    """
+
+
+@contextlib.contextmanager
+def task_deadline(seconds: float) -> Iterator[None]:
+    """
+    Sets a deadline for everything run within the context, or none if seconds is 0.
+    An existing, earlier deadline is kept.
+    """
+    deadline: Optional[float] = _deadline.get()
+    if seconds > 0:
+        new_deadline = time.monotonic() + seconds
+        if deadline is None or new_deadline < deadline:
+            deadline = new_deadline
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds until the current deadline, or None if there isn't one.
+    """
+    deadline: Optional[float] = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check() -> None:
+    budget: Optional[float] = remaining()
+    if budget is not None and budget <= 0:
+        raise DeadlineExceededError("Task deadline exceeded")
@@ -0,0 +1,103 @@
+import contextlib
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from dhos_janitor_api.config import Configuration
+
+DEFAULT = "default"
+
+# Settings an environment may override, besides the target URLs.
+OVERRIDABLE_SETTINGS = {
+    "CUSTOMER_CODE",
+    "HS_KEY",
+    "HS_ISSUER",
+    "PROXY_URL",
+    "POLARIS_API_KEY",
+    "SNAPSHOT_DATABASE_URL",
+}
+
+
+@dataclass(frozen=True)
+class Environment:
+    """
+    A stack of target microservices that tasks can be run against, with its own
+    target URLs, customer code and keys. Settings it doesn't override are taken from
+    the configuration, so the default environment overrides nothing.
+    """
+
+    name: str
+    overrides: Mapping[str, str] = field(default_factory=dict)
+
+    def setting(self, key: str) -> Any:
+        if key in self.overrides:
+            return self.overrides[key]
+        return getattr(Configuration, key)
+
+    def qualify(self, key: str) -> str:
+        """
+        Qualifies a key for state shared across the process, such as a target's
+        circuit breaker, with the environment's name.
+        """
+        return key if self.name == DEFAULT else f"{self.name}/{key}"
+
+    def unqualify(self, key: str) -> Optional[str]:
+        """
+        The key that qualify turned into the given one, or None if the given key
+        belongs to another environment.
+        """
+        if self.name == DEFAULT:
+            return None if "/" in key else key
+        prefix: str = f"{self.name}/"
+        return key[len(prefix) :] if key.startswith(prefix) else None
+
+
+def get_environment(name: str) -> Environment:
+    """
+    Returns one of the ENVIRONMENTS by name, raising ValueError if there's no such
+    environment or it overrides settings that can't be overridden.
+    """
+    if name == DEFAULT:
+        return Environment(DEFAULT)
+    if name not in Configuration.ENVIRONMENTS:
+        raise ValueError(f"Unknown environment '{name}'")
+    overrides: Dict[str, str] = dict(Configuration.ENVIRONMENTS[name])
+    unknown = (
+        overrides.keys()
+        - OVERRIDABLE_SETTINGS
+        - set(Configuration.ALL_TARGETS.values())
+    )
+    if unknown:
+        raise ValueError(
+            f"Environment '{name}' can't override {', '.join(sorted(unknown))}"
+        )
+    if "PROXY_URL" in overrides:
+        overrides["PROXY_URL"] = overrides["PROXY_URL"].rstrip("/") + "/"
+        overrides.setdefault("HS_ISSUER", overrides["PROXY_URL"])
+    return Environment(name, overrides)
+
+
+# The environment the running task resets, populates or otherwise works on.
+_current: ContextVar[Environment] = ContextVar(
+    "environment", default=Environment(DEFAULT)
+)
+
+
+def current() -> Environment:
+    return _current.get()
+
+
+def setting(key: str) -> Any:
+    """
+    Returns a setting of the current environment.
+    """
+    return _current.get().setting(key)
+
+
+@contextlib.contextmanager
+def active(environment: Environment) -> Iterator[Environment]:
+    token = _current.set(environment)
+    try:
+        yield environment
+    finally:
+        _current.reset(token)
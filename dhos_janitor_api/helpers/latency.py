@@ -0,0 +1,92 @@
+import contextlib
+import json
+import os
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from she_logging import logger
+
+
+class LatencyStats:
+    """
+    The total duration and number of the requests made to each target by a task.
+    """
+
+    def __init__(self) -> None:
+        self._totals: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, target: str, duration_sec: float) -> None:
+        with self._lock:
+            total = self._totals.setdefault(target, [0.0, 0.0])
+            total[0] += duration_sec
+            total[1] += 1
+
+    def mean_sec(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                target: duration_sec / count
+                for target, (duration_sec, count) in self._totals.items()
+            }
+
+
+# The latency stats of the running task, if it collects any.
+_current: ContextVar[Optional[LatencyStats]] = ContextVar("latency", default=None)
+
+# Serialises saves within the process, so that concurrent tasks against different
+# environments don't lose each other's stats.
+_save_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def collecting() -> Iterator[LatencyStats]:
+    """
+    Collects the latency of the requests made to each target within the context.
+    """
+    stats = LatencyStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def record(target: str, duration_sec: float) -> None:
+    stats: Optional[LatencyStats] = _current.get()
+    if stats is not None:
+        stats.record(target, duration_sec)
+
+
+def load(path: str, environment_name: str) -> Dict[str, float]:
+    """
+    Returns the mean latency of each target saved for the environment, by target.
+    """
+    try:
+        saved: Dict[str, Dict[str, float]] = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+    return saved.get(environment_name, {})
+
+
+def save(path: str, environment_name: str, latency_sec: Dict[str, float]) -> None:
+    """
+    Saves the mean latency of each target for the environment, replacing any saved
+    before for those targets. The stats are only used to estimate durations, so
+    failing to save them isn't an error.
+    """
+    stats_path = Path(path)
+    with _save_lock:
+        try:
+            saved: Dict[str, Dict[str, float]] = json.loads(stats_path.read_text())
+        except (OSError, ValueError):
+            saved = {}
+        saved[environment_name] = {**saved.get(environment_name, {}), **latency_sec}
+        try:
+            stats_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path: Path = stats_path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_text(json.dumps(saved))
+            os.replace(temp_path, stats_path)
+        except OSError:
+            logger.exception("Failed to save latency stats to %s", stats_path)
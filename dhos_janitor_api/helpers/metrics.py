@@ -0,0 +1,80 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Served from /metrics by flask-batteries-included, using the default registry.
+
+# Resets and populates take minutes, so the default buckets (up to 10s) are too short.
+TASK_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HTTP_REQUESTS = Counter(
+    "janitor_http_requests_total",
+    "Requests sent to downstream targets, by response status ('error' if none)",
+    ["target", "method", "status"],
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "janitor_http_request_duration_seconds",
+    "Time taken by requests to downstream targets, excluding time spent queueing",
+    ["target", "method"],
+)
+
+HTTP_FAILURES = Counter(
+    "janitor_http_failures_total",
+    "Requests to downstream targets that failed after any retries",
+    ["target", "method"],
+)
+
+HTTP_RETRIES = Counter(
+    "janitor_http_retries_total",
+    "Requests to downstream targets that were retried",
+    ["target", "method", "reason"],
+)
+
+HTTP_RETRY_BUDGET_EXHAUSTED = Counter(
+    "janitor_http_retry_budget_exhausted_total",
+    "Retryable failures that were not retried because the task's retry budget ran out",
+    ["target"],
+)
+
+HTTP_CONCURRENCY_LIMIT = Gauge(
+    "janitor_http_concurrency_limit",
+    "Current adaptive limit on in-flight requests to a downstream target",
+    ["target"],
+)
+
+CIRCUIT_BREAKER_OPEN = Gauge(
+    "janitor_circuit_breaker_open",
+    "Whether the circuit breaker for a downstream target is open (1) or not (0)",
+    ["target"],
+)
+
+JWT_CACHE_LOOKUPS = Counter(
+    "janitor_jwt_cache_lookups_total",
+    "Lookups in the JWT caches, by whether an unexpired JWT was found",
+    ["kind", "result"],
+)
+
+TASKS_RUNNING = Gauge(
+    "janitor_tasks_running",
+    "Background tasks currently running",
+    ["task"],
+)
+
+TASK_DURATION = Histogram(
+    "janitor_task_duration_seconds",
+    "Time taken by background tasks, by outcome",
+    ["task", "status"],
+    buckets=TASK_BUCKETS,
+)
+
+TASK_STAGE_DURATION = Histogram(
+    "janitor_task_stage_duration_seconds",
+    "Time taken by each stage of a background task, per target where relevant",
+    ["task", "stage", "target"],
+    buckets=TASK_BUCKETS,
+)
+
+SHARDS_PROCESSED = Counter(
+    "janitor_shards_processed_total",
+    "Shards of sharded populate stages processed by this replica, by outcome",
+    ["processor", "result"],
+)
@@ -1,28 +1,118 @@
-import logging
+import functools
+import itertools
+import random
+import string
+import threading
+import uuid
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
-# Get faker to shut up.
-logging.getLogger("faker.factory").setLevel("INFO")
+_local = threading.local()
+# Bumped by seed, so that each thread's generator is seeded again on its next use.
+_generation = 0
 
-from faker import Faker  # isort:skip
 
-fake = Faker()
+def seed(value: int) -> None:
+    """
+    Seeds the global random generator, from which each thread's generator is seeded.
+    """
+    global _generation
+    random.seed(value)
+    _generation += 1
+
+
+def rng() -> random.Random:
+    """
+    The current thread's random generator, seeded from the global one on first use.
+    """
+    state: Optional[Tuple[int, random.Random]] = getattr(_local, "rng", None)
+    if state is None or state[0] != _generation:
+        state = (_generation, random.Random(random.getrandbits(64)))
+        _local.rng = state
+    return state[1]
+
+
+class Pool:
+    """
+    Values to sample from, weighted if given as a mapping of value to weight.
+    """
+
+    def __init__(self, values: Union[Mapping[str, float], Sequence[str]]) -> None:
+        self.values: List[str] = list(values)
+        self.cum_weights: Optional[List[float]] = None
+        if isinstance(values, Mapping):
+            self.cum_weights = list(itertools.accumulate(values.values()))
+
+    def choice(self) -> str:
+        return self.choices(1)[0]
+
+    def choices(self, k: int) -> List[str]:
+        return rng().choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+# Sampling these pools is much cheaper than generating each value with Faker, and
+# each thread samples with its own generator, so patients and locations can be
+# generated in parallel. They are built on first use, as importing Faker is a
+# noticeable part of the janitor's startup.
+@functools.lru_cache(maxsize=None)
+def _pools() -> Dict[str, Pool]:
+    from faker.providers.address.en_GB import Provider as GbAddress
+    from faker.providers.address.en_US import Provider as UsAddress
+    from faker.providers.person.en_US import Provider as Person
+
+    return {
+        "first_name_female": Pool(Person.first_names_female),
+        "first_name_male": Pool(Person.first_names_male),
+        "first_name": Pool(Person.first_names),
+        "last_name": Pool(Person.last_names),
+        "city_prefix": Pool(UsAddress.city_prefixes),
+        "city_suffix": Pool(UsAddress.city_suffixes),
+        "county": Pool(GbAddress.counties),
+    }
+
+
+def pool(name: str) -> Pool:
+    return _pools()[name]
 
 
 def city() -> str:
-    return fake.city()
+    return (
+        f"{pool('city_prefix').choice()} {first_name()}{pool('city_suffix').choice()}"
+    )
+
+
+def county() -> str:
+    return pool("county").choice()
 
 
 def first_name_female() -> str:
-    return fake.first_name_female()
+    return pool("first_name_female").choice()
 
 
 def first_name_male() -> str:
-    return fake.first_name_male()
+    return pool("first_name_male").choice()
 
 
 def first_name() -> str:
-    return fake.first_name()
+    return pool("first_name").choice()
 
 
 def last_name() -> str:
-    return fake.last_name()
+    return pool("last_name").choice()
+
+
+def ods_code() -> str:
+    """
+    A code in the format of a UK number plate, e.g. AB12CDE.
+    """
+    generator: random.Random = rng()
+    letters: List[str] = generator.choices(string.ascii_uppercase, k=5)
+    digits: List[str] = generator.choices(string.digits, k=2)
+    return "".join(letters[:2] + digits + letters[2:])
+
+
+def uuid4() -> str:
+    """
+    A random UUID from the current thread's generator, so that seeded runs generate
+    the same UUIDs and anything ordered by UUID is posted in the same order.
+    """
+    return str(uuid.UUID(int=rng().getrandbits(128), version=4))
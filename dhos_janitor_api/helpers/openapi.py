@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+from dhos_janitor_api.config import Configuration
+
+try:
+    # libyaml's loader, where installed, parses the spec several times faster.
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore
+
+
+def load_spec(path: Path) -> Dict[str, Any]:
+    """
+    Loads the OpenAPI spec at path, for connexion. Parsing the YAML is most of the
+    time taken to create the app, so the spec is loaded instead from the parsed JSON
+    written next to it by write_spec_json, or else cached in OPENAPI_CACHE_DIR. Both
+    are keyed by a hash of the YAML so that a changed spec is parsed again.
+    """
+    contents: bytes = path.read_bytes()
+    name: str = _json_name(path, contents)
+    for json_dir in (path.parent, Path(Configuration.OPENAPI_CACHE_DIR)):
+        try:
+            return json.loads((json_dir / name).read_bytes())
+        except (OSError, ValueError):
+            pass
+
+    spec: Dict[str, Any] = yaml.load(contents, Loader=SafeLoader)
+    cache_path = Path(Configuration.OPENAPI_CACHE_DIR) / name
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written alongside and renamed, so that another replica starting at the same
+        # time never reads it half written.
+        temp_path: Path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps(spec))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # The cache is only an optimisation, so a read-only filesystem isn't an error.
+        pass
+    return spec
+
+
+def write_spec_json(path: Path) -> Path:
+    """
+    Writes the parsed JSON of the OpenAPI spec at path next to it, replacing that of
+    any earlier version of the spec, so that it ships with the spec and even a fresh
+    replica needn't parse the YAML.
+    """
+    contents: bytes = path.read_bytes()
+    for stale_path in path.parent.glob(f"{path.stem}-*.json"):
+        stale_path.unlink()
+    json_path: Path = path.parent / _json_name(path, contents)
+    json_path.write_text(json.dumps(yaml.load(contents, Loader=SafeLoader)))
+    return json_path
+
+
+def _json_name(path: Path, contents: bytes) -> str:
+    digest: str = hashlib.sha256(contents).hexdigest()[:16]
+    return f"{path.stem}-{digest}.json"
@@ -0,0 +1,41 @@
+import contextlib
+import cProfile
+import io
+import pstats
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+def profile_path(profile_dir: str, task_uuid: str) -> Path:
+    return Path(profile_dir) / f"{task_uuid}.prof"
+
+
+@contextlib.contextmanager
+def profiled(path: Optional[Path]) -> Iterator[None]:
+    """
+    Profiles the code run within the context with cProfile and writes the stats to
+    path, or does nothing if path is None. Only the calling thread is profiled, so
+    work done on bounded_map workers shows up as time spent waiting for them.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(path))
+
+
+def summary(path: Path, limit: int = 50) -> str:
+    """
+    Renders the functions with the highest cumulative time in a profile as text.
+    """
+    stream = io.StringIO()
+    pstats.Stats(str(path), stream=stream).sort_stats(
+        pstats.SortKey.CUMULATIVE
+    ).print_stats(limit)
+    return stream.getvalue()
@@ -0,0 +1,87 @@
+import threading
+import time
+from types import TracebackType
+from typing import Any, Optional, Type
+
+from she_logging import logger
+
+from dhos_janitor_api.config import Configuration
+
+
+def detail(msg: str, *args: Any, **kwargs: Any) -> None:
+    """
+    Logs a per-item message from a hot loop at debug level, only if LOG_EACH_ITEM is
+    set. Otherwise the loop's ProgressLogger summarises it.
+    """
+    if Configuration.LOG_EACH_ITEM:
+        logger.debug(msg, *args, **kwargs)
+
+
+class ProgressLogger:
+    """
+    Logs progress through a hot loop as a summary line at most once every
+    LOG_PROGRESS_INTERVAL_SEC, and once more when the loop finishes, so that the log
+    output of a loop is bounded whatever the number of items. May be shared between
+    bounded_map workers.
+
+        with ProgressLogger("Posting readings", total=len(readings)) as progress:
+            for reading in readings:
+                ...
+                progress.item("Posted reading %s", reading["uuid"])
+    """
+
+    def __init__(self, description: str, total: Optional[int] = None) -> None:
+        self.description = description
+        self.total = total
+        self.done = 0
+        self._interval_sec: float = Configuration.LOG_PROGRESS_INTERVAL_SEC
+        self._started = time.monotonic()
+        self._last_logged = self._started
+        self._lock = threading.Lock()
+
+    def item(self, msg: Optional[str] = None, *args: Any) -> None:
+        """
+        Counts an item as done, logging msg about it if LOG_EACH_ITEM is set.
+        """
+        if msg is not None:
+            detail(msg, *args)
+        now = time.monotonic()
+        with self._lock:
+            self.done += 1
+            if now - self._last_logged < self._interval_sec:
+                return
+            self._last_logged = now
+        self._log(now, finished=False)
+
+    def __enter__(self) -> "ProgressLogger":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self._log(time.monotonic(), finished=True)
+
+    def _log(self, now: float, finished: bool) -> None:
+        elapsed_sec = now - self._started
+        total = "" if self.total is None else f"/{self.total}"
+        logger.info(
+            "%s: %s %d%s in %.1fs",
+            self.description,
+            "finished" if finished else "done",
+            self.done,
+            total,
+            elapsed_sec,
+            extra={
+                "progress": {
+                    "description": self.description,
+                    "done": self.done,
+                    "total": self.total,
+                    "elapsed_sec": round(elapsed_sec, 3),
+                    "finished": finished,
+                }
+            },
+        )
@@ -0,0 +1,101 @@
+import contextlib
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar, cast
+
+from dhos_janitor_api.helpers import tracing
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Stage:
+    """
+    A node in a task's timing tree. Stages with the same name under the same parent
+    are merged, so a stage run once per patient reports its total time and count.
+    Stages run concurrently on worker threads add up to more than the wall time of
+    their parent.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.duration_sec = 0.0
+        self.count = 0
+        self._children: Dict[str, "Stage"] = {}
+        self._lock = threading.Lock()
+
+    def child(self, name: str) -> "Stage":
+        with self._lock:
+            if name not in self._children:
+                self._children[name] = Stage(name)
+            return self._children[name]
+
+    def record(self, duration_sec: float) -> None:
+        with self._lock:
+            self.duration_sec += duration_sec
+            self.count += 1
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            children: List[Stage] = list(self._children.values())
+        return {
+            "name": self.name,
+            "duration_sec": round(self.duration_sec, 3),
+            "count": self.count,
+            "stages": [c.to_dict() for c in children],
+        }
+
+
+# The stage currently being timed, if any.
+_current: ContextVar[Optional[Stage]] = ContextVar("timing_stage", default=None)
+
+
+@contextlib.contextmanager
+def _timed(stage: Stage) -> Iterator[Stage]:
+    token = _current.set(stage)
+    started = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage.record(time.perf_counter() - started)
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def task_timings(name: str) -> Iterator[Stage]:
+    """
+    Times everything run within the context as the root of a new timing tree.
+    """
+    with _timed(Stage(name)) as root:
+        yield root
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times the code run within the context as a sub-stage of the current stage, and
+    traces it as a span. Does nothing outside of task_timings.
+    """
+    parent: Optional[Stage] = _current.get()
+    if parent is None:
+        yield
+        return
+    with _timed(parent.child(name)), tracing.span(name):
+        yield
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """
+    Decorator timing each call to a function as a stage.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
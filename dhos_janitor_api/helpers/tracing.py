@@ -0,0 +1,191 @@
+import contextlib
+import json
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+import httpx
+from she_logging import logger
+
+from dhos_janitor_api.config import Configuration
+
+SpanExporter = Callable[[List[Dict]], None]
+
+
+class _Trace:
+    """
+    The spans of a trace, collected as they end and exported in batches of
+    TRACE_EXPORT_BATCH_SIZE, so that a long task's spans aren't all held in memory.
+    """
+
+    def __init__(self, exporter: SpanExporter) -> None:
+        self.trace_id: str = secrets.token_hex(16)
+        self.spans: List[Dict] = []
+        self._exporter = exporter
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict) -> None:
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) < Configuration.TRACE_EXPORT_BATCH_SIZE:
+                return
+            batch, self.spans = self.spans, []
+        self._export(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self.spans = self.spans, []
+        if batch:
+            self._export(batch)
+
+    def _export(self, batch: List[Dict]) -> None:
+        try:
+            self._exporter(batch)
+        except Exception:
+            logger.exception("Failed to export trace %s", self.trace_id)
+
+
+class Span:
+    """
+    A timed operation within a trace, in the shape of an OpenTelemetry span.
+    """
+
+    def __init__(
+        self,
+        trace: _Trace,
+        name: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id: str = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns: int = time.time_ns()
+
+    @property
+    def traceparent(self) -> str:
+        """
+        The W3C trace context header identifying this span to downstream services.
+        """
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def to_dict(self, end_ns: int) -> Dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": end_ns,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# The span currently open, if any.
+_current: ContextVar[Optional[Span]] = ContextVar("tracing_span", default=None)
+
+
+@contextlib.contextmanager
+def _open(span: Span) -> Iterator[Span]:
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = "error"
+        span.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        span.trace.add(span.to_dict(time.time_ns()))
+
+
+@contextlib.contextmanager
+def trace(
+    name: str, exporter: Optional[SpanExporter], **attributes: Any
+) -> Iterator[Optional[Span]]:
+    """
+    Starts a new trace whose root span covers the code run within the context. The
+    trace's spans are exported in batches as they end, and the rest once the root
+    span ends. Does nothing if there is no exporter.
+    """
+    if exporter is None:
+        yield None
+        return
+    root = Span(_Trace(exporter), name, None, attributes)
+    try:
+        with _open(root):
+            yield root
+    finally:
+        root.trace.flush()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Traces the code run within the context as a child of the current span. Does
+    nothing outside of a trace.
+    """
+    parent: Optional[Span] = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _open(Span(parent.trace, name, parent.span_id, attributes)) as child:
+        yield child
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """
+    Sets an attribute on the current span, if there is one.
+    """
+    current: Optional[Span] = _current.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+_file_lock = threading.Lock()
+
+
+def file_exporter(path: str) -> SpanExporter:
+    """
+    Exports spans by appending them to a file as JSON lines.
+    """
+
+    def _export(spans: List[Dict]) -> None:
+        with _file_lock, open(path, "a") as f:
+            for s in spans:
+                f.write(json.dumps(s) + "\n")
+
+    return _export
+
+
+def http_exporter(url: str) -> SpanExporter:
+    """
+    Exports spans by posting them to a collector as {"spans": [...]}.
+    """
+
+    def _export(spans: List[Dict]) -> None:
+        httpx.post(url, json={"spans": spans}, timeout=30).raise_for_status()
+
+    return _export
+
+
+def exporter_from_config(config: Mapping[str, Any]) -> Optional[SpanExporter]:
+    exporters: List[SpanExporter] = []
+    if config["TRACE_EXPORT_PATH"]:
+        exporters.append(file_exporter(config["TRACE_EXPORT_PATH"]))
+    if config["TRACE_EXPORT_URL"]:
+        exporters.append(http_exporter(config["TRACE_EXPORT_URL"]))
+    if not exporters:
+        return None
+
+    def _export(spans: List[Dict]) -> None:
+        for exporter in exporters:
+            exporter(spans)
+
+    return _export
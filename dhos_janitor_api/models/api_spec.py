@@ -29,3 +29,200 @@ class ResetRequest(Schema):
         ordered = True
 
     targets = fields.List(fields.String(), description="List of services to reset")
+    incremental = fields.Boolean(
+        description="Only reset services whose data has changed since the last"
+        " incremental reset, and services depending on them. Services whose data"
+        " can't be compared are always reset",
+        example=True,
+    )
+    snapshot = fields.Boolean(
+        description="Restore services from snapshots of their databases where there"
+        " are any, rather than dropping and repopulating them",
+        example=False,
+    )
+    capture_snapshot = fields.Boolean(
+        description="Capture snapshots of the databases of the services dropped and"
+        " repopulated, once the reset is complete",
+        example=False,
+    )
+
+
+@openapi_schema(dhos_janitor_api_spec)
+class CircuitBreakerState(Schema):
+    class Meta:
+        title = "Circuit breaker state"
+        unknown = EXCLUDE
+        ordered = True
+
+    state = fields.String(
+        required=True,
+        description="Circuit breaker state: closed, open or half_open",
+        example="open",
+    )
+    consecutive_failures = fields.Integer(
+        required=True,
+        description="Number of consecutive failed requests to the target",
+        example=5,
+    )
+
+
+class TaskStageTiming(Schema):
+    class Meta:
+        title = "Task stage timing"
+        unknown = EXCLUDE
+        ordered = True
+
+    name = fields.String(
+        required=True,
+        description="Name of the stage, e.g. a target microservice",
+        example="dhos_services_api",
+    )
+    duration_sec = fields.Float(
+        required=True,
+        description="Total time spent in the stage, in seconds",
+        example=12.345,
+    )
+    count = fields.Integer(
+        required=True,
+        description="Number of times the stage was run, e.g. once per patient",
+        example=1,
+    )
+    stages = fields.List(
+        fields.Nested(lambda: TaskStageTiming()),
+        required=True,
+        description="Sub-stages of the stage",
+    )
+
+
+# Registered once defined, as the schema refers to itself.
+openapi_schema(dhos_janitor_api_spec)(TaskStageTiming)
+
+
+class ShardProgress(Schema):
+    class Meta:
+        title = "Shard progress"
+        unknown = EXCLUDE
+        ordered = True
+
+    shards = fields.Integer(required=True, description="Number of shards", example=4)
+    pending = fields.Integer(
+        required=True, description="Shards not yet claimed by a replica", example=1
+    )
+    claimed = fields.Integer(
+        required=True, description="Shards being processed by a replica", example=2
+    )
+    done = fields.Integer(required=True, description="Shards processed", example=1)
+    failed = fields.Integer(
+        required=True,
+        description="Shards that failed on every attempt",
+        example=0,
+    )
+    items = fields.Integer(
+        required=True, description="Number of entities in the shards", example=200
+    )
+    items_done = fields.Integer(
+        required=True, description="Number of entities in shards processed", example=50
+    )
+
+
+@openapi_schema(dhos_janitor_api_spec)
+class TaskStatusResponse(Schema):
+    class Meta:
+        title = "Task status response"
+        unknown = EXCLUDE
+        ordered = True
+
+    failing_targets = fields.Dict(
+        keys=fields.String(),
+        values=fields.Nested(CircuitBreakerState),
+        required=True,
+        description="Circuit breaker state of targets whose circuit is not closed, by target",
+    )
+    timings = fields.Nested(
+        TaskStageTiming,
+        required=False,
+        allow_none=True,
+        description="Timing tree of the task, once it has completed",
+    )
+    shards = fields.Dict(
+        keys=fields.String(),
+        values=fields.Nested(ShardProgress),
+        required=False,
+        description="Progress of the shards of each sharded stage, by stage, if"
+        " population is sharded across replicas",
+    )
+
+
+class ResetPlanTarget(Schema):
+    class Meta:
+        title = "Reset plan target"
+        unknown = EXCLUDE
+        ordered = True
+
+    target = fields.String(
+        required=True,
+        description="Target microservice to be reset",
+        example="dhos-services-api",
+    )
+    requests = fields.Dict(
+        keys=fields.String(),
+        values=fields.Integer(),
+        required=True,
+        description="Estimated number of requests made while resetting the target,"
+        " by the downstream target they are made to",
+        example={"dhos_services_api": 43, "dhos_users_api": 42},
+    )
+    duration_sec = fields.Float(
+        required=True,
+        description="Estimated time taken to reset the target, in seconds",
+        example=8.5,
+    )
+
+
+@openapi_schema(dhos_janitor_api_spec)
+class ResetPlanResponse(Schema):
+    class Meta:
+        title = "Reset plan response"
+        unknown = EXCLUDE
+        ordered = True
+
+    targets = fields.List(
+        fields.Nested(ResetPlanTarget),
+        required=True,
+        description="Targets that would be reset, in the order they would be reset",
+    )
+    requests = fields.Integer(
+        required=True,
+        description="Estimated total number of requests",
+        example=2200,
+    )
+    duration_sec = fields.Float(
+        required=True,
+        description="Estimated total duration of the reset, in seconds",
+        example=220.0,
+    )
+    latency_sec = fields.Dict(
+        keys=fields.String(),
+        values=fields.Float(),
+        required=True,
+        description="Mean latency of previous requests to each downstream target,"
+        " by target, on which the durations are based",
+        example={"dhos_services_api": 0.08},
+    )
+
+
+@openapi_schema(dhos_janitor_api_spec)
+class FanoutResetResponse(Schema):
+    class Meta:
+        title = "Fan-out reset response"
+        unknown = EXCLUDE
+        ordered = True
+
+    tasks = fields.Dict(
+        keys=fields.String(),
+        values=fields.String(),
+        required=True,
+        description="Location of the reset task started against each environment,"
+        " by environment",
+        example={"qa1": "/dhos/v1/task/2c4f1d24-2952-4d4e-b1d1-3637e33cc161"},
+    )
@@ -1,6 +1,7 @@
 import os
 import uuid
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, Iterator
 from unittest import mock
 
 import jose.jwt
@@ -8,17 +9,32 @@ import pytest
 from flask import Flask
 
 from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.helpers import cache
 
 
 @pytest.fixture(autouse=True)
 def clean_caches() -> None:
     from dhos_janitor_api.blueprint_api.client import (
+        circuit_breaker,
+        limiter,
         medication_client,
         trustomer_client,
     )
 
     trustomer_client._cache.clear()
     medication_client._cache.clear()
+    circuit_breaker.reset_breakers()
+    limiter.reset_limiters()
+    cache.reset_baseline = {}
+
+
+@pytest.fixture(autouse=True)
+def latency_stats_path(tmp_path: Path) -> Iterator[Path]:
+    from dhos_janitor_api.config import Configuration
+
+    path: Path = tmp_path / "latency.json"
+    with mock.patch.object(Configuration, "LATENCY_STATS_PATH", str(path)):
+        yield path
 
 
 @pytest.fixture
@@ -1,14 +1,21 @@
+from pathlib import Path
+
 import pytest
+from flask import Flask
 from flask.testing import FlaskClient
 from mock import Mock
 from pytest_mock import MockFixture
 
+from dhos_janitor_api.blueprint_api.client import circuit_breaker
 from dhos_janitor_api.blueprint_api.controller import (
     auth_controller,
+    plan_controller,
     populate_controller,
     reset_controller,
+    shard_controller,
 )
-from dhos_janitor_api.helpers import cache
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import cache, profiling
 from dhos_janitor_api.helpers.cache import TaskStatus
 
 
@@ -57,6 +64,69 @@ class TestApi:
         assert response.status_code == 409
         assert mock_start.call_count == 0
 
+    def test_start_reset_task_other_environment(
+        self, client: FlaskClient, mocker: MockFixture
+    ) -> None:
+        cache.known_tasks = {"uuid1": TaskStatus.RUNNING}
+        cache.task_environments = {}
+        mock_start = mocker.patch.object(
+            reset_controller, "start_reset_thread", return_value="task_uuid"
+        )
+        response = client.post(
+            "/dhos/v1/reset_task?environment=qa1",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert mock_start.call_args.kwargs["environment_name"] == "qa1"
+
+    def test_start_fanout_reset_task(
+        self, client: FlaskClient, mocker: MockFixture
+    ) -> None:
+        cache.known_tasks = {}
+        mocker.patch.object(
+            Configuration, "ENVIRONMENTS", {"qa1": {}, "qa2": {"CUSTOMER_CODE": "QA2"}}
+        )
+        mock_start = mocker.patch.object(
+            reset_controller,
+            "start_reset_thread",
+            side_effect=lambda **kwargs: f"{kwargs['environment_name']}_uuid",
+        )
+        response = client.post(
+            "/dhos/v1/fanout_reset_task?environments=qa1,qa2,qa1&num_gdm_patients=1",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert response.json == {
+            "tasks": {"qa1": "/dhos/v1/task/qa1_uuid", "qa2": "/dhos/v1/task/qa2_uuid"}
+        }
+        assert mock_start.call_count == 2
+        assert mock_start.call_args.kwargs["product_settings"]["GDM"] == {
+            "number_of_patients": 1
+        }
+
+    @pytest.mark.parametrize(
+        "environments,expected_status_code", [("qa1,qa3", 400), ("qa1,qa2", 409)]
+    )
+    def test_start_fanout_reset_task_starts_nothing_on_error(
+        self,
+        client: FlaskClient,
+        mocker: MockFixture,
+        environments: str,
+        expected_status_code: int,
+    ) -> None:
+        cache.known_tasks = {"uuid1": TaskStatus.RUNNING}
+        cache.task_environments = {"uuid1": "qa2"}
+        mocker.patch.object(Configuration, "ENVIRONMENTS", {"qa1": {}, "qa2": {}})
+        mock_start = mocker.patch.object(
+            reset_controller, "start_reset_thread", return_value="task_uuid"
+        )
+        response = client.post(
+            f"/dhos/v1/fanout_reset_task?environments={environments}",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == expected_status_code
+        assert mock_start.call_count == 0
+
     def test_start_populate_task_success(
         self, client: FlaskClient, mocker: MockFixture
     ) -> None:
@@ -71,6 +141,29 @@ class TestApi:
         assert response.headers["Location"] == "/dhos/v1/task/task_uuid"
         assert mock_start.call_count == 1
 
+    def test_start_task_profiled(
+        self, client: FlaskClient, mocker: MockFixture
+    ) -> None:
+        cache.known_tasks = {}
+        mock_reset = mocker.patch.object(
+            reset_controller, "start_reset_thread", return_value="task_uuid"
+        )
+        mock_populate = mocker.patch.object(
+            populate_controller, "start_populate_gdm_thread", return_value="task_uuid"
+        )
+        response = client.post(
+            "/dhos/v1/reset_task?profile=true",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert mock_reset.call_args.kwargs["profile"] is True
+        response = client.post(
+            "/dhos/v1/populate_gdm_task?profile=true",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert mock_populate.call_args.kwargs["profile"] is True
+
     def test_start_populate_task_existing(
         self, client: FlaskClient, mocker: MockFixture
     ) -> None:
@@ -87,6 +180,60 @@ class TestApi:
         assert response.status_code == 409
         assert mock_start.call_count == 0
 
+    def test_create_reset_plan(self, client: FlaskClient, mocker: MockFixture) -> None:
+        plan = {"targets": [], "requests": 0, "duration_sec": 0.0, "latency_sec": {}}
+        mock_plan = mocker.patch.object(
+            plan_controller, "plan_reset", return_value=plan
+        )
+        response = client.post(
+            "/dhos/v1/reset_plan?num_gdm_patients=1&num_hospitals=2&num_wards=3",
+            json={"targets": ["dhos-users-api"]},
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 200
+        assert response.json == plan
+        assert mock_plan.call_args.kwargs["reset_request"] == {
+            "targets": ["dhos-users-api"]
+        }
+        assert mock_plan.call_args.kwargs["product_settings"]["GDM"] == {
+            "number_of_patients": 1
+        }
+        assert mock_plan.call_args.kwargs["location_config"] == {
+            "hospitals": 2,
+            "wards": 3,
+        }
+
+    def test_create_reset_plan_unknown_environment(
+        self, client: FlaskClient, mocker: MockFixture
+    ) -> None:
+        mock_plan = mocker.patch.object(plan_controller, "plan_reset")
+        response = client.post(
+            "/dhos/v1/reset_plan?environment=unknown",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 400
+        mock_plan.assert_not_called()
+
+    def test_resume_reset_task(self, client: FlaskClient, mocker: MockFixture) -> None:
+        cache.known_tasks = {"task_uuid": TaskStatus.ERROR}
+        mock_resume = mocker.patch.object(reset_controller, "resume_reset_thread")
+        response = client.post(
+            "/dhos/v1/task/task_uuid/resume", headers={"Authorization": f"Bearer TOKEN"}
+        )
+        assert response.status_code == 202
+        assert response.headers["Location"] == "/dhos/v1/task/task_uuid"
+        mock_resume.assert_called_once_with(task_uuid="task_uuid", profile=False)
+
+    def test_resume_reset_task_without_checkpoint(
+        self, client: FlaskClient, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        cache.known_tasks = {}
+        mocker.patch.object(Configuration, "CHECKPOINT_DIR", str(tmp_path))
+        response = client.post(
+            "/dhos/v1/task/task_uuid/resume", headers={"Authorization": f"Bearer TOKEN"}
+        )
+        assert response.status_code == 404
+
     @pytest.mark.parametrize(
         "task_uuid,expected_status_code",
         [
@@ -109,6 +256,150 @@ class TestApi:
         )
         assert response.status_code == expected_status_code
 
+    def test_get_task_timings(self, client: FlaskClient) -> None:
+        timings = {"name": "reset_microservices", "duration_sec": 1.5, "count": 1}
+        cache.known_tasks = {"complete_task_uuid": TaskStatus.COMPLETE}
+        cache.task_timings = {"complete_task_uuid": timings}
+        response = client.get(
+            "/dhos/v1/task/complete_task_uuid",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 200
+        assert response.json == {"failing_targets": {}, "timings": timings}
+
+    def test_get_task_shards(
+        self, client: FlaskClient, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        mocker.patch.object(
+            Configuration, "SHARD_STORE_PATH", str(tmp_path / "shards.sqlite")
+        )
+        store = shard_controller.from_config()
+        assert store is not None
+        store.publish(
+            "running_task_uuid",
+            "stage",
+            "post_patients",
+            "default",
+            {},
+            lambda start: [{}] * (3 - start),
+            2,
+        )
+        cache.known_tasks = {"running_task_uuid": TaskStatus.RUNNING}
+        response = client.get(
+            "/dhos/v1/task/running_task_uuid",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert response.json["shards"]["stage"]["shards"] == 2
+        assert response.json["shards"]["stage"]["items"] == 3
+
+    def test_get_task_profile(
+        self, app: Flask, client: FlaskClient, tmp_path: Path
+    ) -> None:
+        app.config["PROFILE_DIR"] = str(tmp_path)
+        cache.known_tasks = {"complete_task_uuid": TaskStatus.COMPLETE}
+        path = profiling.profile_path(app.config["PROFILE_DIR"], "complete_task_uuid")
+        with profiling.profiled(path):
+            sorted(range(1000), key=str)
+
+        response = client.get(
+            "/dhos/v1/task/complete_task_uuid/profile",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 200
+        assert response.mimetype == "application/octet-stream"
+        assert response.data == path.read_bytes()
+
+        response = client.get(
+            "/dhos/v1/task/complete_task_uuid/profile?format=text",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 200
+        assert "cumulative" in response.get_data(as_text=True)
+
+    @pytest.mark.parametrize("task_uuid", ["unprofiled_task_uuid", "unknown_task_uuid"])
+    def test_get_task_profile_not_found(
+        self, client: FlaskClient, task_uuid: str
+    ) -> None:
+        cache.known_tasks = {"unprofiled_task_uuid": TaskStatus.COMPLETE}
+        response = client.get(
+            f"/dhos/v1/task/{task_uuid}/profile",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 404
+
+    def test_get_task_failing_targets(self, client: FlaskClient) -> None:
+        cache.known_tasks = {
+            "running_task_uuid": TaskStatus.RUNNING,
+            "error_task_uuid": TaskStatus.ERROR,
+        }
+        breaker = circuit_breaker.get_breaker("dhos_fuego_api")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        response = client.get(
+            "/dhos/v1/task/running_task_uuid",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 202
+        assert response.json == {
+            "failing_targets": {
+                "dhos_fuego_api": {
+                    "state": "open",
+                    "consecutive_failures": breaker.failure_threshold,
+                }
+            }
+        }
+
+        response = client.get(
+            "/dhos/v1/task/error_task_uuid",
+            headers={"Authorization": f"Bearer TOKEN"},
+        )
+        assert response.status_code == 400
+        assert response.json is not None
+        assert "dhos_fuego_api" in response.json["message"]
+
+    def test_get_task_failing_targets_of_its_environment(
+        self, client: FlaskClient
+    ) -> None:
+        cache.known_tasks = {
+            "qa1_task_uuid": TaskStatus.RUNNING,
+            "default_task_uuid": TaskStatus.RUNNING,
+        }
+        cache.task_environments = {"qa1_task_uuid": "qa1"}
+        breaker = circuit_breaker.get_breaker("qa2/dhos_fuego_api")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker = circuit_breaker.get_breaker("qa1/dhos_users_api")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        for task_uuid, failing in (
+            ("qa1_task_uuid", ["dhos_users_api"]),
+            ("default_task_uuid", []),
+        ):
+            response = client.get(
+                f"/dhos/v1/task/{task_uuid}",
+                headers={"Authorization": f"Bearer TOKEN"},
+            )
+            assert response.status_code == 202
+            assert response.json is not None
+            assert list(response.json["failing_targets"]) == failing
+
+    def test_get_target_health(self, client: FlaskClient) -> None:
+        circuit_breaker.get_breaker("dhos_users_api").record_failure()
+        response = client.get(
+            "/dhos/v1/target_health", headers={"Authorization": f"Bearer TOKEN"}
+        )
+        assert response.status_code == 200
+        assert response.json is not None
+        assert len(response.json) == 18
+        assert response.json["dhos_users_api"] == {
+            "state": "closed",
+            "consecutive_failures": 1,
+        }
+        assert response.json["gdm_bff"]["state"] == "closed"
+
     def test_get_clinician_jwt(self, client: FlaskClient, mocker: MockFixture) -> None:
         mock_jwt = mocker.patch.object(
             auth_controller, "get_clinician_jwt", return_value="TOKEN"
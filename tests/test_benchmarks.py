@@ -0,0 +1,104 @@
+from typing import Any, Dict
+
+import pytest
+from pytest_mock import MockFixture
+
+from benchmarks import generators, reset, startup
+from dhos_janitor_api.config import Configuration
+
+
+class TestResetBenchmark:
+    @pytest.fixture
+    def results(self) -> Dict[str, Any]:
+        return {
+            "cases": {
+                "small": {
+                    "wall_sec": 10.0,
+                    "cpu_sec": 8.0,
+                    "peak_rss_mb": 80.0,
+                    "total_requests": 1000,
+                }
+            }
+        }
+
+    def test_run_case(self, mocker: MockFixture) -> None:
+        # run_case expects a process to itself, so restore anything it changes.
+        mocker.patch.object(Configuration, "TARGET_LIMITS", Configuration.TARGET_LIMITS)
+        case = reset.Case(
+            "tiny", num_gdm_patients=1, num_dbm_patients=1, num_send_patients=1
+        )
+        first = reset.run_case(case, reset.Options(verbose=True))
+        second = reset.run_case(case, reset.Options(verbose=True))
+
+        assert set(first["stages"]) == {"reset", "populate"}
+        assert first["wall_sec"] > 0
+        assert first["peak_rss_mb"] > 0
+        assert first["total_requests"] == sum(first["requests"].values())
+        assert first["requests"]["dhos_services_api"] > 0
+        assert first["requests"] == second["requests"]
+
+    def test_compare_within_tolerance(self, results: Dict[str, Any]) -> None:
+        current = {
+            "cases": {
+                "small": {
+                    "wall_sec": 12.0,
+                    "cpu_sec": 8.4,
+                    "peak_rss_mb": 85.0,
+                    "total_requests": 900,
+                },
+                "new_case": {},
+            }
+        }
+        assert reset.compare(current, results, reset.DEFAULT_TOLERANCES) == []
+
+    def test_compare_regressions(self, results: Dict[str, Any]) -> None:
+        current = {
+            "cases": {
+                "small": {
+                    "wall_sec": 13.0,
+                    "cpu_sec": 8.0,
+                    "peak_rss_mb": 80.0,
+                    "total_requests": 1100,
+                }
+            }
+        }
+        regressions = reset.compare(current, results, reset.DEFAULT_TOLERANCES)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("small: wall_sec 13.00 exceeds")
+        assert regressions[1].startswith("small: total_requests")
+
+    def test_compare_allows_noise_on_short_cases(self) -> None:
+        baseline = {"cases": {"small": {"wall_sec": 0.4}}}
+        current = {"cases": {"small": {"wall_sec": 0.8}}}
+        assert reset.compare(current, baseline, {"wall_sec": 0.25}) == []
+
+
+class TestGeneratorBenchmarks:
+    def test_run_all(self) -> None:
+        results = generators.run_all(
+            [b for b in generators.BENCHMARKS if b.name != "encounters"], repeat=1
+        )
+        assert set(results["cases"]) == {
+            b.name for b in generators.BENCHMARKS if b.name != "encounters"
+        }
+        for result in results["cases"].values():
+            assert result["entities"] > 0
+            assert result["entities_per_sec"] > 0
+            assert result["peak_kb"] > 0
+
+    def test_seeded_runs_are_repeatable(self) -> None:
+        with generators._offline():
+            benchmark = next(b for b in generators.BENCHMARKS if b.name == "encounters")
+            first = generators.run_benchmark(benchmark, repeat=1, seed=1)
+            second = generators.run_benchmark(benchmark, repeat=1, seed=1)
+        assert first["entities"] == second["entities"] == 200
+        assert first["peak_kb"] == pytest.approx(second["peak_kb"], rel=0.1)
+
+
+class TestStartupBenchmark:
+    def test_run_all(self) -> None:
+        results = startup.run_all(repeat=1)
+        assert set(results["cases"]) == {"cold", "warm"}
+        for result in results["cases"].values():
+            assert 0 < result["import_sec"] < result["total_sec"]
+            assert result["create_app_sec"] > 0
@@ -106,6 +106,7 @@ class TestActivationAuthClient:
                 "description": f"static device {device_id}",
             },
             headers={"Authorization": f"Bearer {system_jwt}"},
+            existing_url="/dhos/v1/device/{uuid}",
         )
 
         assert mock_create_device.called
@@ -0,0 +1,139 @@
+import httpx
+import pytest
+from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
+from pytest_mock import MockFixture
+from respx import MockRouter
+
+from dhos_janitor_api.blueprint_api.client import (
+    TargetClient,
+    circuit_breaker,
+    common,
+    retry,
+)
+from dhos_janitor_api.blueprint_api.client.circuit_breaker import (
+    BreakerState,
+    CircuitBreaker,
+    CircuitOpenException,
+)
+
+URL = "http://dhos-fuego/"
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def breaker(self) -> CircuitBreaker:
+        return CircuitBreaker(
+            target="dhos_fuego_api", failure_threshold=3, reset_timeout_sec=30
+        )
+
+    def test_opens_after_consecutive_failures(self, breaker: CircuitBreaker) -> None:
+        for _ in range(2):
+            breaker.before_request()
+            breaker.record_failure()
+        assert breaker.state == BreakerState.CLOSED
+        breaker.record_success()
+        for _ in range(3):
+            breaker.before_request()
+            breaker.record_failure()
+        assert breaker.state == BreakerState.OPEN
+        with pytest.raises(CircuitOpenException):
+            breaker.before_request()
+
+    def test_half_open_probe(
+        self, breaker: CircuitBreaker, mocker: MockFixture
+    ) -> None:
+        mock_monotonic = mocker.patch.object(
+            circuit_breaker.time, "monotonic", return_value=100.0
+        )
+        for _ in range(3):
+            breaker.record_failure()
+        mock_monotonic.return_value = 131.0
+
+        # Only one probe is let through while half-open.
+        breaker.before_request()
+        assert breaker.state == BreakerState.HALF_OPEN
+        with pytest.raises(CircuitOpenException):
+            breaker.before_request()
+
+        # A failed probe opens the circuit again straight away.
+        breaker.record_failure()
+        assert breaker.state == BreakerState.OPEN
+        with pytest.raises(CircuitOpenException):
+            breaker.before_request()
+
+        mock_monotonic.return_value = 162.0
+        breaker.before_request()
+        breaker.record_success()
+        assert breaker.state == BreakerState.CLOSED
+        breaker.before_request()
+
+    def test_get_breaker_is_shared(self) -> None:
+        breaker = circuit_breaker.get_breaker("dhos_fuego_api")
+        assert circuit_breaker.get_breaker("dhos_fuego_api") is breaker
+        breaker.record_failure()
+        assert circuit_breaker.breaker_states() == {
+            "dhos_fuego_api": {"state": "closed", "consecutive_failures": 1}
+        }
+        assert circuit_breaker.breaker_states(BreakerState.OPEN) == {}
+
+    def test_make_request_fails_fast_when_open(
+        self, respx_mock: MockRouter, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(common.time, "sleep")
+        breaker = CircuitBreaker(
+            target="dhos_fuego_api", failure_threshold=2, reset_timeout_sec=30
+        )
+        client = TargetClient(
+            target="dhos_fuego_api",
+            retry_budget=retry.RetryBudget(10),
+            breaker=breaker,
+        )
+        mock_get = respx_mock.get(url=URL).mock(
+            side_effect=httpx.ConnectError("Connection refused")
+        )
+
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=client, method="get", url=URL)
+        assert breaker.state == BreakerState.OPEN
+        # The breaker stopped the retries short of HTTP_RETRY_MAX_ATTEMPTS.
+        assert mock_get.call_count == 2
+
+        with pytest.raises(CircuitOpenException):
+            common.make_request(client=client, method="get", url=URL)
+        assert mock_get.call_count == 2
+
+    def test_client_errors_do_not_open_circuit(self, respx_mock: MockRouter) -> None:
+        breaker = CircuitBreaker(
+            target="dhos_fuego_api", failure_threshold=1, reset_timeout_sec=30
+        )
+        client = TargetClient(
+            target="dhos_fuego_api",
+            retry_budget=retry.RetryBudget(10),
+            breaker=breaker,
+        )
+        respx_mock.get(url=URL).mock(return_value=httpx.Response(404))
+
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=client, method="get", url=URL)
+        assert breaker.state == BreakerState.CLOSED
+
+    def test_probe_released_when_request_not_sent(
+        self, breaker: CircuitBreaker, mocker: MockFixture
+    ) -> None:
+        mock_monotonic = mocker.patch.object(
+            circuit_breaker.time, "monotonic", return_value=100.0
+        )
+        for _ in range(3):
+            breaker.record_failure()
+        mock_monotonic.return_value = 131.0
+        mocker.patch.object(common, "_send", side_effect=RuntimeError("Deadline"))
+
+        with pytest.raises(RuntimeError):
+            common._send_through_breaker(
+                httpx.Client(), "dhos_fuego_api", breaker, None, "get", URL
+            )
+        # The probe counted as failed, so another is let through after the timeout.
+        assert breaker.state == BreakerState.OPEN
+        mock_monotonic.return_value = 162.0
+        breaker.before_request()
+        assert breaker.state == BreakerState.HALF_OPEN
@@ -1,11 +1,29 @@
+from typing import Any, Dict, List, Optional
+
 import httpx
+import pytest
+from flask_batteries_included.helpers.error_handler import ServiceUnavailableException
+from mock import Mock
+from prometheus_client import REGISTRY
 from pytest_mock import MockFixture
 from respx import MockRouter
 
-from dhos_janitor_api.blueprint_api.client import common
+from dhos_janitor_api.blueprint_api.client import TargetClient, common, retry, timeouts
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import tracing
+
+URL = "http://dev.sensynehealth.com"
 
 
 class TestCommon:
+    @pytest.fixture(autouse=True)
+    def mock_sleep(self, mocker: MockFixture) -> Mock:
+        return mocker.patch.object(common.time, "sleep")
+
+    @pytest.fixture
+    def target_client(self) -> TargetClient:
+        return TargetClient(target="dhos_users_api", retry_budget=retry.RetryBudget(10))
+
     def test_log_if_deprecated(
         self, respx_mock: MockRouter, mocker: MockFixture
     ) -> None:
@@ -35,5 +53,247 @@ class TestCommon:
 
         assert mock_response.called
         spy_client.assert_called_once_with(
-            "get", url, json=None, params=None, headers=None, timeout=60
+            "get",
+            url,
+            json=None,
+            params=None,
+            headers=None,
+            timeout=timeouts.timeout_for(common.UNKNOWN_TARGET),
+        )
+
+    def test_make_request_traced(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        mock_response = respx_mock.get(url=URL).mock(
+            side_effect=[httpx.Response(status_code=502), httpx.Response(200)]
+        )
+        exported: List[Dict] = []
+        with tracing.trace("task", exported.extend):
+            common.make_request(
+                client=target_client, method="get", url=URL, headers={"X": "1"}
+            )
+
+        span = next(s for s in exported if s["name"] == "GET dhos_users_api")
+        assert span["attributes"] == {
+            "target": "dhos_users_api",
+            "method": "GET",
+            "url": URL,
+            "operation": None,
+            "attempts": 2,
+            "status_code": 200,
+        }
+        for call in mock_response.calls:
+            assert call.request.headers["X"] == "1"
+            assert call.request.headers["traceparent"] == (
+                f"00-{span['trace_id']}-{span['span_id']}-01"
+            )
+
+    def test_make_request_retries_idempotent(
+        self, respx_mock: MockRouter, target_client: TargetClient, mock_sleep: Mock
+    ) -> None:
+        mock_response = respx_mock.get(url=URL).mock(
+            side_effect=[
+                httpx.Response(status_code=502),
+                httpx.ConnectError("refused"),
+                httpx.Response(status_code=200),
+            ]
+        )
+        response = common.make_request(client=target_client, method="get", url=URL)
+        assert response.status_code == 200
+        assert mock_response.call_count == 3
+        assert mock_sleep.call_count == 2
+        assert target_client.retry_budget.remaining == 8
+
+    def test_make_request_gives_up_after_max_attempts(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        mock_response = respx_mock.get(url=URL).mock(
+            return_value=httpx.Response(status_code=503)
+        )
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=target_client, method="get", url=URL)
+        assert mock_response.call_count == Configuration.HTTP_RETRY_MAX_ATTEMPTS
+
+    @pytest.mark.parametrize(
+        "json,expected_calls", [(None, 1), ({"name": "x"}, 1), ({"uuid": "x"}, 2)]
+    )
+    def test_make_request_post_retried_only_with_uuid(
+        self,
+        respx_mock: MockRouter,
+        target_client: TargetClient,
+        json: Optional[Dict],
+        expected_calls: int,
+    ) -> None:
+        mock_response = respx_mock.post(url=URL).mock(
+            side_effect=[httpx.Response(status_code=502), httpx.Response(201)]
+        )
+        if expected_calls == 1:
+            with pytest.raises(ServiceUnavailableException):
+                common.make_request(
+                    client=target_client, method="post", url=URL, json=json
+                )
+        else:
+            common.make_request(client=target_client, method="post", url=URL, json=json)
+        assert mock_response.call_count == expected_calls
+
+    def test_make_request_retried_create_conflict_is_success(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        respx_mock.post(url=URL).mock(
+            side_effect=[httpx.ReadTimeout("timeout"), httpx.Response(409)]
+        )
+        response = common.make_request(
+            client=target_client, method="post", url=URL, json={"uuid": "x"}
+        )
+        assert response.status_code == 409
+
+    def test_make_request_retried_create_conflict_gets_existing(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        respx_mock.post(url=URL).mock(
+            side_effect=[httpx.ReadTimeout("timeout"), httpx.Response(409)]
+        )
+        mock_get = respx_mock.get(url=f"{URL}/entity/x").mock(
+            return_value=httpx.Response(200, json={"uuid": "x"})
+        )
+        response = common.make_request(
+            client=target_client,
+            method="post",
+            url=URL,
+            json={"uuid": "x"},
+            existing_url=URL + "/entity/{uuid}",
+        )
+        assert mock_get.called
+        assert response.json() == {"uuid": "x"}
+
+    def test_make_request_non_retryable_status(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        mock_response = respx_mock.get(url=URL).mock(return_value=httpx.Response(404))
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=target_client, method="get", url=URL)
+        assert mock_response.call_count == 1
+
+    def test_make_request_retry_budget(self, respx_mock: MockRouter) -> None:
+        client = TargetClient(target="gdm_bff", retry_budget=retry.RetryBudget(1))
+        mock_response = respx_mock.get(url=URL).mock(
+            return_value=httpx.Response(status_code=502)
+        )
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=client, method="get", url=URL)
+        assert mock_response.call_count == 2
+
+    def test_make_request_records_metrics(
+        self, respx_mock: MockRouter, target_client: TargetClient
+    ) -> None:
+        def _sample(name: str, **labels: str) -> float:
+            return REGISTRY.get_sample_value(name, labels) or 0
+
+        before = {
+            "502": _sample(
+                "janitor_http_requests_total",
+                target="dhos_users_api",
+                method="get",
+                status="502",
+            ),
+            "error": _sample(
+                "janitor_http_requests_total",
+                target="dhos_users_api",
+                method="get",
+                status="error",
+            ),
+            "duration": _sample(
+                "janitor_http_request_duration_seconds_count",
+                target="dhos_users_api",
+                method="get",
+            ),
+            "failures": _sample(
+                "janitor_http_failures_total", target="dhos_users_api", method="get"
+            ),
+        }
+        respx_mock.get(url=URL).mock(
+            side_effect=[
+                httpx.Response(status_code=502),
+                httpx.ConnectError("refused"),
+                httpx.Response(status_code=502),
+            ]
+        )
+        with pytest.raises(ServiceUnavailableException):
+            common.make_request(client=target_client, method="get", url=URL)
+
+        assert (
+            _sample(
+                "janitor_http_requests_total",
+                target="dhos_users_api",
+                method="get",
+                status="502",
+            )
+            == before["502"] + 2
+        )
+        assert (
+            _sample(
+                "janitor_http_requests_total",
+                target="dhos_users_api",
+                method="get",
+                status="error",
+            )
+            == before["error"] + 1
+        )
+        assert (
+            _sample(
+                "janitor_http_request_duration_seconds_count",
+                target="dhos_users_api",
+                method="get",
+            )
+            == before["duration"] + 3
+        )
+        assert (
+            _sample(
+                "janitor_http_failures_total", target="dhos_users_api", method="get"
+            )
+            == before["failures"] + 1
+        )
+
+    def test_make_request_honours_retry_after(
+        self, respx_mock: MockRouter, target_client: TargetClient, mock_sleep: Mock
+    ) -> None:
+        respx_mock.post(url=URL).mock(
+            side_effect=[
+                httpx.Response(status_code=429, headers={"Retry-After": "3"}),
+                httpx.Response(status_code=200),
+            ]
+        )
+        common.make_request(client=target_client, method="post", url=URL)
+        mock_sleep.assert_called_once_with(3.0)
+
+    @pytest.mark.parametrize(
+        "policies,method,expected",
+        [
+            ({}, "get", Configuration.HTTP_RETRY_MAX_ATTEMPTS),
+            ({"dhos_users_api": {"max_attempts": 5}}, "get", 5),
+            (
+                {
+                    "dhos_users_api": {"max_attempts": 5},
+                    "dhos_users_api:post": {"max_attempts": 2},
+                },
+                "post",
+                2,
+            ),
+        ],
+    )
+    def test_policy_for(
+        self,
+        mocker: MockFixture,
+        policies: Dict[str, Dict[str, Any]],
+        method: str,
+        expected: int,
+    ) -> None:
+        mocker.patch.object(Configuration, "TARGET_RETRY_POLICIES", policies)
+        assert retry.policy_for("dhos_users_api", method).max_attempts == expected
+
+    def test_backoff_is_capped(self) -> None:
+        policy = retry.RetryPolicy(
+            max_attempts=10, backoff_sec=1.0, backoff_max_sec=4.0
         )
+        assert all(0 <= policy.backoff(attempt) <= 4.0 for attempt in range(1, 10))
+        assert policy.backoff(1, retry_after=30) == 4.0
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import List
+
+import httpx
+from flask import Flask
+from pytest_mock import MockFixture
+from respx import MockRouter
+
+from dhos_janitor_api.blueprint_api.client import (
+    ClientRepository,
+    TargetClient,
+    common,
+    limiter,
+    retry,
+)
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers.environment import Environment
+
+
+class TestLimiter:
+    def test_limits_in_flight(self) -> None:
+        limit = limiter.AdaptiveLimiter(target="gdm_bff", max_in_flight=2)
+        lock = threading.Lock()
+        in_flight: List[int] = [0]
+        peak: List[int] = [0]
+
+        def _request() -> None:
+            with limit.acquire():
+                with lock:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                time.sleep(0.01)
+                with lock:
+                    in_flight[0] -= 1
+
+        threads = [threading.Thread(target=_request) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert peak[0] == 2
+        assert limit.in_flight == 0
+
+    def test_aimd(self) -> None:
+        limit = limiter.AdaptiveLimiter(target="gdm_bff", max_in_flight=8)
+        limit.record(latency_sec=0.1, congested=True)
+        assert limit.limit == 4
+        # Repeated congestion within the cooldown period only halves once.
+        limit.record(latency_sec=0.1, congested=True)
+        assert limit.limit == 4
+        # Additive increase: about one per limit's worth of successful requests.
+        for _ in range(5):
+            limit.record(latency_sec=0.1, congested=False)
+        assert limit.limit == 5
+        for _ in range(100):
+            limit.record(latency_sec=0.1, congested=False)
+        assert limit.limit == 8
+
+    def test_slow_responses_are_congestion(self) -> None:
+        limit = limiter.AdaptiveLimiter(
+            target="gdm_bff", max_in_flight=8, latency_target_sec=0.5
+        )
+        limit.record(latency_sec=1.0, congested=False)
+        assert limit.limit == 4
+
+    def test_never_below_minimum(self, mocker: MockFixture) -> None:
+        limit = limiter.AdaptiveLimiter(target="gdm_bff", max_in_flight=2)
+        mocker.patch.object(limit, "_cooldown_sec", 0)
+        for _ in range(5):
+            limit.record(latency_sec=0.1, congested=True)
+        assert limit.limit == 1
+
+    def test_requests_per_sec(self, mocker: MockFixture) -> None:
+        mock_sleep = mocker.patch.object(limiter.time, "sleep")
+        limit = limiter.AdaptiveLimiter(
+            target="gdm_bff", max_in_flight=8, requests_per_sec=10
+        )
+        for _ in range(3):
+            with limit.acquire():
+                pass
+        assert mock_sleep.call_count == 2
+        assert all(0 < c.args[0] <= 0.2 for c in mock_sleep.call_args_list)
+
+    def test_limiter_for(self, mocker: MockFixture) -> None:
+        mocker.patch.object(
+            Configuration, "TARGET_LIMITS", {"gdm_bff": {"max_in_flight": 3}}
+        )
+        assert limiter.limiter_for("gdm_bff").max_in_flight == 3
+        assert (
+            limiter.limiter_for("dhos_users_api").max_in_flight
+            == Configuration.HTTP_MAX_IN_FLIGHT
+        )
+
+    def test_limiters_shared_across_repositories(self, app: Flask) -> None:
+        def _users_limiter(clients: ClientRepository) -> limiter.AdaptiveLimiter:
+            client = clients.dhos_users_api
+            assert isinstance(client, TargetClient) and client.limiter is not None
+            return client.limiter
+
+        default = _users_limiter(ClientRepository.from_app(app))
+        assert _users_limiter(ClientRepository.from_app(app)) is default
+        other = _users_limiter(
+            ClientRepository.from_app(app, environment=Environment("qa1"))
+        )
+        assert other is not default
+        assert other.target == "qa1/dhos_users_api"
+
+    def test_make_request_reports_congestion(
+        self, respx_mock: MockRouter, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(common.time, "sleep")
+        limit = limiter.AdaptiveLimiter(target="gdm_bff", max_in_flight=8)
+        client = TargetClient(
+            target="gdm_bff", retry_budget=retry.RetryBudget(10), limiter=limit
+        )
+        respx_mock.get(url="http://gdm-bff/").mock(
+            side_effect=[httpx.Response(429), httpx.Response(200)]
+        )
+        common.make_request(client=client, method="get", url="http://gdm-bff/")
+        assert limit.limit == 4
+        assert limit.in_flight == 0
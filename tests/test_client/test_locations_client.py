@@ -66,6 +66,7 @@ class TestLocationsClient:
             method="post",
             url="/dhos/v1/location",
             headers={"Authorization": f"Bearer {system_jwt}"},
+            existing_url="/dhos/v1/location/{uuid}",
             json={},
         )
 
@@ -8,7 +8,7 @@ from pytest_mock import MockFixture
 from respx import MockRouter
 
 from dhos_janitor_api.blueprint_api import ClientRepository
-from dhos_janitor_api.blueprint_api.client import services_client
+from dhos_janitor_api.blueprint_api.client import common, services_client
 
 
 @pytest.mark.usefixtures("mock_system_jwt", "mock_clinician_jwt")
@@ -97,11 +97,34 @@ class TestServicesClient:
             params={"product_name": "GDM"},
             json={},
             headers={"Authorization": f"Bearer {clinician_jwt}"},
+            existing_url="/dhos/v1/patient/{uuid}",
         )
 
         assert mock_create_patient.called
         assert isinstance(actual, Dict)
 
+    def test_create_patient_retried_returns_existing_patient(
+        self,
+        clients: ClientRepository,
+        respx_mock: MockRouter,
+        mocker: MockFixture,
+        clinician_jwt: str,
+    ) -> None:
+        mocker.patch.object(common.time, "sleep")
+        patient = {"uuid": "patient_uuid", "first_name": "Jane"}
+        respx_mock.post(url="/dhos/v1/patient").mock(
+            side_effect=[
+                httpx.ReadTimeout("timeout"),
+                httpx.Response(status_code=409, json={"message": "Conflict"}),
+            ]
+        )
+        respx_mock.get(url="/dhos/v1/patient/patient_uuid").mock(
+            return_value=httpx.Response(status_code=200, json=patient)
+        )
+
+        actual = services_client.create_patient(clients, patient, "GDM", clinician_jwt)
+        assert actual == patient
+
     def test_update_patient(
         self,
         clients: ClientRepository,
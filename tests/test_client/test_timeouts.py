@@ -0,0 +1,79 @@
+import httpx
+import pytest
+from pytest_mock import MockFixture
+from respx import MockRouter
+
+from dhos_janitor_api.blueprint_api.client import TargetClient, common, retry, timeouts
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import deadline
+
+URL = "http://dhos-users/"
+
+
+class TestTimeouts:
+    def test_timeout_for(self, mocker: MockFixture) -> None:
+        mocker.patch.object(
+            Configuration,
+            "TARGET_TIMEOUTS",
+            {
+                "dhos_users_api": {"connect": 2, "read": 20},
+                "*:drop_data": {"read": 30},
+                "dhos_users_api:drop_data": {"read": 300},
+            },
+        )
+        assert timeouts.timeout_for("dhos_users_api") == httpx.Timeout(
+            connect=2,
+            read=20,
+            write=Configuration.HTTP_TIMEOUT_WRITE_SEC,
+            pool=Configuration.HTTP_TIMEOUT_POOL_SEC,
+        )
+        assert timeouts.timeout_for("dhos_users_api", "drop_data").read == 300
+        assert timeouts.timeout_for("dhos_users_api", "drop_data").connect == 2
+        assert timeouts.timeout_for("gdm_bff", "drop_data").read == 30
+        assert (
+            timeouts.timeout_for("gdm_bff").read == Configuration.HTTP_TIMEOUT_READ_SEC
+        )
+
+    def test_drop_data_timeout(self) -> None:
+        assert timeouts.timeout_for("gdm_bff", "drop_data") == httpx.Timeout(30)
+
+    def test_within_deadline(self) -> None:
+        timeout = httpx.Timeout(connect=10, read=60, write=60, pool=60)
+        assert timeouts.within_deadline(timeout) == timeout
+        with deadline.task_deadline(5):
+            capped = timeouts.within_deadline(timeout)
+            assert capped.connect is not None and 4 < capped.connect <= 5
+            assert capped.read is not None and 4 < capped.read <= 5
+            # A nested deadline can only shorten the outer one.
+            with deadline.task_deadline(600):
+                remaining = deadline.remaining()
+                assert remaining is not None and remaining <= 5
+        assert deadline.remaining() is None
+
+    def test_make_request_past_deadline(
+        self, respx_mock: MockRouter, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(deadline, "remaining", return_value=-1.0)
+        mock_get = respx_mock.get(url=URL).mock(return_value=httpx.Response(200))
+        with pytest.raises(deadline.DeadlineExceededError):
+            common.make_request(client=httpx.Client(), method="get", url=URL)
+        assert not mock_get.called
+
+    def test_make_request_does_not_retry_past_deadline(
+        self, respx_mock: MockRouter, mocker: MockFixture
+    ) -> None:
+        mock_sleep = mocker.patch.object(common.time, "sleep")
+        mocker.patch.object(
+            retry.RetryPolicy,
+            "backoff",
+            return_value=Configuration.HTTP_RETRY_BACKOFF_MAX_SEC,
+        )
+        client = TargetClient(
+            target="dhos_users_api", retry_budget=retry.RetryBudget(10)
+        )
+        mock_get = respx_mock.get(url=URL).mock(return_value=httpx.Response(503))
+        with deadline.task_deadline(1):
+            with pytest.raises(deadline.DeadlineExceededError):
+                common.make_request(client=client, method="get", url=URL)
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
@@ -93,6 +93,7 @@ class TestServicesClient:
             params={"send_welcome_email": False},
             json={},
             headers={"Authorization": f"Bearer {system_jwt}"},
+            existing_url="/dhos/v1/clinician/{uuid}",
         )
 
         assert mock_create_clinician.called
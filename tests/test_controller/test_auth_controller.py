@@ -7,11 +7,14 @@ import pytest
 import requests
 from flask import Flask
 from mock import MagicMock, Mock
+from prometheus_client import REGISTRY
 from pytest_mock import MockFixture
 
 from dhos_janitor_api.blueprint_api import ClientRepository
 from dhos_janitor_api.blueprint_api.client import activation_auth_client
 from dhos_janitor_api.blueprint_api.controller import auth_controller
+from dhos_janitor_api.helpers import environment
+from dhos_janitor_api.helpers.environment import Environment
 
 real_requests_get = requests.get
 real_requests_post = requests.post
@@ -26,6 +29,30 @@ class TestAuthController:
         second_result = auth_controller.get_system_jwt("something")
         assert second_result == first_result
 
+    def test_get_system_jwt_cache_metrics(self) -> None:
+        def _sample(result: str) -> float:
+            return (
+                REGISTRY.get_sample_value(
+                    "janitor_jwt_cache_lookups_total",
+                    {"kind": "system", "result": result},
+                )
+                or 0
+            )
+
+        hits, misses = _sample("hit"), _sample("miss")
+        auth_controller.get_system_jwt("metered")
+        auth_controller.get_system_jwt("metered")
+        assert _sample("miss") == misses + 1
+        assert _sample("hit") == hits + 1
+
+    def test_get_system_jwt_cached_by_environment(self) -> None:
+        default_jwt = auth_controller.get_system_jwt("environments")
+        with environment.active(Environment("qa1", {"HS_KEY": "qa1-key"})):
+            qa1_jwt = auth_controller.get_system_jwt("environments")
+            assert auth_controller.get_system_jwt("environments") == qa1_jwt
+        assert qa1_jwt != default_jwt
+        assert auth_controller.get_system_jwt("environments") == default_jwt
+
     @pytest.mark.parametrize("username", ("Gregory House", ""))
     @pytest.mark.parametrize("password", ("qwerty123", ""))
     @pytest.mark.parametrize("use_auth0", (True, False))
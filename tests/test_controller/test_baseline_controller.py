@@ -0,0 +1,92 @@
+from typing import Any, Dict, List
+
+import pytest
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.blueprint_api import ClientRepository
+from dhos_janitor_api.blueprint_api.controller import baseline_controller
+from dhos_janitor_api.helpers import cache
+
+TARGETS = (
+    "dhos_locations_api",
+    "dhos_users_api",
+    "dhos_services_api",
+    "dhos_activation_auth_api",
+    "dhos_encounters_api",
+    "dhos_observations_api",
+)
+
+
+@pytest.mark.usefixtures("mock_system_jwt")
+class TestBaselineController:
+    @pytest.fixture
+    def data(self, mocker: MockFixture) -> Dict[str, List[Dict]]:
+        data: Dict[str, List[Dict]] = {
+            target: [{"uuid": f"{target}_1"}, {"uuid": f"{target}_2"}]
+            for target in baseline_controller.PROBES
+        }
+        mocker.patch.dict(
+            baseline_controller.PROBES,
+            {
+                target: lambda clients, jwt, target=target: data[target]
+                for target in baseline_controller.PROBES
+            },
+        )
+        return data
+
+    def test_fingerprint_ignores_order(self) -> None:
+        a: List[Any] = [{"uuid": "1", "x": [1, 2]}, {"uuid": "2"}]
+        assert baseline_controller.fingerprint(a) == baseline_controller.fingerprint(
+            a[::-1]
+        )
+        assert baseline_controller.fingerprint(a) != baseline_controller.fingerprint(
+            a[:1]
+        )
+
+    def test_no_baseline_resets_all(
+        self, clients: ClientRepository, data: Dict[str, List[Dict]]
+    ) -> None:
+        assert baseline_controller.targets_to_reset(clients, TARGETS, "s") == list(
+            TARGETS
+        )
+
+    def test_different_settings_resets_all(
+        self, clients: ClientRepository, data: Dict[str, List[Dict]]
+    ) -> None:
+        baseline_controller.record_baseline(clients, "s1")
+        assert baseline_controller.targets_to_reset(clients, TARGETS, "s2") == list(
+            TARGETS
+        )
+
+    def test_unchanged_targets_skipped(
+        self, clients: ClientRepository, data: Dict[str, List[Dict]]
+    ) -> None:
+        baseline_controller.record_baseline(clients, "s")
+        assert set(cache.reset_baseline["default"]["targets"]) == set(
+            baseline_controller.PROBES
+        )
+        assert baseline_controller.targets_to_reset(clients, TARGETS, "s") == [
+            "dhos_activation_auth_api",
+            "dhos_observations_api",
+        ]
+
+    def test_changed_target_resets_dependents(
+        self, clients: ClientRepository, data: Dict[str, List[Dict]]
+    ) -> None:
+        baseline_controller.record_baseline(clients, "s")
+        data["dhos_services_api"][0]["first_name"] = "Changed"
+        assert baseline_controller.targets_to_reset(clients, TARGETS, "s") == [
+            "dhos_services_api",
+            "dhos_activation_auth_api",
+            "dhos_encounters_api",
+            "dhos_observations_api",
+        ]
+
+    def test_clear_baseline(
+        self, clients: ClientRepository, data: Dict[str, List[Dict]]
+    ) -> None:
+        baseline_controller.record_baseline(clients, "s")
+        baseline_controller.clear_baseline()
+        assert baseline_controller.targets_to_reset(clients, TARGETS, "s") == list(
+            TARGETS
+        )
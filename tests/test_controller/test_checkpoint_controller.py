@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import pytest
+from flask_batteries_included.helpers.error_handler import EntityNotFoundException
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.blueprint_api.controller import checkpoint_controller
+from dhos_janitor_api.config import Configuration
+
+
+class TestCheckpointController:
+    @pytest.fixture
+    def checkpoint(self, tmp_path: Path) -> checkpoint_controller.Checkpoint:
+        return checkpoint_controller.Checkpoint(
+            checkpoint_controller.checkpoint_path(str(tmp_path), "task_uuid"),
+            {"reset_request": {"targets": ["dhos-users-api"]}},
+        )
+
+    def test_no_checkpoint(self) -> None:
+        with checkpoint_controller.active(None):
+            checkpoint_controller.save_plan(("dhos_users_api",), {})
+            checkpoint_controller.complete("drop:dhos_users_api")
+            checkpoint_controller.item_done("dhos_services_api:GDM")
+            assert checkpoint_controller.saved_plan() is None
+            assert not checkpoint_controller.is_complete("drop:dhos_users_api")
+            assert checkpoint_controller.items_done("dhos_services_api:GDM") == 0
+
+    def test_saved_on_failure(
+        self, checkpoint: checkpoint_controller.Checkpoint
+    ) -> None:
+        with pytest.raises(ValueError):
+            with checkpoint_controller.active(checkpoint):
+                checkpoint_controller.save_plan(("dhos_users_api",), {})
+                checkpoint_controller.complete("drop:dhos_users_api")
+                checkpoint_controller.item_done("dhos_users_api:clinicians")
+                raise ValueError("Failed")
+
+        loaded = checkpoint_controller.Checkpoint.load(checkpoint.path)
+        assert loaded.task == {"reset_request": {"targets": ["dhos-users-api"]}}
+        with checkpoint_controller.active(loaded):
+            assert checkpoint_controller.saved_plan() == (("dhos_users_api",), {})
+            assert checkpoint_controller.is_complete("drop:dhos_users_api")
+            assert not checkpoint_controller.is_complete("populate:dhos_users_api")
+            assert checkpoint_controller.items_done("dhos_users_api:clinicians") == 1
+
+    def test_deleted_on_success(
+        self, checkpoint: checkpoint_controller.Checkpoint
+    ) -> None:
+        with checkpoint_controller.active(checkpoint):
+            checkpoint_controller.save_plan(("dhos_users_api",), {})
+            assert checkpoint.path.is_file()
+        assert not checkpoint.path.exists()
+
+    def test_saved_after_each_chunk(
+        self, checkpoint: checkpoint_controller.Checkpoint, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(Configuration, "CHECKPOINT_CHUNK_SIZE", 3)
+        with checkpoint_controller.active(checkpoint):
+            for _ in range(4):
+                checkpoint_controller.item_done("dhos_services_api:GDM")
+            saved = checkpoint_controller.Checkpoint.load(checkpoint.path)
+            assert saved.items == {"dhos_services_api:GDM": 3}
+
+    def test_items_done_out_of_order(
+        self, checkpoint: checkpoint_controller.Checkpoint
+    ) -> None:
+        with pytest.raises(ValueError):
+            with checkpoint_controller.active(checkpoint):
+                for index in (0, 2, 3):
+                    checkpoint_controller.item_done("dhos_services_api:GDM", index)
+                raise ValueError("Failed")
+
+        loaded = checkpoint_controller.Checkpoint.load(checkpoint.path)
+        with checkpoint_controller.active(loaded):
+            assert checkpoint_controller.items_done("dhos_services_api:GDM") == 1
+            assert not checkpoint_controller.is_item_done("dhos_services_api:GDM", 1)
+            assert checkpoint_controller.is_item_done("dhos_services_api:GDM", 2)
+            checkpoint_controller.item_done("dhos_services_api:GDM", 1)
+            assert checkpoint_controller.items_done("dhos_services_api:GDM") == 4
+            assert loaded.items_ahead == {"dhos_services_api:GDM": set()}
+
+    def test_load_missing(self, tmp_path: Path) -> None:
+        with pytest.raises(EntityNotFoundException):
+            checkpoint_controller.Checkpoint.load(tmp_path / "missing.json")
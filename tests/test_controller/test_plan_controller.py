@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.blueprint_api.controller import plan_controller
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import environment, latency
+from dhos_janitor_api.helpers.environment import Environment
+
+PRODUCT_SETTINGS = {
+    "GDM": {"number_of_patients": 12},
+    "DBM": {"number_of_patients": 18},
+    "SEND": {"number_of_patients": 12},
+}
+
+
+class TestPlanController:
+    @pytest.fixture
+    def clients(
+        self, clients: ClientRepository, mocker: MockFixture
+    ) -> ClientRepository:
+        mocker.patch.object(
+            plan_controller.trustomer_client,
+            "get_trustomer_config",
+            return_value={"gdm_config": {"use_epr_integration": False}},
+        )
+        mocker.patch.object(plan_controller, "observed_latency_sec", return_value={})
+        mocker.patch.object(Configuration, "PLAN_DEFAULT_LATENCY_SEC", 0.5)
+        return clients
+
+    def test_plan_reset(self, clients: ClientRepository) -> None:
+        plan = plan_controller.plan_reset(clients, {}, PRODUCT_SETTINGS)
+
+        assert [t["target"] for t in plan["targets"]] == [
+            t.replace("_", "-")
+            for t in Configuration.RESETTABLE_TARGETS
+            if t != "dhos_fuego_api"
+        ]
+        services = next(
+            t for t in plan["targets"] if t["target"] == "dhos-services-api"
+        )
+        assert services["requests"] == {"dhos_services_api": 43, "dhos_users_api": 42}
+        assert services["duration_sec"] == 42.5
+        assert plan["requests"] == sum(
+            sum(t["requests"].values()) for t in plan["targets"]
+        )
+        assert plan["duration_sec"] == pytest.approx(plan["requests"] * 0.5, rel=0.01)
+
+    def test_plan_scales_with_settings(self, clients: ClientRepository) -> None:
+        small = plan_controller.plan_reset(
+            clients, {}, PRODUCT_SETTINGS, {"hospitals": 1, "wards": 2}
+        )
+        large = plan_controller.plan_reset(
+            clients,
+            {},
+            {p: {"number_of_patients": 10 * 12} for p in PRODUCT_SETTINGS},
+            {"hospitals": 1, "wards": 20},
+        )
+        assert large["requests"] > 5 * small["requests"]
+
+    def test_plan_requested_targets(self, clients: ClientRepository) -> None:
+        plan = plan_controller.plan_reset(
+            clients,
+            {"targets": ["dhos-users-api", "dhos-locations-api"]},
+            PRODUCT_SETTINGS,
+        )
+        assert [t["target"] for t in plan["targets"]] == [
+            "dhos-locations-api",
+            "dhos-users-api",
+        ]
+        assert plan["targets"][1]["requests"] == {"dhos_users_api": 103}
+
+    def test_observed_latency_of_environment(self, latency_stats_path: Path) -> None:
+        latency.save(str(latency_stats_path), "default", {"test_plan_target": 0.3})
+        latency.save(str(latency_stats_path), "qa1", {"test_plan_target": 0.6})
+        assert plan_controller.observed_latency_sec() == {"test_plan_target": 0.3}
+        with environment.active(Environment("qa1")):
+            assert plan_controller.observed_latency_sec() == {"test_plan_target": 0.6}
@@ -1,7 +1,10 @@
 import datetime
+import threading
+import time
 import uuid
 from functools import partial
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
 import httpx
 import pytest
@@ -11,7 +14,10 @@ from pytest_mock import MockFixture
 from respx import MockRouter
 
 from dhos_janitor_api.blueprint_api import ClientRepository
-from dhos_janitor_api.blueprint_api.controller import reset_controller
+from dhos_janitor_api.blueprint_api.controller import (
+    checkpoint_controller,
+    reset_controller,
+)
 
 PRODUCT_SETTINGS: Dict[str, Dict[str, Any]] = {
     "GDM": {"number_of_patients": 20},
@@ -143,6 +149,61 @@ class TestResetController:
         assert bed["parent"] == bay["uuid"]
         assert bed2["parent"] == ward2["uuid"]
 
+    def test_generate_location_tree(self) -> None:
+        levels = reset_controller.generate_location_tree(num_hospitals=3, num_wards=40)
+        assert list(levels) == ["hospitals", "wards", "bays", "beds"]
+        assert len(levels["hospitals"]) == 3
+        assert len(levels["wards"]) == 40
+
+        ward_uuids = {ward["uuid"] for ward in levels["wards"]}
+        bay_uuids = {bay["uuid"] for bay in levels["bays"]}
+        assert {w["parent"] for w in levels["wards"]} <= {
+            h["uuid"] for h in levels["hospitals"]
+        }
+        assert {bay["parent"] for bay in levels["bays"]} <= ward_uuids
+        bed_parents = {bed["parent"] for bed in levels["beds"]}
+        assert bed_parents <= ward_uuids | bay_uuids
+        # Wards have either bays or beds, not both.
+        assert not bed_parents & {bay["parent"] for bay in levels["bays"]}
+
+    def test_populate_dhos_locations_posts_parents_first(
+        self, clients: ClientRepository, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(
+            reset_controller.Configuration, "LOCATION_POST_CONCURRENCY", 3
+        )
+        mocker.patch.object(
+            reset_controller.auth_controller, "get_system_jwt", return_value="jwt"
+        )
+        posted: List[Dict] = []
+        lock = threading.Lock()
+
+        def _create(location: Dict, **kwargs: Any) -> None:
+            with lock:
+                posted.append(location)
+
+        mocker.patch.object(
+            reset_controller.locations_client, "create_location", side_effect=_create
+        )
+        reset_controller.populate_dhos_locations(
+            clients=clients, location_config={"hospitals": 2, "wards": 30}
+        )
+
+        seen: set = set()
+        for location in posted:
+            assert location.get("parent") is None or location["parent"] in seen
+            seen.add(location["uuid"])
+        assert (
+            len(
+                [
+                    p
+                    for p in posted
+                    if p["location_type"] == reset_controller.WARD_SCT_CODE
+                ]
+            )
+            == 30
+        )
+
     def test_ensure_mrn_is_static(
         self, app: Flask, clients: ClientRepository, mocker: MockFixture
     ) -> None:
@@ -173,7 +234,7 @@ class TestResetController:
             clients, PRODUCT_SETTINGS["DBM"]["number_of_patients"], "DBM"
         )
 
-        for p in gdm_patients + dbm_patients:
+        for p in [*gdm_patients, *dbm_patients]:
             if p["uuid"].startswith("static"):
                 i = p["uuid"].split("_")[-1]
                 assert p["hospital_number"] == i * 6
@@ -182,7 +243,10 @@ class TestResetController:
         class Cls:
             @staticmethod
             def start(
-                reset_request: Dict, product_settings: Dict, location_config: Dict
+                reset_request: Dict,
+                product_settings: Dict,
+                location_config: Dict,
+                checkpoint: checkpoint_controller.Checkpoint,
             ) -> None:
                 return None
 
@@ -215,6 +279,7 @@ class TestResetController:
         mock_get_clinician_jwt = mocker.patch.object(
             reset_controller.auth_controller, "get_clinician_jwt", return_value=""
         )
+        mock_debug = mocker.patch.object(reset_controller.logger, "debug")
         c_jwt = reset_controller.get_random_clinician_jwt(
             [clinician],
             {"GDM Superclinician"},
@@ -222,3 +287,174 @@ class TestResetController:
         mock_get_clinician_jwt.assert_called_once()
         c.assert_called_once()
         assert c_jwt == ""
+        # Called for each patient, so only logged with LOG_EACH_ITEM.
+        mock_debug.assert_not_called()
+
+    @pytest.mark.parametrize("num_sets", [0, 1, 5])
+    def test_with_publish_flags(self, num_sets: int) -> None:
+        obs_sets = ({"idx": i} for i in range(num_sets))
+        flagged = list(reset_controller._with_publish_flags(obs_sets))
+        assert [o["idx"] for o, _ in flagged] == list(range(num_sets))
+        expected_flags = [True] * (num_sets - 1) + [False] if num_sets else []
+        assert [suppress for _, suppress in flagged] == expected_flags
+
+    def test_generate_observation_sets_is_lazy(self, mocker: MockFixture) -> None:
+        mock_generate = mocker.patch.object(
+            reset_controller.ObservationsGenerator,
+            "generate",
+            return_value={"observations": [{"observation_type": "spo2"}]},
+        )
+        encounter = {
+            "encounter_uuid": "encounter_uuid",
+            "admitted_at": "2020-01-01T00:00:00.000Z",
+            "discharged_at": None,
+        }
+        obs_sets = reset_controller._generate_observation_sets(encounter)
+        assert mock_generate.call_count == 0
+        next(obs_sets)
+        assert mock_generate.call_count == 1
+
+    def test_populate_dhos_services_streams_patients(
+        self, clients: ClientRepository, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(
+            reset_controller.Configuration, "PATIENT_POST_CONCURRENCY", 3
+        )
+        mocker.patch.object(
+            reset_controller, "get_random_clinician_jwt", return_value="jwt"
+        )
+        events: List[str] = []
+        in_memory: List[int] = [0, 0]  # current, peak
+        lock = threading.Lock()
+
+        def _generate(
+            clients: ClientRepository, product_name: str, **kwargs: Any
+        ) -> Dict:
+            with lock:
+                events.append("generate")
+                in_memory[0] += 1
+                in_memory[1] = max(in_memory)
+            return {"uuid": kwargs.get("uuid") or str(uuid.uuid4())}
+
+        def _create(**kwargs: Any) -> None:
+            with lock:
+                events.append("post")
+                in_memory[0] -= 1
+
+        mocker.patch.object(
+            reset_controller.generator_controller, "generate_patient", _generate
+        )
+        mock_create = mocker.patch.object(
+            reset_controller.services_client, "create_patient", side_effect=_create
+        )
+        reset_controller.populate_dhos_services(
+            clients=clients,
+            product_settings={p: {"number_of_patients": 50} for p in PRODUCT_SETTINGS},
+        )
+
+        assert mock_create.call_count == 150
+        # Posting starts straight away, and only the patients in flight are held.
+        assert events.index("post") == 1
+        assert in_memory[1] <= 4
+        static_uuids = [
+            c.kwargs["patient_details"]["uuid"]
+            for c in mock_create.call_args_list
+            if c.kwargs["patient_details"]["uuid"].startswith("static_")
+        ]
+        assert len(static_uuids) == 20
+
+    def test_populate_dhos_services_resumes_after_failed_post(
+        self, clients: ClientRepository, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        mocker.patch.object(
+            reset_controller.Configuration, "PATIENT_POST_CONCURRENCY", 3
+        )
+        mocker.patch.object(
+            reset_controller, "get_random_clinician_jwt", return_value="jwt"
+        )
+        posted: List[str] = []
+        failed: List[str] = []
+        lock = threading.Lock()
+
+        def _generate(
+            clients: ClientRepository, product_name: str, **kwargs: Any
+        ) -> Dict:
+            return {"uuid": kwargs.get("uuid") or str(uuid.uuid4())}
+
+        def _create(patient_details: Dict, **kwargs: Any) -> None:
+            with lock:
+                if len(posted) == 14 and not failed:
+                    failed.append(patient_details["uuid"])
+                    raise httpx.ConnectError("Connection refused")
+                posted.append(patient_details["uuid"])
+
+        mocker.patch.object(
+            reset_controller.generator_controller, "generate_patient", _generate
+        )
+
+        mocker.patch.object(
+            reset_controller.services_client, "create_patient", side_effect=_create
+        )
+        product_settings = {p: {"number_of_patients": 20} for p in PRODUCT_SETTINGS}
+        checkpoint = checkpoint_controller.Checkpoint(tmp_path / "task.json", {})
+        with pytest.raises(httpx.ConnectError):
+            with checkpoint_controller.active(checkpoint):
+                reset_controller.populate_dhos_services(
+                    clients=clients, product_settings=product_settings
+                )
+        # The posts in flight when one failed were still counted.
+        assert checkpoint.items_ahead["dhos_services_api:GDM"]
+
+        with checkpoint_controller.active(checkpoint):
+            reset_controller.populate_dhos_services(
+                clients=clients, product_settings=product_settings
+            )
+        assert len(posted) == len(set(posted)) == 60
+
+    def test_populate_observations(
+        self, clients: ClientRepository, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(reset_controller, "_get_stan_lee_jwt", return_value="")
+        mocker.patch.object(
+            reset_controller,
+            "_generate_observation_sets",
+            return_value=iter([{"idx": 0}, {"idx": 1}, {"idx": 2}]),
+        )
+        mock_create = mocker.patch.object(
+            reset_controller.send_bff_client, "create_observation"
+        )
+        reset_controller._populate_observations(clients, {})
+        assert [
+            c.kwargs["suppress_obs_publish"] for c in mock_create.call_args_list
+        ] == [True, True, False]
+
+    def test_populate_observations_final_set_posted_last(
+        self, clients: ClientRepository, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(reset_controller, "_get_stan_lee_jwt", return_value="")
+        mocker.patch.object(
+            reset_controller.Configuration, "SEND_OBSERVATION_POST_CONCURRENCY", 3
+        )
+        mocker.patch.object(
+            reset_controller,
+            "_generate_observation_sets",
+            return_value=iter([{"idx": i} for i in range(10)]),
+        )
+        posted: List[Tuple[int, bool]] = []
+
+        def _create_observation(
+            obs_set: Dict, suppress_obs_publish: bool, **kwargs: Any
+        ) -> Dict:
+            time.sleep(0.01 * (obs_set["idx"] % 3))
+            posted.append((obs_set["idx"], suppress_obs_publish))
+            return obs_set
+
+        mocker.patch.object(
+            reset_controller.send_bff_client,
+            "create_observation",
+            side_effect=_create_observation,
+        )
+        reset_controller._populate_observations(clients, {})
+        assert len(posted) == 10
+        assert posted[-1] == (9, False)
+        assert all(suppress for _, suppress in posted[:-1])
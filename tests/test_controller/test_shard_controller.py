@@ -0,0 +1,271 @@
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import pytest
+from flask import Flask
+from mock import Mock
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.blueprint_api.client import ClientRepository
+from dhos_janitor_api.blueprint_api.controller import (
+    checkpoint_controller,
+    shard_controller,
+)
+from dhos_janitor_api.config import Configuration
+
+ITEMS: List[Dict] = [{"n": n} for n in range(5)]
+
+
+def _items(items: List[Dict]) -> Callable[[int], Iterable[Dict]]:
+    return lambda start: iter(items[start:])
+
+
+class TestShardController:
+    @pytest.fixture
+    def processed(self, mocker: MockFixture) -> List[Tuple[str, List[Dict], Dict]]:
+        processed: List[Tuple[str, List[Dict], Dict]] = []
+
+        def _process(
+            clients: ClientRepository,
+            stage: str,
+            items: Iterable[Dict],
+            total: int,
+            params: Dict,
+        ) -> None:
+            if params.get("fail"):
+                raise ValueError("Failed")
+            items = list(items)
+            assert len(items) == total
+            processed.append((stage, items, params))
+            for _ in items:
+                checkpoint_controller.item_done(stage)
+
+        mocker.patch.dict(shard_controller._processors, {"test": _process})
+        return processed
+
+    @pytest.fixture
+    def store(self, tmp_path: Path) -> shard_controller.ShardStore:
+        return shard_controller.ShardStore(
+            str(tmp_path / "shards.sqlite"), lease_sec=60, max_attempts=2
+        )
+
+    @pytest.fixture
+    def sharded(self, mocker: MockFixture, tmp_path: Path) -> None:
+        mocker.patch.object(
+            Configuration, "SHARD_STORE_PATH", str(tmp_path / "shards.sqlite")
+        )
+        mocker.patch.object(Configuration, "SHARD_SIZE", 2)
+
+    def test_claims_each_shard_once(self, store: shard_controller.ShardStore) -> None:
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS), 2)
+        claimed = [
+            store.claim("a"),
+            store.claim("b", "task", "stage"),
+            store.claim("a"),
+        ]
+        assert [s.items for s in claimed if s] == [ITEMS[0:2], ITEMS[2:4], ITEMS[4:]]
+        assert store.claim("b") is None
+
+        for shard in claimed:
+            assert shard is not None
+            store.complete(shard)
+        assert store.progress("task") == {
+            "stage": {
+                "shards": 3,
+                "pending": 0,
+                "claimed": 0,
+                "done": 3,
+                "failed": 0,
+                "items": 5,
+                "items_done": 5,
+            }
+        }
+
+    def test_expired_lease_is_claimed_again(self, tmp_path: Path) -> None:
+        store = shard_controller.ShardStore(
+            str(tmp_path / "shards.sqlite"), lease_sec=-1, max_attempts=2
+        )
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS[:1]), 2)
+        first = store.claim("a")
+        second = store.claim("b")
+        assert first is not None and second is not None
+        assert first.shard == second.shard
+        # Only the replica now holding the claim can renew, complete or fail it.
+        assert not store.renew(first)
+        assert not store.complete(first)
+        assert not store.fail(first, "error")
+        assert store.complete(second)
+
+    def test_lease_renewed_while_processing(
+        self, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        store = shard_controller.ShardStore(
+            str(tmp_path / "shards.sqlite"), lease_sec=0.3, max_attempts=2
+        )
+        claimed_meanwhile: List[object] = []
+
+        def _process(*args: object) -> None:
+            time.sleep(0.5)
+            claimed_meanwhile.append(store.claim("b"))
+
+        mocker.patch.dict(shard_controller._processors, {"test": _process})
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS[:1]), 2)
+        shard = store.claim("a")
+        assert shard is not None
+        assert shard_controller.process_shard(store, shard, Mock())
+        assert claimed_meanwhile == [None]
+        assert store.progress("task")["stage"]["done"] == 1
+
+    def test_lost_lease_counts_as_failure(
+        self, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        store = shard_controller.ShardStore(
+            str(tmp_path / "shards.sqlite"), lease_sec=-1, max_attempts=2
+        )
+        mocker.patch.dict(
+            shard_controller._processors,
+            {"test": lambda *args: store.claim("b")},
+        )
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS[:1]), 2)
+        shard = store.claim("a")
+        assert shard is not None
+        assert not shard_controller.process_shard(store, shard, Mock())
+        # The shard is left to the replica that claimed it since.
+        assert store.progress("task")["stage"]["claimed"] == 1
+
+    def test_failed_shard_retried_until_max_attempts(
+        self, store: shard_controller.ShardStore
+    ) -> None:
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS[:1]), 2)
+        for _ in range(2):
+            shard = store.claim("a")
+            assert shard is not None
+            store.fail(shard, "error")
+        assert store.claim("a") is None
+        assert store.progress("task")["stage"]["failed"] == 1
+
+        # Publishing the stage again, as a resumed reset does, retries it.
+        store.publish("task", "stage", "test", "default", {}, _items([]), 2)
+        assert store.claim("a") is not None
+
+    def test_failed_shard_retried_from_first_item_not_posted(
+        self, mocker: MockFixture, store: shard_controller.ShardStore
+    ) -> None:
+        posted: List[Dict] = []
+        attempts = 0
+
+        def _process(
+            clients: ClientRepository,
+            stage: str,
+            items: Iterable[Dict],
+            total: int,
+            params: Dict,
+        ) -> None:
+            nonlocal attempts
+            attempts += 1
+            for item in items:
+                if item["n"] == 3 and attempts == 1:
+                    raise ValueError("Failed")
+                posted.append(item)
+                checkpoint_controller.item_done(stage)
+
+        mocker.patch.dict(shard_controller._processors, {"test": _process})
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS), 5)
+        for _ in range(2):
+            shard = store.claim("a")
+            assert shard is not None
+            shard_controller.process_shard(store, shard, Mock())
+        assert posted == ITEMS
+        assert store.progress("task")["stage"]["done"] == 1
+
+    def test_publishing_resumed_from_first_unpublished_item(
+        self, store: shard_controller.ShardStore
+    ) -> None:
+        def _failing_items(start: int) -> Iterator[Dict]:
+            yield from ITEMS[start:3]
+            raise ValueError("Failed")
+
+        with pytest.raises(ValueError):
+            store.publish("task", "stage", "test", "default", {}, _failing_items, 2)
+        assert store.progress("task")["stage"]["items"] == 2
+
+        starts: List[int] = []
+
+        def _items_from(start: int) -> Iterator[Dict]:
+            starts.append(start)
+            return iter(ITEMS[start:])
+
+        store.publish("task", "stage", "test", "default", {}, _items_from, 2)
+        store.publish("task", "stage", "test", "default", {}, _items_from, 2)
+        assert starts == [2]
+        claimed = [store.claim("a") for _ in range(3)]
+        assert [s.items for s in claimed if s] == [ITEMS[0:2], ITEMS[2:4], ITEMS[4:]]
+
+    def test_run_stage_unsharded_skips_checkpointed_items(
+        self, processed: List, tmp_path: Path
+    ) -> None:
+        checkpoint = checkpoint_controller.Checkpoint(tmp_path / "task.json", {})
+        checkpoint.items["stage"] = 2
+        with checkpoint_controller.active(checkpoint):
+            shard_controller.run_stage(
+                clients=Mock(),
+                stage="stage",
+                processor="test",
+                items=_items(ITEMS),
+                total=5,
+                params={},
+            )
+        assert processed == [("stage", ITEMS[2:], {})]
+
+    def test_run_stage_sharded(self, processed: List, sharded: None) -> None:
+        shard_controller.run_stage(
+            clients=Mock(),
+            stage="stage",
+            processor="test",
+            items=_items(ITEMS),
+            total=5,
+            params={"p": 1},
+        )
+        assert [items for _, items, _ in processed] == [
+            ITEMS[0:2],
+            ITEMS[2:4],
+            ITEMS[4:],
+        ]
+        assert all(params == {"p": 1} for _, _, params in processed)
+
+    def test_run_stage_sharded_fails(
+        self, processed: List, sharded: None, mocker: MockFixture
+    ) -> None:
+        mocker.patch.object(Configuration, "SHARD_MAX_ATTEMPTS", 1)
+        with pytest.raises(ValueError, match="3 shards of stage stage failed"):
+            shard_controller.run_stage(
+                clients=Mock(),
+                stage="stage",
+                processor="test",
+                items=_items(ITEMS),
+                total=5,
+                params={"fail": True},
+            )
+
+    def test_worker_processes_shards_of_other_replicas(
+        self, app: Flask, processed: List, store: shard_controller.ShardStore
+    ) -> None:
+        store.publish("task", "stage", "test", "default", {"p": 1}, _items(ITEMS), 5)
+        worker = shard_controller.ShardWorker(app, store)
+        assert worker.run_once()
+        assert not worker.run_once()
+        assert processed == [("stage", ITEMS, {"p": 1})]
+        assert store.progress("task")["stage"]["done"] == 1
+
+    def test_worker_closes_clients(
+        self,
+        app: Flask,
+        processed: List,
+        store: shard_controller.ShardStore,
+        mocker: MockFixture,
+    ) -> None:
+        close = mocker.patch.object(ClientRepository, "close")
+        store.publish("task", "stage", "test", "default", {}, _items(ITEMS), 5)
+        assert shard_controller.ShardWorker(app, store).run_once()
+        close.assert_called_once_with()
@@ -1,3 +1,4 @@
+import random
 from datetime import datetime
 
 import pytest
@@ -56,3 +57,68 @@ class TestEncounterGenerator:
         assert mock_get_all_locations.call_count == 3
         assert "123" in result
         assert len(result) == 1
+
+    def test_discharge_releases_bed(
+        self, generator: encounter_generator.EncountersGenerator
+    ) -> None:
+        generator.allocator = encounter_generator.BedAllocator(
+            [{"uuid": "bed", "location_type": "333"}], bed_sct_code="333"
+        )
+        patient = {
+            "uuid": "patient",
+            "record": {"uuid": "record"},
+            "dh_products": [{"uuid": "product", "opened_date": "2021-10-14"}],
+        }
+        for _ in range(3):
+            encounter = generator.generate_data_for_patient(patient, discharged=True)
+            assert encounter["location_uuid"] == "bed"
+        generator.generate_data_for_patient(patient, discharged=False)
+        with pytest.raises(ValueError):
+            generator.generate_data_for_patient(patient, discharged=False)
+
+
+class TestBedAllocator:
+    @pytest.fixture
+    def allocator(self) -> encounter_generator.BedAllocator:
+        locations = [{"uuid": "ward", "location_type": "111"}] + [
+            {"uuid": f"bed{i}", "location_type": "333"} for i in range(3)
+        ]
+        return encounter_generator.BedAllocator(locations, bed_sct_code="333")
+
+    def test_beds_picked_once(
+        self, allocator: encounter_generator.BedAllocator
+    ) -> None:
+        picked = [allocator.pick()["uuid"] for _ in range(50)]
+        beds = [uuid for uuid in picked if uuid != "ward"]
+        assert sorted(beds) == ["bed0", "bed1", "bed2"]
+        assert allocator.occupancy() == {
+            "beds": 3,
+            "occupied_beds": 3,
+            "available_locations": 1,
+        }
+
+    def test_released_bed_available_again(
+        self, allocator: encounter_generator.BedAllocator
+    ) -> None:
+        for i in range(3):
+            allocator.occupy(f"bed{i}")
+        allocator.release("bed1")
+        allocator.release("ward")
+        assert {allocator.pick()["uuid"] for _ in range(50)} == {"ward", "bed1"}
+        assert allocator.occupancy()["occupied_beds"] == 3
+
+    def test_seeded_picks_ignore_location_order(self) -> None:
+        locations = [{"uuid": f"bed{i}", "location_type": "333"} for i in range(20)]
+        picks = []
+        for ordered in (locations, locations[::-1]):
+            random.seed(1)
+            allocator = encounter_generator.BedAllocator(ordered, bed_sct_code="333")
+            # Other draws from the global generator don't change the picks.
+            random.random()
+            picks.append([allocator.pick()["uuid"] for _ in range(10)])
+        assert picks[0] == picks[1]
+
+    def test_no_locations(self) -> None:
+        allocator = encounter_generator.BedAllocator([], bed_sct_code="333")
+        with pytest.raises(ValueError):
+            allocator.pick()
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import List
+
+import pytest
+from she_logging.request_id import current_request_id, set_request_id
+
+from dhos_janitor_api.helpers.concurrency import bounded_map
+
+
+class TestConcurrency:
+    @pytest.mark.parametrize("max_in_flight", [0, 1, 3])
+    def test_bounded_map_preserves_order(self, max_in_flight: int) -> None:
+        results = list(bounded_map(lambda x: x * 2, range(10), max_in_flight))
+        assert results == [x * 2 for x in range(10)]
+
+    def test_bounded_map_limits_in_flight(self) -> None:
+        lock = threading.Lock()
+        in_flight: List[int] = [0]
+        peak: List[int] = [0]
+
+        def _work(x: int) -> int:
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return x
+
+        assert list(bounded_map(_work, range(20), 4)) == list(range(20))
+        assert 1 < peak[0] <= 4
+
+    def test_bounded_map_propagates_request_id(self) -> None:
+        set_request_id("some-request-id")
+        assert set(bounded_map(lambda _: current_request_id(), range(5), 2)) == {
+            "some-request-id"
+        }
+
+    def test_bounded_map_raises(self) -> None:
+        def _fail(x: int) -> int:
+            raise ValueError(x)
+
+        with pytest.raises(ValueError):
+            list(bounded_map(_fail, range(5), 2))
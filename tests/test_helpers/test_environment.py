@@ -0,0 +1,51 @@
+import pytest
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import environment
+from dhos_janitor_api.helpers.environment import DEFAULT, Environment
+
+
+class TestEnvironment:
+    @pytest.fixture(autouse=True)
+    def environments(self, mocker: MockFixture) -> None:
+        mocker.patch.object(
+            Configuration,
+            "ENVIRONMENTS",
+            {
+                "qa1": {
+                    "CUSTOMER_CODE": "QA1",
+                    "PROXY_URL": "https://qa1.example.com",
+                    "DHOS_USERS_API": "https://users.qa1.example.com",
+                },
+                "bad": {"ALLOW_DROP_DATA": "true"},
+            },
+        )
+
+    def test_default_environment_uses_configuration(self) -> None:
+        env = environment.get_environment(DEFAULT)
+        assert env.setting("CUSTOMER_CODE") == Configuration.CUSTOMER_CODE
+        assert env.qualify("dhos_users_api") == "dhos_users_api"
+
+    def test_environment_overrides_configuration(self) -> None:
+        env = environment.get_environment("qa1")
+        assert env.setting("CUSTOMER_CODE") == "QA1"
+        assert env.setting("PROXY_URL") == "https://qa1.example.com/"
+        # Tokens are issued by the environment's proxy unless it says otherwise.
+        assert env.setting("HS_ISSUER") == "https://qa1.example.com/"
+        assert env.setting("HS_KEY") == Configuration.HS_KEY
+        assert env.qualify("dhos_users_api") == "qa1/dhos_users_api"
+
+    def test_unknown_environment(self) -> None:
+        with pytest.raises(ValueError, match="Unknown environment 'qa2'"):
+            environment.get_environment("qa2")
+
+    def test_environment_cannot_override_other_settings(self) -> None:
+        with pytest.raises(ValueError, match="can't override ALLOW_DROP_DATA"):
+            environment.get_environment("bad")
+
+    def test_active_environment(self) -> None:
+        assert environment.current().name == DEFAULT
+        with environment.active(environment.get_environment("qa1")):
+            assert environment.setting("CUSTOMER_CODE") == "QA1"
+        assert environment.current() == Environment(DEFAULT)
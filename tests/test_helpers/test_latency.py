@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from dhos_janitor_api.helpers import latency
+from dhos_janitor_api.helpers.concurrency import bounded_map
+
+
+class TestLatency:
+    def test_collects_within_context(self) -> None:
+        latency.record("target_a", 1.0)
+        with latency.collecting() as stats:
+            list(
+                bounded_map(
+                    lambda d: latency.record("target_a", d), [0.2, 0.4], max_in_flight=2
+                )
+            )
+            latency.record("target_b", 0.1)
+        latency.record("target_b", 1.0)
+        assert stats.mean_sec() == {
+            "target_a": pytest.approx(0.3),
+            "target_b": pytest.approx(0.1),
+        }
+
+    def test_saved_by_environment(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "stats" / "latency.json")
+        assert latency.load(path, "default") == {}
+        latency.save(path, "default", {"target_a": 0.1, "target_b": 0.2})
+        latency.save(path, "qa1", {"target_a": 0.5})
+        latency.save(path, "default", {"target_a": 0.3})
+        assert latency.load(path, "default") == {"target_a": 0.3, "target_b": 0.2}
+        assert latency.load(path, "qa1") == {"target_a": 0.5}
+
+    def test_unwritable_path_ignored(self, tmp_path: Path) -> None:
+        not_a_dir: Path = tmp_path / "file"
+        not_a_dir.write_text("")
+        latency.save(str(not_a_dir / "latency.json"), "default", {"target_a": 0.1})
+        assert latency.load(str(not_a_dir / "latency.json"), "default") == {}
@@ -0,0 +1,48 @@
+import re
+import threading
+import uuid
+from typing import List
+
+from dhos_janitor_api.data import patient_data
+from dhos_janitor_api.helpers import names
+
+
+class TestNames:
+    def test_pools_sampled_by_weight(self) -> None:
+        pool = names.Pool({"common": 99.0, "rare": 1.0})
+        sampled: List[str] = pool.choices(1000)
+        assert set(sampled) <= {"common", "rare"}
+        assert sampled.count("common") > 900
+
+    def test_names_from_pools(self) -> None:
+        assert names.first_name_female() in names.pool("first_name_female").values
+        assert names.first_name_male() in names.pool("first_name_male").values
+        assert names.last_name() in names.pool("last_name").values
+        assert names.county() in names.pool("county").values
+        assert re.fullmatch(r"[A-Z]{2}[0-9]{2}[A-Z]{3}", names.ods_code())
+
+    def test_seeded_names_are_repeatable(self) -> None:
+        names.seed(1)
+        first = [names.last_name() for _ in range(10)]
+        names.seed(1)
+        second = [names.last_name() for _ in range(10)]
+        assert first == second
+
+    def test_seeded_uuids_are_repeatable(self) -> None:
+        names.seed(1)
+        first = names.uuid4()
+        names.seed(1)
+        assert names.uuid4() == first
+        assert uuid.UUID(first).version == 4
+
+    def test_each_thread_has_its_own_generator(self) -> None:
+        generators = [names.rng()]
+        thread = threading.Thread(target=lambda: generators.append(names.rng()))
+        thread.start()
+        thread.join()
+        assert generators[0] is names.rng()
+        assert generators[0] is not generators[1]
+
+    def test_postcode_from_prefix(self) -> None:
+        postcode: str = patient_data.generate_postcode_from_prefix("OX")
+        assert re.fullmatch(r"OX[1-9] [1-9][A-Z]{2}", postcode)
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+import yaml
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import openapi
+
+SPEC_PATH = Path(__file__).parents[2] / "dhos_janitor_api/openapi/openapi.yaml"
+
+
+class TestOpenApi:
+    @pytest.fixture
+    def cache_dir(self, mocker: MockFixture, tmp_path: Path) -> Path:
+        cache_dir: Path = tmp_path / "cache"
+        mocker.patch.object(Configuration, "OPENAPI_CACHE_DIR", str(cache_dir))
+        return cache_dir
+
+    def test_load_spec_matches_yaml(self, cache_dir: Path, tmp_path: Path) -> None:
+        spec_path: Path = tmp_path / "openapi.yaml"
+        spec_path.write_bytes(SPEC_PATH.read_bytes())
+        expected = yaml.safe_load(SPEC_PATH.read_bytes())
+        assert openapi.load_spec(spec_path) == expected
+        assert len(list(cache_dir.glob("openapi-*.json"))) == 1
+        # Loaded from the cache the second time.
+        assert openapi.load_spec(spec_path) == expected
+
+    def test_shipped_json_matches_yaml(self, cache_dir: Path) -> None:
+        # Regenerated by `make openapi` whenever the spec changes.
+        assert openapi.load_spec(SPEC_PATH) == yaml.safe_load(SPEC_PATH.read_bytes())
+        assert not cache_dir.exists()
+
+    def test_write_spec_json_replaces_earlier_version(self, tmp_path: Path) -> None:
+        spec_path: Path = tmp_path / "openapi.yaml"
+        spec_path.write_text("openapi: 3.0.3\ninfo:\n  title: First\n")
+        first: Path = openapi.write_spec_json(spec_path)
+        spec_path.write_text("openapi: 3.0.3\ninfo:\n  title: Second\n")
+        second: Path = openapi.write_spec_json(spec_path)
+        assert list(tmp_path.glob("openapi-*.json")) == [second]
+        assert first != second
+
+    def test_changed_spec_parsed_again(self, cache_dir: Path, tmp_path: Path) -> None:
+        spec_path: Path = tmp_path / "openapi.yaml"
+        spec_path.write_text("openapi: 3.0.3\ninfo:\n  title: First\n")
+        assert openapi.load_spec(spec_path)["info"]["title"] == "First"
+        spec_path.write_text("openapi: 3.0.3\ninfo:\n  title: Second\n")
+        assert openapi.load_spec(spec_path)["info"]["title"] == "Second"
+        assert len(list(cache_dir.glob("openapi-*.json"))) == 2
+
+    def test_unwritable_cache_ignored(
+        self, mocker: MockFixture, tmp_path: Path
+    ) -> None:
+        not_a_dir: Path = tmp_path / "file"
+        not_a_dir.write_text("")
+        mocker.patch.object(Configuration, "OPENAPI_CACHE_DIR", str(not_a_dir))
+        assert openapi.load_spec(SPEC_PATH) == yaml.safe_load(SPEC_PATH.read_bytes())
@@ -0,0 +1,73 @@
+from typing import List
+
+import pytest
+from mock import Mock
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import progress
+from dhos_janitor_api.helpers.concurrency import bounded_map
+from dhos_janitor_api.helpers.progress import ProgressLogger
+
+
+class TestProgress:
+    @pytest.fixture
+    def mock_info(self, mocker: MockFixture) -> Mock:
+        return mocker.patch.object(progress.logger, "info")
+
+    @pytest.fixture
+    def mock_debug(self, mocker: MockFixture) -> Mock:
+        return mocker.patch.object(progress.logger, "debug")
+
+    def test_summarises_items(
+        self, mocker: MockFixture, mock_info: Mock, mock_debug: Mock
+    ) -> None:
+        mocker.patch.object(Configuration, "LOG_PROGRESS_INTERVAL_SEC", 3600)
+        with ProgressLogger("Posting readings", total=10_000) as p:
+            for i in range(10_000):
+                p.item("Posted reading %d", i)
+
+        assert mock_debug.call_count == 0
+        mock_info.assert_called_once()
+        assert mock_info.call_args.args[:5] == (
+            "%s: %s %d%s in %.1fs",
+            "Posting readings",
+            "finished",
+            10_000,
+            "/10000",
+        )
+        assert mock_info.call_args.kwargs["extra"]["progress"]["done"] == 10_000
+
+    def test_logs_at_interval(self, mocker: MockFixture, mock_info: Mock) -> None:
+        mocker.patch.object(Configuration, "LOG_PROGRESS_INTERVAL_SEC", 0)
+        with ProgressLogger("Posting readings") as p:
+            p.item()
+            p.item()
+
+        summaries: List[bool] = [
+            c.kwargs["extra"]["progress"]["finished"] for c in mock_info.call_args_list
+        ]
+        assert summaries == [False, False, True]
+
+    def test_counts_items_from_workers(
+        self, mocker: MockFixture, mock_info: Mock
+    ) -> None:
+        mocker.patch.object(Configuration, "LOG_PROGRESS_INTERVAL_SEC", 3600)
+        with ProgressLogger("Posting observations") as p:
+            list(bounded_map(lambda _: p.item(), range(100), 8))
+        assert p.done == 100
+
+    def test_no_summary_on_error(self, mock_info: Mock) -> None:
+        with pytest.raises(ValueError), ProgressLogger("Posting readings"):
+            raise ValueError("nope")
+        assert mock_info.call_count == 0
+
+    def test_logs_each_item(self, mocker: MockFixture, mock_debug: Mock) -> None:
+        mocker.patch.object(Configuration, "LOG_EACH_ITEM", True)
+        with ProgressLogger("Posting readings") as p:
+            p.item("Posted reading %d", 1)
+            progress.detail("Detail %s", "x")
+        assert [c.args for c in mock_debug.call_args_list] == [
+            ("Posted reading %d", 1),
+            ("Detail %s", "x"),
+        ]
@@ -0,0 +1,51 @@
+from typing import Dict, List
+
+from dhos_janitor_api.helpers import timing
+from dhos_janitor_api.helpers.concurrency import bounded_map
+
+
+class TestTiming:
+    def test_timing_tree(self) -> None:
+        @timing.timed("jwt")
+        def _get_jwt() -> str:
+            return "jwt"
+
+        with timing.task_timings("task") as root:
+            with timing.stage("drop"):
+                for target in ("a", "b"):
+                    with timing.stage(target):
+                        pass
+            with timing.stage("populate"):
+                for _ in range(3):
+                    with timing.stage("generate"):
+                        _get_jwt()
+
+        tree: Dict = root.to_dict()
+        assert tree["name"] == "task"
+        assert tree["count"] == 1
+        assert [s["name"] for s in tree["stages"]] == ["drop", "populate"]
+        drop, populate = tree["stages"]
+        assert [s["name"] for s in drop["stages"]] == ["a", "b"]
+        assert populate["stages"][0]["count"] == 3
+        assert populate["stages"][0]["stages"] == [
+            {"name": "jwt", "duration_sec": 0.0, "count": 3, "stages": []}
+        ]
+        assert tree["duration_sec"] >= populate["duration_sec"]
+
+    def test_stage_outside_task_does_nothing(self) -> None:
+        with timing.stage("orphan"):
+            pass
+        with timing.task_timings("task") as root:
+            pass
+        assert root.to_dict()["stages"] == []
+
+    def test_stages_on_worker_threads(self) -> None:
+        def _work(x: int) -> int:
+            with timing.stage("work"):
+                return x
+
+        with timing.task_timings("task") as root:
+            results: List[int] = list(bounded_map(_work, range(10), 3))
+
+        assert results == list(range(10))
+        assert root.to_dict()["stages"][0]["count"] == 10
@@ -0,0 +1,110 @@
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from pytest_mock import MockFixture
+
+from dhos_janitor_api.helpers import timing, tracing
+from dhos_janitor_api.helpers.concurrency import bounded_map
+
+
+class TestTracing:
+    def test_span_tree(self) -> None:
+        exported: List[Dict] = []
+        with tracing.trace("task", exported.extend, task_uuid="uuid") as root:
+            assert root is not None
+            with timing.task_timings("task"), timing.stage("drop"):
+                with tracing.span("DELETE dhos_users_api") as request_span:
+                    assert request_span is not None
+                    tracing.set_attribute("status_code", 200)
+
+        by_name: Dict[str, Dict] = {s["name"]: s for s in exported}
+        assert set(by_name) == {"task", "drop", "DELETE dhos_users_api"}
+        assert {s["trace_id"] for s in exported} == {root.trace.trace_id}
+        assert by_name["task"]["parent_span_id"] is None
+        assert by_name["task"]["attributes"] == {"task_uuid": "uuid"}
+        assert by_name["drop"]["parent_span_id"] == by_name["task"]["span_id"]
+        request = by_name["DELETE dhos_users_api"]
+        assert request["parent_span_id"] == by_name["drop"]["span_id"]
+        assert request["attributes"] == {"status_code": 200}
+        assert request["start_time_unix_nano"] <= request["end_time_unix_nano"]
+        assert request_span.traceparent == (
+            f"00-{root.trace.trace_id}-{request['span_id']}-01"
+        )
+
+    def test_spans_on_workers(self) -> None:
+        exported: List[Dict] = []
+
+        def _post(i: int) -> None:
+            with tracing.span("post", i=i):
+                pass
+
+        with tracing.trace("task", exported.extend) as root:
+            assert root is not None
+            list(bounded_map(_post, range(4), 2))
+
+        posts = [s for s in exported if s["name"] == "post"]
+        assert len(posts) == 4
+        assert {s["parent_span_id"] for s in posts} == {root.span_id}
+
+    def test_spans_exported_in_batches(self, mocker: MockFixture) -> None:
+        mocker.patch.object(tracing.Configuration, "TRACE_EXPORT_BATCH_SIZE", 2)
+        batches: List[List[Dict]] = []
+        with tracing.trace("task", batches.append) as root:
+            assert root is not None
+            for i in range(4):
+                with tracing.span("post", i=i):
+                    pass
+                assert len(root.trace.spans) < 2
+
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert batches[-1][0]["name"] == "task"
+
+    def test_error_status(self) -> None:
+        exported: List[Dict] = []
+        with pytest.raises(ValueError):
+            with tracing.trace("task", exported.extend):
+                with tracing.span("stage"):
+                    raise ValueError("nope")
+
+        assert [(s["status"], s["attributes"]) for s in exported] == [
+            ("error", {"error": "ValueError"}),
+            ("error", {"error": "ValueError"}),
+        ]
+
+    def test_no_op_outside_trace(self) -> None:
+        with tracing.trace("task", None) as root, tracing.span("stage") as span:
+            tracing.set_attribute("key", "value")
+        assert root is None
+        assert span is None
+
+    def test_export_failure_is_logged(self, mocker: MockFixture) -> None:
+        def _fail(spans: List[Dict]) -> None:
+            raise OSError("disk full")
+
+        mock_exception = mocker.patch.object(tracing.logger, "exception")
+        with tracing.trace("task", _fail):
+            pass
+        mock_exception.assert_called_once()
+
+    def test_file_exporter(self, tmp_path: Path) -> None:
+        path = tmp_path / "spans.jsonl"
+        exporter = tracing.exporter_from_config(
+            {"TRACE_EXPORT_PATH": str(path), "TRACE_EXPORT_URL": ""}
+        )
+        with tracing.trace("first", exporter):
+            pass
+        with tracing.trace("second", exporter):
+            pass
+
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["name"] for line in lines] == ["first", "second"]
+
+    def test_no_exporter_configured(self) -> None:
+        assert (
+            tracing.exporter_from_config(
+                {"TRACE_EXPORT_PATH": "", "TRACE_EXPORT_URL": ""}
+            )
+            is None
+        )
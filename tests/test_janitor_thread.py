@@ -1,11 +1,17 @@
+import json
+import pstats
+from pathlib import Path
 from time import sleep
-from typing import Any, Dict, NoReturn
+from typing import Any, Dict, List, NoReturn, Tuple
 
 import pytest
 from flask import Flask, Response
+from prometheus_client import REGISTRY
+from pytest_mock import MockFixture
 
 from dhos_janitor_api.blueprint_api import ClientRepository
 from dhos_janitor_api.blueprint_api.janitor_thread import JanitorTarget, JanitorThread
+from dhos_janitor_api.helpers import cache, timing
 
 WAIT_TIME = 0.1
 
@@ -86,3 +92,125 @@ class TestJanitorThread:
             )
             for _ in thread.wait_for_response():
                 ...
+
+    def test_records_task_timings(self, app: Flask) -> None:
+        def _staged_thread(clients: ClientRepository) -> None:
+            with timing.stage("stage"):
+                sleep(WAIT_TIME)
+
+        with app.app_context():
+            thread = JanitorThread(
+                task_uuid="timed_task_uuid",
+                target=_staged_thread,
+                request_id="some-request-id",
+            )
+            thread.start()
+            "".join(thread.wait_for_response())
+
+        timings = cache.task_timings["timed_task_uuid"]
+        assert timings["name"] == "_staged_thread"
+        assert timings["stages"][0]["name"] == "stage"
+        assert timings["stages"][0]["duration_sec"] >= WAIT_TIME
+
+    @pytest.mark.parametrize("failed", (False, True))
+    def test_task_timings_stored_before_final_status(
+        self, app: Flask, mocker: MockFixture, failed: bool
+    ) -> None:
+        # Each status set, and whether the task's timings were stored by then.
+        statuses: List[Tuple[cache.TaskStatus, bool]] = []
+
+        class _KnownTasks(dict):
+            def __setitem__(self, task_uuid: str, status: cache.TaskStatus) -> None:
+                statuses.append((status, task_uuid in cache.task_timings))
+                super().__setitem__(task_uuid, status)
+
+        mocker.patch.object(cache, "known_tasks", _KnownTasks())
+        mocker.patch.object(cache, "task_timings", {})
+        with app.app_context():
+            thread = JanitorThread(
+                task_uuid="timed_task_uuid",
+                target=self._mock_failed_thread if failed else self._mock_thread,
+                request_id="some-request-id",
+            )
+            thread.start()
+            if failed:
+                with pytest.raises(SpecificException):
+                    "".join(thread.wait_for_response())
+            else:
+                "".join(thread.wait_for_response())
+
+        final_status = cache.TaskStatus.ERROR if failed else cache.TaskStatus.COMPLETE
+        assert statuses[:2] == [
+            (cache.TaskStatus.RUNNING, False),
+            (final_status, True),
+        ]
+
+    def test_records_task_metrics(self, app: Flask) -> None:
+        def _sample(name: str, **labels: str) -> float:
+            return REGISTRY.get_sample_value(name, labels) or 0
+
+        completed = _sample(
+            "janitor_task_duration_seconds_count",
+            task="_mock_thread",
+            status="complete",
+        )
+        with app.app_context():
+            thread = JanitorThread(
+                task_uuid="task_uuid",
+                target=self._mock_thread,
+                request_id="some-request-id",
+            )
+            thread.start()
+            assert _sample("janitor_tasks_running", task="_mock_thread") == 1
+            "".join(thread.wait_for_response())
+
+        assert _sample("janitor_tasks_running", task="_mock_thread") == 0
+        assert (
+            _sample(
+                "janitor_task_duration_seconds_count",
+                task="_mock_thread",
+                status="complete",
+            )
+            == completed + 1
+        )
+
+    def test_writes_profile(self, app: Flask, tmp_path: Path) -> None:
+        app.config["PROFILE_DIR"] = str(tmp_path)
+        with app.app_context():
+            thread = JanitorThread(
+                task_uuid="profiled_task_uuid",
+                target=self._mock_thread,
+                request_id="some-request-id",
+                profile=True,
+            )
+            thread.start()
+            "".join(thread.wait_for_response())
+
+        stats = pstats.Stats(str(tmp_path / "profiled_task_uuid.prof"))
+        assert any(func[2] == "_mock_thread" for func in stats.stats)  # type: ignore
+
+    def test_exports_trace(self, app: Flask, tmp_path: Path) -> None:
+        def _staged_thread(clients: ClientRepository) -> None:
+            with timing.stage("stage"):
+                pass
+
+        app.config["TRACE_EXPORT_PATH"] = str(tmp_path / "spans.jsonl")
+        with app.app_context():
+            thread = JanitorThread(
+                task_uuid="traced_task_uuid",
+                target=_staged_thread,
+                request_id="some-request-id",
+            )
+            thread.start()
+            "".join(thread.wait_for_response())
+
+        spans = [
+            json.loads(line)
+            for line in (tmp_path / "spans.jsonl").read_text().splitlines()
+        ]
+        assert [s["name"] for s in spans] == ["stage", "_staged_thread"]
+        assert spans[1]["attributes"] == {
+            "task_uuid": "traced_task_uuid",
+            "environment": "default",
+        }
+        assert spans[0]["parent_span_id"] == spans[1]["span_id"]
@@ -0,0 +1,382 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+import httpx
+import pytest
+from flask import Flask
+from pytest_mock import MockFixture
+
+from benchmarks.stand_in import TARGETS, Behaviour, PostgresStandIn, StandInCluster
+from dhos_janitor_api.blueprint_api.client import (
+    ClientRepository,
+    encounters_client,
+    services_client,
+)
+from dhos_janitor_api.blueprint_api.controller import (
+    checkpoint_controller,
+    plan_controller,
+    populate_controller,
+    reset_controller,
+    shard_controller,
+    snapshot_controller,
+)
+from dhos_janitor_api.config import Configuration
+from dhos_janitor_api.helpers import environment
+from dhos_janitor_api.helpers.environment import Environment
+
+PRODUCT_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "GDM": {"number_of_patients": 3},
+    "DBM": {"number_of_patients": 3},
+    "SEND": {"number_of_patients": 3},
+}
+
+
+class TestStandIn:
+    @pytest.fixture
+    def cluster(self) -> StandInCluster:
+        return StandInCluster()
+
+    @pytest.fixture
+    def stand_in_clients(
+        self, app: Flask, cluster: StandInCluster, mocker: MockFixture
+    ) -> ClientRepository:
+        # The stand-in has no need for the default rate limits on small services.
+        mocker.patch.object(Configuration, "TARGET_LIMITS", {})
+        random.seed(0)
+        return ClientRepository.from_app(app, transports=cluster.transports())
+
+    def test_targets_match_configuration(self, app: Flask) -> None:
+        assert TARGETS == app.config["ALL_TARGETS"]
+
+    def test_reset_and_populate(
+        self, app: Flask, cluster: StandInCluster, stand_in_clients: ClientRepository
+    ) -> None:
+        with app.app_context():
+            response = reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request={},
+                product_settings=PRODUCT_SETTINGS,
+            )
+            populate_controller.populate_gdm_data(
+                clients=stand_in_clients, days=1, use_system_jwt=False
+            )
+
+        assert set(response) == {
+            t.replace("_", "-") for t in app.config["RESETTABLE_TARGETS"]
+        }
+        assert len(cluster.state.all("patients")) == 9
+        assert cluster.state.all("clinicians")
+        assert cluster.state.all("encounters")
+        assert cluster.state.all("readings")
+        counts = cluster.state.counts_by_target()
+        assert counts["dhos_services_api"] > 0
+        assert ("dhos_users_api", "POST /drop_data") in cluster.state.request_counts
+        # The reset's latency to each target is saved for reset plans.
+        assert {"dhos_services_api", "dhos_users_api"} <= set(
+            plan_controller.observed_latency_sec()
+        )
+
+    def test_plan_matches_reset(
+        self, app: Flask, cluster: StandInCluster, stand_in_clients: ClientRepository
+    ) -> None:
+        # Enough patients for the numbers of readings and so on to average out.
+        product_settings = {p: {"number_of_patients": 12} for p in PRODUCT_SETTINGS}
+        with app.app_context():
+            plan = plan_controller.plan_reset(
+                clients=stand_in_clients,
+                reset_request={},
+                product_settings=product_settings,
+            )
+            reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request={},
+                product_settings=product_settings,
+            )
+
+        requests = sum(cluster.state.request_counts.values())
+        assert plan["requests"] == pytest.approx(requests, rel=0.25)
+
+    def test_fanout_reset(self, app: Flask, mocker: MockFixture) -> None:
+        mocker.patch.object(Configuration, "TARGET_LIMITS", {})
+        clusters = {"qa1": StandInCluster(), "qa2": StandInCluster()}
+
+        def _reset(name: str) -> Dict:
+            env = Environment(name, {"CUSTOMER_CODE": name.upper()})
+            clients = ClientRepository.from_app(
+                app, transports=clusters[name].transports(), environment=env
+            )
+            with app.app_context(), environment.active(env):
+                return reset_controller.reset_microservices(
+                    clients=clients, reset_request={}, product_settings=PRODUCT_SETTINGS
+                )
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = dict(zip(clusters, executor.map(_reset, clusters)))
+
+        for name, cluster in clusters.items():
+            assert set(responses[name]) == {
+                t.replace("_", "-") for t in app.config["RESETTABLE_TARGETS"]
+            }
+            assert len(cluster.state.all("patients")) == 9
+            assert cluster.state.counts_by_target()["dhos_trustomer_api"] == 1
+
+    def test_sharded_reset(
+        self,
+        app: Flask,
+        cluster: StandInCluster,
+        stand_in_clients: ClientRepository,
+        mocker: MockFixture,
+        tmp_path: Path,
+    ) -> None:
+        mocker.patch.object(
+            Configuration, "SHARD_STORE_PATH", str(tmp_path / "shards.sqlite")
+        )
+        mocker.patch.object(Configuration, "SHARD_SIZE", 1)
+        mocker.patch.object(Configuration, "SHARD_POLL_INTERVAL_SEC", 0.01)
+        processed = mocker.spy(shard_controller, "process_shard")
+        store = shard_controller.from_config()
+        assert store is not None
+        # Another replica, sharing the shard store.
+        worker = shard_controller.ShardWorker(
+            app, store, transports=cluster.transports()
+        )
+        worker.start()
+        try:
+            with app.app_context():
+                reset_controller.reset_microservices(
+                    clients=stand_in_clients,
+                    reset_request={},
+                    product_settings=PRODUCT_SETTINGS,
+                )
+        finally:
+            worker.stop()
+
+        assert len(cluster.state.all("patients")) == 9
+        assert cluster.state.all("readings")
+        # A shard per patient, plus a shard per GDM and DBM patient's readings.
+        assert processed.call_count == 15
+
+    def test_incremental_reset(
+        self, app: Flask, cluster: StandInCluster, stand_in_clients: ClientRepository
+    ) -> None:
+        reset_request = {"incremental": True}
+        with app.app_context():
+            reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request=reset_request,
+                product_settings=PRODUCT_SETTINGS,
+            )
+            patients = cluster.state.all("patients")
+            response = reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request=reset_request,
+                product_settings=PRODUCT_SETTINGS,
+            )
+            unchanged = {t for t, r in response.items() if r == {"unchanged": True}}
+            assert unchanged == {
+                "dhos-locations-api",
+                "dhos-users-api",
+                "dhos-services-api",
+                "dhos-encounters-api",
+            }
+            assert cluster.state.all("patients") == patients
+
+            patients[0]["first_name"] = "Changed"
+            response = reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request=reset_request,
+                product_settings=PRODUCT_SETTINGS,
+            )
+            unchanged = {t for t, r in response.items() if r == {"unchanged": True}}
+            assert unchanged == {"dhos-locations-api", "dhos-users-api"}
+            assert "Changed" not in {
+                p["first_name"] for p in cluster.state.all("patients")
+            }
+
+    def test_resume_failed_reset(
+        self,
+        app: Flask,
+        cluster: StandInCluster,
+        stand_in_clients: ClientRepository,
+        mocker: MockFixture,
+        tmp_path: Path,
+    ) -> None:
+        mocker.patch.object(Configuration, "CHECKPOINT_CHUNK_SIZE", 2)
+        create_patient = services_client.create_patient
+        calls = 0
+
+        def _fail_fifth_patient(**kwargs: Any) -> Dict:
+            nonlocal calls
+            calls += 1
+            if calls == 5:
+                raise httpx.ConnectError("Connection refused")
+            return create_patient(**kwargs)
+
+        mocker.patch.object(
+            services_client, "create_patient", side_effect=_fail_fifth_patient
+        )
+        path = tmp_path / "task.json"
+        task: Dict[str, Any] = {
+            "reset_request": {},
+            "product_settings": PRODUCT_SETTINGS,
+            "location_config": None,
+        }
+        with app.app_context():
+            with pytest.raises(httpx.ConnectError):
+                reset_controller.reset_microservices(
+                    clients=stand_in_clients,
+                    checkpoint=checkpoint_controller.Checkpoint(path, task),
+                    **task,
+                )
+            checkpoint = checkpoint_controller.Checkpoint.load(path)
+            assert "populate:dhos_users_api" in checkpoint.completed
+            assert "populate:dhos_services_api" not in checkpoint.completed
+            assert checkpoint.items["dhos_services_api:DBM"] == 1
+
+            response = reset_controller.reset_microservices(
+                clients=stand_in_clients, checkpoint=checkpoint, **task
+            )
+
+        assert not path.exists()
+        assert set(response) == {
+            t.replace("_", "-") for t in app.config["RESETTABLE_TARGETS"]
+        }
+        # Nothing is dropped or posted twice.
+        assert cluster.state.request_counts[("dhos_users_api", "POST /drop_data")] == 1
+        assert len(cluster.state.all("patients")) == 9
+        assert cluster.state.all("encounters")
+
+    def test_resume_reset_failed_during_encounters(
+        self,
+        app: Flask,
+        cluster: StandInCluster,
+        stand_in_clients: ClientRepository,
+        mocker: MockFixture,
+        tmp_path: Path,
+    ) -> None:
+        create_encounter = encounters_client.create_encounter
+        calls = 0
+        created = 0
+
+        def _fail_sixth_encounter(**kwargs: Any) -> Dict:
+            nonlocal calls, created
+            calls += 1
+            if calls == 6:
+                raise httpx.ConnectError("Connection refused")
+            created += 1
+            return create_encounter(**kwargs)
+
+        mocker.patch.object(
+            encounters_client, "create_encounter", side_effect=_fail_sixth_encounter
+        )
+        path = tmp_path / "task.json"
+        task: Dict[str, Any] = {
+            "reset_request": {},
+            "product_settings": PRODUCT_SETTINGS,
+            "location_config": None,
+        }
+        with app.app_context():
+            with pytest.raises(httpx.ConnectError):
+                reset_controller.reset_microservices(
+                    clients=stand_in_clients,
+                    checkpoint=checkpoint_controller.Checkpoint(path, task),
+                    **task,
+                )
+            checkpoint = checkpoint_controller.Checkpoint.load(path)
+            assert "populate:dhos_encounters_api" in checkpoint.started
+            assert "populate:dhos_encounters_api" not in checkpoint.completed
+            assert len(cluster.state.all("encounters")) == 5
+
+            created = 0
+            reset_controller.reset_microservices(
+                clients=stand_in_clients, checkpoint=checkpoint, **task
+            )
+
+        # The encounters posted before the failure are dropped, not posted twice.
+        assert (
+            cluster.state.request_counts[("dhos_encounters_api", "POST /drop_data")]
+            == 2
+        )
+        assert cluster.state.request_counts[("dhos_users_api", "POST /drop_data")] == 1
+        encounters = cluster.state.all("encounters")
+        assert len(encounters) == created
+        open_patients = [
+            e["patient_uuid"] for e in encounters if not e["discharged_at"]
+        ]
+        assert len(open_patients) == len(set(open_patients))
+
+    def test_snapshot_reset(
+        self,
+        app: Flask,
+        cluster: StandInCluster,
+        stand_in_clients: ClientRepository,
+        mocker: MockFixture,
+    ) -> None:
+        postgres = PostgresStandIn(cluster.state)
+        mocker.patch.object(
+            snapshot_controller,
+            "from_config",
+            lambda: snapshot_controller.TemplateSnapshots(
+                postgres.connect, Configuration.TARGET_DATABASES
+            ),
+        )
+        with app.app_context():
+            reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request={"capture_snapshot": True},
+                product_settings=PRODUCT_SETTINGS,
+            )
+            assert set(postgres.copies) == {
+                f"{d}-snapshot" for d in Configuration.TARGET_DATABASES.values()
+            }
+            patients = cluster.state.all("patients")
+            cluster.state.add("patients", {"first_name": "Extra"})
+
+            response = reset_controller.reset_microservices(
+                clients=stand_in_clients,
+                reset_request={"snapshot": True},
+                product_settings=PRODUCT_SETTINGS,
+            )
+
+        assert cluster.state.all("patients") == patients
+        assert response["dhos-services-api"]["restored"] is True
+        assert response["dhos-services-api"]["restore_sec"] >= 0
+        # Targets without a database are dropped and repopulated as usual.
+        assert "restored" not in response["dhos-messages-api"]
+
+    def test_drop_data(self, cluster: StandInCluster) -> None:
+        with httpx.Client(transport=cluster.transports()["dhos_users_api"]) as client:
+            client.post("http://users/dhos/v1/clinician", json={"uuid": "c1"})
+            assert client.post("http://users/drop_data").json() == {"clinicians": 1}
+        assert cluster.state.all("clinicians") == []
+
+    def test_collects_spans(self, cluster: StandInCluster) -> None:
+        transport = httpx.WSGITransport(app=cluster.collector_app())
+        with httpx.Client(transport=transport) as client:
+            response = client.post(
+                "http://collector/v1/traces", json={"spans": [{"name": "task"}]}
+            )
+        assert response.json() == {"accepted": 1}
+        assert cluster.state.spans == [{"name": "task"}]
+
+    def test_behaviour(self) -> None:
+        cluster = StandInCluster(
+            target_behaviours={"gdm_bff": Behaviour(error_rate=1.0)}
+        )
+        transports = cluster.transports()
+        with httpx.Client(transport=transports["gdm_bff"]) as client:
+            assert client.post("http://gdm-bff/drop_data").status_code == 503
+        with httpx.Client(transport=transports["send_bff"]) as client:
+            assert client.post("http://send-bff/drop_data").status_code == 200
+
+    def test_throughput_cap_rejects(self) -> None:
+        cluster = StandInCluster(
+            Behaviour(max_requests_per_sec=1, reject_when_saturated=True)
+        )
+        with httpx.Client(transport=cluster.transports()["gdm_bff"]) as client:
+            assert client.post("http://gdm-bff/drop_data").status_code == 200
+            response = client.post("http://gdm-bff/drop_data")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"